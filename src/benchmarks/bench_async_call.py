@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_async_call.py: Benchmarks for async_call
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import time
+
+from benchmark import measure, check, latency_stats, get_async_application, main
+from bench_bindings import get_class_infos, start_getter_simulator
+
+from brickv.bindings.ip_connection import IPConnection, base58encode
+from brickv.brickd_simulator import SimulatedDevice, start_simulator
+
+DEAD_DEVICE_TIMEOUT = 1.0 # s
+DEAD_DEVICE_CALLS = 5
+LIVE_DEVICE_CALLS = 50
+PLUGIN_COUNT = 20
+
+def bench_dead_device(args):
+    # getters for a Bricklet that doesn't answer are queued first, then
+    # getters for a working Bricklet. the latency of the working Bricklet
+    # should not include the timeouts of the dead one
+    app = get_async_application()
+
+    if app is None:
+        return {'': {'skipped': 'PyQt4 is not available'}}
+
+    from PyQt4.QtCore import QTimer
+    from brickv.async_call import async_call, async_get_statistics
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    server = start_getter_simulator()
+    ipcon = IPConnection()
+    ipcon.set_timeout(DEAD_DEVICE_TIMEOUT)
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    live_device = BrickletTemperature('bTh', ipcon)
+    dead_device = BrickletTemperature('dEaD', ipcon)
+    latencies = []
+    failed = []
+
+    def live_returned(start):
+        def returned(value):
+            latencies.append(time.time() - start)
+
+            if len(latencies) == LIVE_DEVICE_CALLS:
+                app.quit()
+
+        return returned
+
+    def dead_failed():
+        failed.append(time.time())
+
+    def start():
+        for i in range(DEAD_DEVICE_CALLS):
+            async_call(dead_device.get_temperature, None, None, dead_failed)
+
+        for i in range(LIVE_DEVICE_CALLS):
+            async_call(live_device.get_temperature, None, live_returned(time.time()), None)
+
+    QTimer.singleShot(0, start)
+    QTimer.singleShot(int((DEAD_DEVICE_CALLS + 2) * DEAD_DEVICE_TIMEOUT * 1000), app.quit)
+    app.exec_()
+
+    statistics = async_get_statistics()
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+
+    if len(latencies) < LIVE_DEVICE_CALLS:
+        return {'': {'skipped': 'only {0} of {1} calls returned'.format(len(latencies), LIVE_DEVICE_CALLS)}}
+
+    result = latency_stats(latencies)
+    result['dead_device_timeout_us'] = DEAD_DEVICE_TIMEOUT * 1000000.0
+    result['live_device_max_depth'] = statistics[live_device.uid]['max_depth']
+    result['live_device_wait_time_max_us'] = statistics[live_device.uid]['wait_time_max'] * 1000000.0
+
+    return {'': result}
+
+def bench_result_dispatch(args):
+    # 20 plugins polling a getter at 10 Hz. measures how many ASYNC_EVENTs
+    # the results need and the GUI thread time spent delivering them
+    app = get_async_application()
+
+    if app is None:
+        return {'': {'skipped': 'PyQt4 is not available'}}
+
+    from PyQt4.QtCore import QTimer
+    from brickv.async_call import async_call, async_get_event_statistics
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    class_info = get_class_infos()['BrickletTemperature']
+    uids = [base58encode(1000 + i) for i in range(PLUGIN_COUNT)]
+    server = start_simulator([SimulatedDevice(class_info, uid, '0', 'a') for uid in uids], '127.0.0.1')
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    devices = [BrickletTemperature(uid, ipcon) for uid in uids]
+    deadline = time.time() + max(2.0, args.min_time * 10)
+    results = [0]
+
+    def returned(value):
+        results[0] += 1
+
+    def poll():
+        if time.time() > deadline:
+            app.quit()
+            return
+
+        for device in devices:
+            async_call(device.get_temperature, None, returned, None)
+
+        QTimer.singleShot(100, poll)
+
+    before = async_get_event_statistics()
+
+    QTimer.singleShot(0, poll)
+    app.exec_()
+
+    after = async_get_event_statistics()
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+
+    events = after['events'] - before['events']
+    delivered = after['results'] - before['results']
+    dispatch_time = after['dispatch_time'] - before['dispatch_time']
+
+    return {'': {'iterations': delivered,
+                 'events': events,
+                 'events_per_result': float(events) / delivered,
+                 'per_op_us': dispatch_time / delivered * 1000000.0}}
+
+def bench_duplicate_getters(args):
+    # a timer queues the same getters every 20 ms over a link with 50 ms
+    # latency. identical queued getters are merged, so the queue stays short
+    app = get_async_application()
+
+    if app is None:
+        return {'': {'skipped': 'PyQt4 is not available'}}
+
+    from PyQt4.QtCore import QTimer
+    from brickv.async_call import async_call, async_get_statistics
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    class_info = get_class_infos()['BrickletTemperature']
+    server = start_simulator([SimulatedDevice(class_info, 'bTh', '0', 'a')], '127.0.0.1', latency=0.05)
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    device = BrickletTemperature('bTh', ipcon)
+    deadline = time.time() + max(2.0, args.min_time * 10)
+    latencies = []
+
+    def returned(start):
+        def returned(value):
+            latencies.append(time.time() - start)
+
+        return returned
+
+    def update():
+        if time.time() > deadline:
+            app.quit()
+            return
+
+        start = time.time()
+
+        async_call(device.get_temperature, None, returned(start), None)
+        async_call(device.get_temperature_callback_period, None, returned(start), None)
+        async_call(device.get_temperature_callback_threshold, None, returned(start), None)
+        async_call(device.get_debounce_period, None, returned(start), None)
+
+        QTimer.singleShot(20, update)
+
+    QTimer.singleShot(0, update)
+    app.exec_()
+
+    statistics = async_get_statistics()[device.uid]
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+
+    result = latency_stats(latencies)
+    result['max_depth'] = statistics['max_depth']
+    result['calls'] = statistics['calls']
+    result['merged'] = statistics['merged']
+    result['dropped'] = statistics['dropped']
+
+    return {'': result}
+
+def bench_full_queue(args):
+    # a Bricklet that stopped answering while plugins keep polling it. its
+    # queue fills up with getters, a full queue drops the oldest getter for
+    # a new call and reports it as failed. setters are always queued. this
+    # only uses the queues, so it also runs without PyQt4
+    from brickv.async_device_queue import ASYNC_MAX_QUEUE_DEPTH, AsyncCall, AsyncDeviceQueue
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    device = BrickletTemperature('dEaD', IPConnection())
+    failed = []
+
+    def queue_call(device_queue, func_to_call, parameter):
+        # as async_call does it
+        def return_error():
+            failed.append((func_to_call.__name__, parameter))
+
+        if device_queue.merge(func_to_call, parameter, None, return_error):
+            return
+
+        dropped = device_queue.add(AsyncCall(func_to_call, parameter, None, return_error, 1))
+
+        if dropped is not None:
+            for return_error in dropped.return_errors:
+                return_error()
+
+    device_queue = AsyncDeviceQueue()
+
+    for i in range(ASYNC_MAX_QUEUE_DEPTH):
+        queue_call(device_queue, device.get_temperature_callback_threshold, i)
+
+    check(len(failed) == 0, 'getters were dropped before the queue was full')
+
+    queue_call(device_queue, device.get_temperature_callback_threshold, 0)
+    check(len(device_queue.calls) == ASYNC_MAX_QUEUE_DEPTH and len(failed) == 0,
+          'an identical getter was not merged into the full queue')
+
+    for i in range(10):
+        queue_call(device_queue, device.set_debounce_period, i)
+
+    # the merged caller of the first getter fails with it
+    check(failed == [('get_temperature_callback_threshold', 0)] +
+                    [('get_temperature_callback_threshold', i) for i in range(10)],
+          'the oldest getters were not dropped for setters: {0}'.format(failed[:11]))
+    check([call.parameter for call in device_queue.calls][-10:] == list(range(10)),
+          'setters were not queued in order')
+
+    # more setters than fit, all getters get dropped but no setter
+    for i in range(10, ASYNC_MAX_QUEUE_DEPTH + 10):
+        queue_call(device_queue, device.set_debounce_period, i)
+
+    check(len(failed) == ASYNC_MAX_QUEUE_DEPTH + 1, 'not all getters were dropped for setters')
+    check([call.parameter for call in device_queue.calls] == list(range(ASYNC_MAX_QUEUE_DEPTH + 10)),
+          'setters were dropped')
+
+    queue_call(device_queue, device.get_temperature, None)
+    check(failed[-1] == ('get_temperature', None), 'a getter for a queue full of setters did not fail')
+    check(device_queue.dropped_count == ASYNC_MAX_QUEUE_DEPTH + 1, 'dropped count is wrong')
+
+    # time per call into a full queue of getters
+    device_queue = AsyncDeviceQueue()
+    parameters = [0]
+
+    for i in range(ASYNC_MAX_QUEUE_DEPTH):
+        queue_call(device_queue, device.get_temperature_callback_threshold, i)
+
+    def queue_getter():
+        parameters[0] += 1
+        queue_call(device_queue, device.get_temperature_callback_threshold, parameters[0])
+
+    result = measure(queue_getter, min_time=args.min_time)
+    result['max_depth'] = device_queue.max_depth
+
+    return {'': result}
+
+BENCHMARKS = [('async_call.dead_device', bench_dead_device),
+              ('async_call.result_dispatch', bench_result_dispatch),
+              ('async_call.duplicate_getters', bench_duplicate_getters),
+              ('async_call.full_queue', bench_full_queue)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for async_call')
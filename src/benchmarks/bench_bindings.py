@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_bindings.py: Benchmarks for the hot paths of the Python bindings
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import struct
+import threading
+import time
+
+from benchmark import measure, latency_stats, LoopbackServer, get_async_application, main
+
+from brickv.bindings.ip_connection import IPConnection, Device, get_codec, base58encode
+from brickv.brickd_simulator import load_device_class_infos, generate_values, \
+                                    SimulatedDevice, start_simulator
+
+class_infos = None
+
+def get_class_infos():
+    global class_infos
+
+    if class_infos is None:
+        class_infos = load_device_class_infos()
+
+    return class_infos
+
+def bench_create_packet_header(args):
+    ipcon = IPConnection()
+    device = Device('abc', ipcon)
+    device.response_expected[1] = Device.RESPONSE_EXPECTED_ALWAYS_TRUE
+
+    return {'': measure(lambda: ipcon.create_packet_header(device, 8, 1), min_time=args.min_time)}
+
+def bench_send_request_packing(args):
+    # one request per distinct form string of all binding functions. the
+    # response expected flag is disabled, so this measures packing plus
+    # the socket send to the loopback server
+    server = LoopbackServer()
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.port)
+    server.wait_for_peer()
+
+    requests = []
+    forms = set()
+    uid = 1000
+
+    for class_info in get_class_infos().values():
+        device = None
+
+        for function in class_info.functions.values():
+            if function.form in forms:
+                continue
+
+            if device is None:
+                device = class_info.cls(base58encode(uid), ipcon)
+                uid += 1
+
+            forms.add(function.form)
+            device.response_expected[function.function_id] = Device.RESPONSE_EXPECTED_FALSE
+            requests.append((device, function.function_id, tuple(generate_values(function.form, 1)), function.form))
+
+    send_request = ipcon.send_request
+
+    def send_all():
+        for device, function_id, data, form in requests:
+            send_request(device, function_id, data, form, '')
+
+    def pack_all():
+        for device, function_id, data, form in requests:
+            get_codec(form).pack(data)
+
+    results = {'send': measure(send_all, items=len(requests), min_time=args.min_time),
+               'pack': measure(pack_all, items=len(requests), min_time=args.min_time)}
+
+    ipcon.disconnect()
+    server.close()
+
+    return results
+
+def callback_formats():
+    formats = set()
+
+    for class_info in get_class_infos().values():
+        for name, form in class_info.callbacks.values():
+            formats.add(form)
+
+    return sorted(formats)
+
+def bench_deserialize_callbacks(args):
+    ipcon = IPConnection()
+    payloads = [(get_codec(form).pack(generate_values(form, 1)), form) for form in callback_formats()]
+    deserialize_data = ipcon.deserialize_data
+
+    def deserialize_all():
+        for payload, form in payloads:
+            deserialize_data(payload, form)
+
+    return {'': measure(deserialize_all, items=len(payloads), min_time=args.min_time)}
+
+class FramingIPConnection(IPConnection):
+    def __init__(self):
+        IPConnection.__init__(self)
+
+        self.received_packets = 0
+        self.expected_packets = None
+        self.received_event = threading.Event()
+
+    def handle_response(self, packet):
+        self.received_packets += 1
+
+        if self.received_packets == self.expected_packets:
+            self.received_event.set()
+
+def bench_receive_loop(args):
+    # stream of callback packets with mixed lengths through a real socket
+    # into the receive thread. handle_response only counts, so this
+    # measures the framing alone
+    server = LoopbackServer()
+    ipcon = FramingIPConnection()
+    ipcon.connect('127.0.0.1', server.port)
+    peer = server.wait_for_peer()
+
+    packets = []
+
+    for i, form in enumerate(callback_formats()):
+        payload = get_codec(form).pack(generate_values(form, 1))
+        packets.append(struct.pack('<IBBBB', i + 1, 8 + len(payload), 1, 0, 0) + payload)
+
+    stream = b''.join(packets) * max(1, 100000 // len(packets))
+    count = len(stream) // len(b''.join(packets)) * len(packets)
+    best = None
+    received = True
+
+    for i in range(3):
+        ipcon.received_event.clear()
+        ipcon.received_packets = 0
+        ipcon.expected_packets = count
+
+        start = time.time()
+        peer.sendall(stream)
+        received = ipcon.received_event.wait(60)
+        elapsed = time.time() - start
+
+        if not received:
+            break
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    ipcon.disconnect()
+    server.close()
+
+    if not received:
+        return {'': {'skipped': 'only {0} of {1} packets received'.format(ipcon.received_packets, count)}}
+
+    return {'': {'iterations': 3,
+                 'items': count,
+                 'bytes': len(stream),
+                 'per_op_us': best / count * 1000000.0,
+                 'ops_per_second': count / best,
+                 'megabytes_per_second': len(stream) / best / 1000000.0}}
+
+def bench_dispatch_packet(args):
+    # callbacks for 100 devices of all classes with a registered callback,
+    # dispatched round-robin
+    ipcon = IPConnection()
+    packets = []
+    received = [0]
+
+    def cb(*args):
+        received[0] += 1
+
+    class_infos = [class_info for _, class_info in sorted(get_class_infos().items())
+                   if len(class_info.callbacks) > 0]
+
+    for i in range(100):
+        class_info = class_infos[i % len(class_infos)]
+        device = class_info.cls(base58encode(1000 + i), ipcon)
+
+        for callback_id, (name, form) in sorted(class_info.callbacks.items()):
+            device.registered_callbacks[callback_id] = cb
+            payload = get_codec(form).pack(generate_values(form, 1))
+            packets.append(struct.pack('<IBBBB', device.uid, 8 + len(payload), callback_id, 0, 0) + payload)
+
+    dispatch_packet = ipcon.dispatch_packet
+
+    def dispatch_all():
+        for packet in packets:
+            dispatch_packet(packet)
+
+    return {'': measure(dispatch_all, items=len(packets), min_time=args.min_time)}
+
+def start_getter_simulator():
+    devices = [SimulatedDevice(get_class_infos()['BrickletTemperature'], 'bTh', '0', 'a')]
+
+    return start_simulator(devices, '127.0.0.1')
+
+def bench_getter_round_trip(args):
+    # synchronous getter against the in-process brickd simulator, the
+    # baseline for the async_call round trip
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    server = start_getter_simulator()
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    device = BrickletTemperature('bTh', ipcon)
+    latencies = []
+    deadline = time.time() + args.min_time * 3
+
+    while time.time() < deadline or len(latencies) < 100:
+        start = time.time()
+        device.get_temperature()
+        latencies.append(time.time() - start)
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+
+    return {'': latency_stats(latencies)}
+
+def bench_async_call_round_trip(args):
+    # async_call from the GUI thread, through the async thread and back to
+    # the GUI thread via the Qt event loop
+    app = get_async_application()
+
+    if app is None:
+        return {'': {'skipped': 'PyQt4 is not available'}}
+
+    from PyQt4.QtCore import QTimer
+    from brickv.async_call import async_call
+    from brickv.bindings.bricklet_temperature import BrickletTemperature
+
+    server = start_getter_simulator()
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    device = BrickletTemperature('bTh', ipcon)
+    latencies = []
+    deadline = time.time() + args.min_time * 3
+    start = [0]
+
+    def call():
+        start[0] = time.time()
+        async_call(device.get_temperature, None, returned, None)
+
+    def returned(value):
+        latencies.append(time.time() - start[0])
+
+        if time.time() < deadline or len(latencies) < 100:
+            call()
+        else:
+            app.quit()
+
+    QTimer.singleShot(0, call)
+    app.exec_()
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+
+    return {'': latency_stats(latencies)}
+
+BENCHMARKS = [('bindings.create_packet_header', bench_create_packet_header),
+              ('bindings.send_request_packing', bench_send_request_packing),
+              ('bindings.deserialize_callbacks', bench_deserialize_callbacks),
+              ('bindings.receive_loop', bench_receive_loop),
+              ('bindings.dispatch_packet', bench_dispatch_packet),
+              ('bindings.getter_round_trip', bench_getter_round_trip),
+              ('bindings.async_call_round_trip', bench_async_call_round_trip)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the Python bindings')
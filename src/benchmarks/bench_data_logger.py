@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_data_logger.py: Benchmarks for the headless data logger
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import os
+import tempfile
+import time
+
+from benchmark import measure, main
+from bench_bindings import get_class_infos
+
+from brickv.bindings.ip_connection import IPConnection
+from brickv.brickd_simulator import create_stacks, start_simulator
+from brickv.data_logger import DataLogger, LoggedCallback, LOG_BUFFER_SIZE, format_values
+
+VALUE_COUNT = 10000 # values per measured batch
+DEVICE_COUNT = 1000 # Master Bricks with 4 Bricklets each
+
+# Bricklets with callbacks the data logger configures
+LOG_BRICKLET_CLASSES = ['BrickletTemperature', 'BrickletAmbientLight',
+                        'BrickletHumidity', 'BrickletVoltageCurrent',
+                        'BrickletBarometer', 'BrickletSoundIntensity',
+                        'BrickletDistanceIR', 'BrickletColor']
+
+class StubIPConnection:
+    def get_callback_timestamp(self):
+        return 1000.0
+
+def bench_write(args):
+    # callback thread and writer thread cost per value. batched queues the
+    # values and writes them with one write call, unbatched writes and
+    # flushes every line like a naive logger would
+    output = tempfile.TemporaryFile('w+', LOG_BUFFER_SIZE)
+    data_logger = DataLogger(StubIPConnection(), output, batch_size=VALUE_COUNT + 1)
+    callbacks = [data_logger.get_callback(LoggedCallback('abc', 8, 'temperature', 'h')),
+                 data_logger.get_callback(LoggedCallback('abd', 8, 'color', 'H H H H'))]
+
+    def batched():
+        output.seek(0)
+
+        for i in range(VALUE_COUNT // 2):
+            callbacks[0](2150)
+            callbacks[1](10, 20, 30, 40)
+
+        data_logger.write_pending()
+
+    def unbatched():
+        output.seek(0)
+
+        for i in range(VALUE_COUNT // 2):
+            output.write('{0:.6f},{1},{2},{3}\n'.format(time.time(), 'abc', 'temperature',
+                                                         format_values((2150,))))
+            output.flush()
+            output.write('{0:.6f},{1},{2},{3}\n'.format(time.time(), 'abd', 'color',
+                                                         format_values((10, 20, 30, 40))))
+            output.flush()
+
+    results = {'batched': measure(batched, items=VALUE_COUNT, min_time=args.min_time),
+               'unbatched': measure(unbatched, items=VALUE_COUNT, min_time=args.min_time)}
+
+    output.close()
+
+    return results
+
+def bench_simulator(args):
+    # DEVICE_COUNT devices sending callbacks with the periods configured by
+    # the logger, logged to a file. the simulator runs in the same process,
+    # so the throughput is a lower bound of what the logger alone can handle
+    devices = create_stacks(get_class_infos(), DEVICE_COUNT // 5, 1, 4, LOG_BRICKLET_CLASSES)
+    server = start_simulator(devices, '127.0.0.1')
+    simulator = server.simulator
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+
+    fd, filename = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    output = open(filename, 'w', LOG_BUFFER_SIZE)
+    data_logger = DataLogger(ipcon, output)
+
+    data_logger.start()
+    data_logger.run(max(args.min_time * 10, 2.0))
+
+    callbacks_start = simulator.callback_count
+    values_start = data_logger.value_count + len(data_logger.pending)
+    cpu_start = sum(os.times()[:2])
+    measure_start = time.time()
+
+    data_logger.run(max(args.min_time * 25, 5.0))
+
+    elapsed = time.time() - measure_start
+    cpu = sum(os.times()[:2]) - cpu_start
+    callbacks = simulator.callback_count - callbacks_start
+    values = data_logger.value_count + len(data_logger.pending) - values_start
+    statistics = data_logger.get_statistics()
+
+    data_logger.stop()
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+    output.close()
+    os.remove(filename)
+
+    return {'': {'iterations': 1,
+                 'items': values,
+                 'per_op_us': elapsed / max(values, 1) * 1000000.0,
+                 'values_per_second': values / elapsed,
+                 'callbacks_per_second': callbacks / elapsed,
+                 'cpu_per_value_us': cpu / max(values, 1) * 1000000.0,
+                 'devices': statistics['devices'],
+                 'bytes_per_value': float(statistics['bytes']) / max(statistics['values'], 1),
+                 'values_per_write': float(statistics['values']) / max(statistics['writes'], 1)}}
+
+BENCHMARKS = [('data_logger.write', bench_write),
+              ('data_logger.simulator', bench_simulator)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the headless data logger')
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_enumeration.py: Benchmarks for the handling of enumerate callbacks
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import random
+import threading
+import time
+
+from benchmark import measure, main
+from bench_bindings import get_class_infos
+
+from brickv.bindings.ip_connection import IPConnection
+from brickv.brickd_simulator import create_stacks, start_simulator, DEFAULT_BRICKLET_CLASSES
+
+DEVICE_COUNTS = [100, 1000]
+
+def import_infos():
+    # infos imports the brickv config, which is Python 2 only
+    try:
+        from brickv import infos
+    except SyntaxError:
+        return None
+
+    return infos
+
+def create_devices(count):
+    # Master Bricks with 4 Bricklets each
+    return create_stacks(get_class_infos(), count // 5, 1, 4, DEFAULT_BRICKLET_CLASSES)
+
+def clear_infos(infos):
+    for uid in list(infos.infos.keys()):
+        if infos.infos[uid].type in ('brick', 'bricklet'):
+            infos.remove_info(uid)
+
+def bench_update_device_info(args):
+    # enumerate callbacks in random order, as they arrive after a reconnect
+    infos = import_infos()
+
+    if infos is None:
+        return {'': {'skipped': 'needs Python 2'}}
+
+    results = {}
+
+    for count in DEVICE_COUNTS:
+        enumerations = []
+
+        for device in create_devices(count):
+            enumerations.append((device.uid, device.connected_uid, device.position,
+                                 device.hardware_version, device.firmware_version,
+                                 device.class_info.device_identifier,
+                                 IPConnection.ENUMERATION_TYPE_AVAILABLE))
+
+        random.Random(42).shuffle(enumerations)
+
+        def enumerate_all():
+            clear_infos(infos)
+
+            for enumeration in enumerations:
+                infos.update_device_info(*enumeration)
+
+        results[str(count)] = measure(enumerate_all, items=len(enumerations), min_time=args.min_time)
+
+    clear_infos(infos)
+
+    return results
+
+def bench_enumerate_simulator(args):
+    # enumerate over TCP/IP against the simulator, the enumerate callback
+    # updates the infos like the main window does
+    infos = import_infos()
+
+    if infos is None:
+        return {'': {'skipped': 'needs Python 2'}}
+
+    count = DEVICE_COUNTS[-1]
+    devices = create_devices(count)
+    server = start_simulator(devices, '127.0.0.1')
+    ipcon = IPConnection()
+    ipcon.connect('127.0.0.1', server.server_address[1])
+    received = [0]
+    done = threading.Event()
+
+    def cb_enumerate(*args):
+        infos.update_device_info(*args)
+        received[0] += 1
+
+        if received[0] == len(devices):
+            done.set()
+
+    ipcon.register_callback(IPConnection.CALLBACK_ENUMERATE, cb_enumerate)
+
+    best = None
+    enumerated = True
+
+    for i in range(3):
+        clear_infos(infos)
+        received[0] = 0
+        done.clear()
+
+        start = time.time()
+        ipcon.enumerate()
+        enumerated = done.wait(30)
+        elapsed = time.time() - start
+
+        if not enumerated:
+            break
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    ipcon.disconnect()
+    server.shutdown()
+    server.server_close()
+    clear_infos(infos)
+
+    if not enumerated:
+        return {'': {'skipped': 'only {0} of {1} devices enumerated'.format(received[0], len(devices))}}
+
+    return {'': {'iterations': 3,
+                 'items': len(devices),
+                 'per_op_us': best / len(devices) * 1000000.0,
+                 'total_ms': best * 1000.0}}
+
+BENCHMARKS = [('enumeration.update_device_info', bench_update_device_info),
+              ('enumeration.simulator', bench_enumerate_simulator)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the handling of enumerate callbacks')
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_firmware_cache.py: Benchmarks for the firmware and plugin cache
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+from benchmark import check, measure, main
+
+REQUEST_LATENCY = 0.05 # s, per request to the simulated tinkerforge.com
+FIRMWARE_SIZE = 0x40000 # Master Brick firmware
+PLUGIN_SIZE = 0x1000 # one Bricklet plugin
+SEED_FILE_COUNT = 32
+EVICT_FILE_COUNT = 64
+EVICT_CACHE_SIZE = 8 * PLUGIN_SIZE
+
+LATEST_VERSIONS = b'bricks:master:2.1.0\nbricklets:temperature:2.0.1\n'
+
+def create_data(size):
+    random.seed(size)
+
+    return bytearray(random.randrange(256) for i in range(size))
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class FirmwareServer:
+    """
+    Serves files from a dict like tinkerforge.com/downloads, with a fixed
+    latency per request.
+    """
+
+    def __init__(self, files, latency=REQUEST_LATENCY):
+        self.files = files
+        self.request_count = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_count += 1
+                time.sleep(latency)
+
+                data = server.files.get(self.path)
+
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}/'.format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+def bench_firmware_cache(args):
+    from brickv.firmware_cache import FirmwareCache, get_firmware_key, download_firmware, \
+                                      download_latest_versions
+
+    firmware = bytes(create_data(FIRMWARE_SIZE))
+    plugin = bytes(create_data(PLUGIN_SIZE))
+
+    # the plugin is only available as beta, so 5 URLs are tried before it.
+    # once cached, the release and newer betas are only looked for again
+    # after BETA_MAX_AGE
+    files = {'/bricks/master/brick_master_firmware_2_1_0.bin': firmware,
+             '/bricklets/temperature/bricklet_temperature_firmware_2_0_1_beta1.bin': plugin,
+             '/latest_versions.txt': LATEST_VERSIONS}
+
+    directory = tempfile.mkdtemp()
+    server = FirmwareServer(files)
+    results = {}
+
+    try:
+        cache = FirmwareCache(os.path.join(directory, 'cache'))
+
+        for name, kind, url_part, version, data in [('brick', 'bricks', 'master', (2, 1, 0), firmware),
+                                                    ('plugin_beta', 'bricklets', 'temperature', (2, 0, 1), plugin)]:
+            def download_uncached():
+                cache.remove(get_firmware_key(kind, url_part, version))
+                download_firmware(cache, server.url, kind, url_part, version)
+
+            request_count = server.request_count
+            results[name + '_uncached'] = measure(download_uncached, min_time=args.min_time, repeat=1)
+            results[name + '_uncached']['requests'] = server.request_count - request_count
+
+            request_count = server.request_count
+            results[name + '_cached'] = measure(lambda: download_firmware(cache, server.url, kind, url_part, version),
+                                                min_time=args.min_time)
+            results[name + '_cached']['requests'] = server.request_count - request_count
+            results[name + '_cached']['exact'] = download_firmware(cache, server.url, kind, url_part, version) == data
+
+            check(results[name + '_cached']['exact'], '{0}: cached data differs'.format(name))
+            check(results[name + '_cached']['requests'] == 0,
+                  '{0}: {1} requests for cached data'.format(name, results[name + '_cached']['requests']))
+
+        # a newer beta replaces the cached one, the release is probed first
+        newer_plugin = plugin[1:] + plugin[:1]
+        files['/bricklets/temperature/bricklet_temperature_firmware_2_0_1_beta2.bin'] = newer_plugin
+        request_count = server.request_count
+        start = time.time()
+        newer_beta = download_firmware(cache, server.url, 'bricklets', 'temperature', (2, 0, 1), max_age=0)
+        elapsed = time.time() - start
+        results['plugin_newer_beta'] = {'iterations': 1, 'items': 1, 'per_op_us': elapsed * 1000000.0,
+                                        'requests': server.request_count - request_count,
+                                        'exact': newer_beta == newer_plugin}
+
+        check(results['plugin_newer_beta']['exact'], 'plugin_newer_beta: newer beta not downloaded')
+        check(cache.get_beta(get_firmware_key('bricklets', 'temperature', (2, 0, 1))) == 2,
+              'plugin_newer_beta: newer beta not cached')
+
+        plugin = newer_plugin
+
+        latest_versions_url = server.url + 'latest_versions.txt'
+
+        results['latest_versions_expired'] = measure(lambda: download_latest_versions(cache, latest_versions_url, 0),
+                                                     min_time=args.min_time, repeat=1)
+        results['latest_versions_fresh'] = measure(lambda: download_latest_versions(cache, latest_versions_url),
+                                                   min_time=args.min_time)
+
+        # tinkerforge.com is not reachable, everything comes from the cache
+        url = server.url
+        server.close()
+        server = None
+
+        results['offline'] = measure(lambda: (download_latest_versions(cache, url + 'latest_versions.txt', 0),
+                                              download_firmware(cache, url, 'bricks', 'master', (2, 1, 0))),
+                                     min_time=args.min_time)
+        results['offline']['available'] = download_latest_versions(cache, url + 'latest_versions.txt', 0) == LATEST_VERSIONS and \
+                                          download_firmware(cache, url, 'bricks', 'master', (2, 1, 0)) == firmware and \
+                                          download_firmware(cache, url, 'bricklets', 'temperature', (2, 0, 1), max_age=0) == plugin
+
+        check(results['offline']['available'], 'offline: cached data not available')
+
+        # seeding from a directory as copied from a USB stick
+        seed_directory = os.path.join(directory, 'seed')
+        os.makedirs(seed_directory)
+
+        for i in range(SEED_FILE_COUNT):
+            with open(os.path.join(seed_directory, 'bricklet_plugin{0}_firmware_2_0_0.bin'.format(i)), 'wb') as f:
+                f.write(plugin[i:] + plugin[:i])
+
+        with open(os.path.join(seed_directory, 'latest_versions.txt'), 'wb') as f:
+            f.write(LATEST_VERSIONS)
+
+        def seed():
+            seed_cache = FirmwareCache(os.path.join(directory, 'seeded'))
+            seed_cache.clear()
+            seed_cache.seed(seed_directory)
+
+        results['seed'] = measure(seed, items=SEED_FILE_COUNT + 1, min_time=args.min_time, repeat=1)
+
+        # more plugins than fit, the least recently used ones are removed
+        evict_cache = FirmwareCache(os.path.join(directory, 'evicted'), EVICT_CACHE_SIZE)
+
+        def put_all():
+            for i in range(EVICT_FILE_COUNT):
+                evict_cache.put('bricklets/plugin{0}/2.0.0'.format(i), plugin[i:] + plugin[:i])
+
+        results['evict'] = measure(put_all, items=EVICT_FILE_COUNT, min_time=args.min_time, repeat=1)
+        results['evict']['size'] = evict_cache.get_size()
+        results['evict']['max_size'] = EVICT_CACHE_SIZE
+        results['evict']['newest_kept'] = evict_cache.get('bricklets/plugin{0}/2.0.0'.format(EVICT_FILE_COUNT - 1)) is not None
+
+        check(results['evict']['size'] <= EVICT_CACHE_SIZE, 'evict: cache grew beyond its size')
+        check(results['evict']['newest_kept'], 'evict: newest plugin was removed')
+    finally:
+        if server is not None:
+            server.close()
+
+        shutil.rmtree(directory)
+
+    return results
+
+BENCHMARKS = [('firmware_cache', bench_firmware_cache)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the firmware and plugin cache')
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_plot.py: Benchmarks for the plot data and rendering
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import random
+
+from benchmark import measure, main
+
+POINT_COUNTS = [('10k', 10000), ('100k', 100000), ('1M', 1000000)]
+PLOT_WIDTH = 1000 # pixels
+CHUNK_SIZE = 100 # samples per extend call
+
+def create_series(count):
+    # slow sine with noise and a few single sample spikes, the spikes must
+    # survive the decimation
+    import numpy
+
+    from brickv.plot_data import RingBuffer, MinMaxPyramid
+
+    random.seed(count)
+
+    xs = numpy.arange(count) / 10.0
+    ys = numpy.sin(xs / 60.0) * 100.0 + numpy.random.RandomState(count).normal(0, 2, count)
+    spikes = [random.randrange(count) for i in range(10)]
+    ys[spikes] = 1000.0
+
+    data_x = RingBuffer(count)
+    data_y = RingBuffer(count)
+    pyramid = MinMaxPyramid(count)
+
+    def fill():
+        data_x.clear()
+        data_y.clear()
+        pyramid.clear()
+
+        for i in range(0, count, CHUNK_SIZE):
+            data_x.extend(xs[i:i + CHUNK_SIZE])
+            data_y.extend(ys[i:i + CHUNK_SIZE])
+            pyramid.extend(xs[i:i + CHUNK_SIZE], ys[i:i + CHUNK_SIZE])
+
+    return data_x, data_y, pyramid, fill
+
+def stride_decimate(data_x, data_y, width):
+    # the decimation used without level of detail mode
+    x = data_x.get()
+    y = data_y.get()
+
+    if len(x) > width:
+        step = (len(x) + width - 1) // width
+        offset = -(data_x.total - len(x)) % step
+        x = x[offset::step]
+        y = y[offset::step]
+
+    return x, y
+
+def get_gui_application():
+    try:
+        from PyQt4.QtGui import QApplication
+        import PyQt4.Qwt5
+    except ImportError:
+        return None, 'PyQt4 or PyQwt5 is not available'
+
+    app = QApplication.instance()
+
+    if app is None:
+        app = QApplication([])
+    elif not isinstance(app, QApplication):
+        return None, 'a QCoreApplication is already running, run with -f plot'
+
+    return app, None
+
+def bench_min_max_pyramid(args):
+    try:
+        import numpy
+    except ImportError:
+        return {'': {'skipped': 'NumPy is not available'}}
+
+    results = {}
+
+    for name, count in POINT_COUNTS:
+        data_x, data_y, pyramid, fill = create_series(count)
+
+        # per sample cost of appending in chunks, including the pyramid
+        results['append_' + name] = measure(fill, items=count, min_time=args.min_time, repeat=1)
+
+        fill()
+
+        lod_x, lod_y = pyramid.get(data_x, data_y, PLOT_WIDTH)
+        stride_x, stride_y = stride_decimate(data_x, data_y, PLOT_WIDTH)
+
+        results['decimate_' + name] = measure(lambda: pyramid.get(data_x, data_y, PLOT_WIDTH),
+                                              min_time=args.min_time)
+        results['decimate_' + name]['points'] = len(lod_x)
+        results['decimate_' + name]['spikes_visible'] = bool(lod_y.max() == 1000.0)
+
+        results['stride_' + name] = measure(lambda: stride_decimate(data_x, data_y, PLOT_WIDTH),
+                                            min_time=args.min_time)
+        results['stride_' + name]['points'] = len(stride_x)
+        results['stride_' + name]['spikes_visible'] = bool(stride_y.max() == 1000.0)
+
+    return results
+
+def bench_render(args):
+    # draws one curve into an offscreen pixmap, with all points and with
+    # the min/max decimated points
+    try:
+        import numpy
+    except ImportError:
+        return {'': {'skipped': 'NumPy is not available'}}
+
+    app, reason = get_gui_application()
+
+    if app is None:
+        return {'': {'skipped': reason}}
+
+    from PyQt4.QtCore import Qt
+    from PyQt4.QtGui import QPixmap
+    import PyQt4.Qwt5 as Qwt
+
+    plot = Qwt.QwtPlot()
+    plot.setAutoReplot(False)
+    curve = Qwt.QwtPlotCurve('')
+    curve.setPen(Qt.red)
+    curve.attach(plot)
+    plot.resize(PLOT_WIDTH, 400)
+    pixmap = QPixmap(PLOT_WIDTH, 400)
+    results = {}
+
+    for name, count in POINT_COUNTS:
+        data_x, data_y, pyramid, fill = create_series(count)
+
+        fill()
+
+        def render_full():
+            curve.setData(data_x.get(), data_y.get())
+            plot.print_(pixmap)
+
+        def render_lod():
+            curve.setData(*pyramid.get(data_x, data_y, PLOT_WIDTH))
+            plot.print_(pixmap)
+
+        # drawing all points of the larger series takes seconds
+        repeat = 1 if count > 100000 else 3
+
+        results['full_' + name] = measure(render_full, min_time=args.min_time, repeat=repeat)
+        results['lod_' + name] = measure(render_lod, min_time=args.min_time)
+
+    return results
+
+BENCHMARKS = [('plot.min_max_pyramid', bench_min_max_pyramid),
+              ('plot.render', bench_render)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the plot data and rendering')
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_recording.py: Benchmarks for the recording files
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import os
+import shutil
+import tempfile
+
+from benchmark import measure, main
+
+SAMPLE_COUNT = 1000000 # about 2.8 hours of a 100 Hz stream
+SAMPLE_PERIOD = 0.01 # s
+RANGE_LENGTH = 60.0 # s, read by the range benchmark
+CSV_SAMPLE_COUNT = 100000
+
+def create_samples():
+    # slowly changing values with noise and jittered timestamps, like a
+    # sensor sending callbacks every 10 ms
+    import numpy
+
+    state = numpy.random.RandomState(42)
+    timestamps = 1400000000.0 + numpy.arange(SAMPLE_COUNT) * SAMPLE_PERIOD + state.uniform(0, 0.001, SAMPLE_COUNT)
+    values = (numpy.sin(numpy.arange(SAMPLE_COUNT) / 6000.0) * 1000 + 2000 +
+              state.normal(0, 3, SAMPLE_COUNT)).astype(int)
+
+    return timestamps.tolist(), [(value,) for value in values.tolist()]
+
+def write_recording(filename, timestamps, values, compress):
+    from brickv.recording import RecordingWriter
+
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    writer = RecordingWriter(filename, compress)
+    stream = writer.add_stream('abc', 8, 'temperature', 'h')
+
+    for timestamp, value in zip(timestamps, values):
+        stream.append(timestamp, value)
+
+    writer.close()
+
+def bench_recording(args):
+    try:
+        import numpy
+    except ImportError:
+        return {'': {'skipped': 'NumPy is not available'}}
+
+    from brickv.recording import RecordingReader
+
+    directory = tempfile.mkdtemp()
+    timestamps, values = create_samples()
+    results = {}
+
+    try:
+        for name, compress in [('zlib', True), ('raw', False)]:
+            filename = os.path.join(directory, name + '.rec')
+
+            results['write_' + name] = measure(lambda: write_recording(filename, timestamps, values, compress),
+                                               items=SAMPLE_COUNT, min_time=args.min_time, repeat=1)
+            results['write_' + name]['bytes_per_value'] = float(os.path.getsize(filename)) / SAMPLE_COUNT
+
+            reader = RecordingReader(filename)
+            middle = timestamps[SAMPLE_COUNT // 2]
+
+            results['read_all_' + name] = measure(lambda: reader.read('abc', 'temperature'),
+                                                  items=SAMPLE_COUNT, min_time=args.min_time)
+            results['read_range_' + name] = measure(lambda: reader.read('abc', 'temperature', middle,
+                                                                        middle + RANGE_LENGTH),
+                                                    min_time=args.min_time)
+
+            read_timestamps, columns = reader.read('abc', 'temperature')
+            results['read_all_' + name]['exact'] = bool(numpy.all(columns[0] == numpy.array(values)[:, 0]) and
+                                                        numpy.abs(read_timestamps - timestamps).max() < 1e-6)
+
+            del read_timestamps, columns
+            reader.close()
+
+        # the same values as CSV lines of the data logger, parsed line by line
+        filename = os.path.join(directory, 'values.csv')
+
+        with open(filename, 'w') as f:
+            for timestamp, value in zip(timestamps[:CSV_SAMPLE_COUNT], values[:CSV_SAMPLE_COUNT]):
+                f.write('{0:.6f},abc,temperature,{1}\n'.format(timestamp, value[0]))
+
+        def parse_csv():
+            read_timestamps = []
+            read_values = []
+
+            with open(filename, 'r') as f:
+                for line in f:
+                    parts = line.split(',')
+                    read_timestamps.append(float(parts[0]))
+                    read_values.append(int(parts[3]))
+
+            return numpy.array(read_timestamps), numpy.array(read_values)
+
+        results['read_csv'] = measure(parse_csv, items=CSV_SAMPLE_COUNT, min_time=args.min_time)
+        results['read_csv']['bytes_per_value'] = float(os.path.getsize(filename)) / CSV_SAMPLE_COUNT
+    finally:
+        shutil.rmtree(directory)
+
+    return results
+
+BENCHMARKS = [('recording', bench_recording)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for the recording files')
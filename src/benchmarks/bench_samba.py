@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+bench_samba.py: Benchmarks for flashing with the SAM-BA protocol
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import check, main
+
+PAGE_COUNT = 32 # pages written per run, 8 KB
+FLASH_PAGE_COUNT = 128 # pages flashed per run, 32 KB
+EMPTY_PAGE_COUNT = 16 # all 0xFF pages of the flashed firmware
+CHANGED_PAGE_COUNT = 4 # pages that differ between two minor versions
+PARALLEL_BRICK_COUNTS = [1, 8, 32] # Bricks flashed at once by flash-brick-cli.py
+PARALLEL_PAGE_COUNT = 32 # firmware pages of the parallel runs, 8 KB
+FIRMWARE_SIZE = 0x40000 # Master Brick firmware, for the estimated flash time
+
+def create_firmware(size):
+    random.seed(size)
+
+    return ''.join(chr(random.randrange(256)) for i in range(size))
+
+def get_skip_reason():
+    if sys.version_info[0] > 2:
+        return 'samba.py needs Python 2'
+
+    try:
+        import serial
+    except ImportError:
+        return 'pySerial is not available'
+
+    if not hasattr(os, 'openpty'):
+        return 'pseudo terminals are not available'
+
+    return None
+
+def open_simulator(firmware=None, crc_applet=False):
+    reason = get_skip_reason()
+
+    if reason is not None:
+        return None, None, reason
+
+    from brickv.samba import SAMBA
+    from brickv.samba_simulator import SimulatedSAM3S, SAMBASimulator
+
+    simulator = SAMBASimulator(SimulatedSAM3S(firmware=firmware))
+
+    return simulator, SAMBA(simulator.port_name, crc_applet=crc_applet), None
+
+def bench_write_pages(args):
+    # writes PAGE_COUNT pages word by word with W commands through the
+    # simulated 115200 baud link
+    simulator, samba, reason = open_simulator()
+
+    if simulator is None:
+        return {'': {'skipped': reason}}
+
+    firmware = create_firmware(PAGE_COUNT * samba.flash_page_size)
+    pages = [firmware[i:i + samba.flash_page_size] for i in range(0, len(firmware), samba.flash_page_size)]
+
+    start_bytes = simulator.byte_count
+    start_commands = simulator.command_count
+    start = time.time()
+
+    samba.write_pages(pages, 0, 'Writing firmware')
+
+    elapsed = time.time() - start
+
+    result = {'iterations': 1,
+              'items': len(pages),
+              'per_op_us': elapsed / len(pages) * 1000000.0,
+              'bytes_per_second': len(firmware) / elapsed,
+              'link_bytes_per_page': float(simulator.byte_count - start_bytes) / len(pages),
+              'commands_per_page': float(simulator.command_count - start_commands) / len(pages),
+              'estimated_firmware_s': elapsed * FIRMWARE_SIZE / len(firmware)}
+
+    check(bytes(simulator.chip.flash[:len(firmware)]) == firmware, 'written pages differ')
+
+    samba.port.close()
+    simulator.close()
+
+    return {'': result}
+
+def bench_flash(args):
+    # complete flash runs: erasing all and writing the firmware to a blank
+    # Brick, and differential flashing of the same and of a slightly changed
+    # firmware to a Brick that has the firmware already. differential
+    # flashing without the CRC applet has to fall back to erasing all
+    firmware = create_firmware(FLASH_PAGE_COUNT * 256)
+    firmware = firmware[:-EMPTY_PAGE_COUNT * 256] + '\xff' * (EMPTY_PAGE_COUNT * 256)
+    changed = list(firmware)
+
+    for i in range(CHANGED_PAGE_COUNT):
+        changed[i * FLASH_PAGE_COUNT // CHANGED_PAGE_COUNT * 256 + 100] = '\x00'
+
+    changed = ''.join(changed)
+    results = {}
+
+    for name, current, new, differential, crc_applet, pages_written in \
+            [('erase_all', None, firmware, False, True, FLASH_PAGE_COUNT - EMPTY_PAGE_COUNT),
+             ('same', firmware, firmware, True, True, 0),
+             ('minor', firmware, changed, True, True, CHANGED_PAGE_COUNT),
+             ('minor_without_crc', firmware, changed, True, False, FLASH_PAGE_COUNT - EMPTY_PAGE_COUNT)]:
+        simulator, samba, reason = open_simulator(current, crc_applet)
+
+        if simulator is None:
+            return {'': {'skipped': reason}}
+
+        start = time.time()
+
+        samba.flash(new, None, False, differential)
+
+        elapsed = time.time() - start
+
+        results[name] = {'iterations': 1,
+                         'items': 1,
+                         'per_op_us': elapsed * 1000000.0,
+                         'pages_written': simulator.chip.write_page_count,
+                         'exact': bytes(simulator.chip.flash[:len(new)]) == new}
+
+        samba.port.close()
+        simulator.close()
+
+        check(results[name]['exact'], '{0}: flashed firmware differs'.format(name))
+        check(results[name]['pages_written'] == pages_written,
+              '{0}: {1} pages written instead of {2}'.format(name, results[name]['pages_written'], pages_written))
+
+    return results
+
+def bench_verify(args):
+    # verifies FLASH_PAGE_COUNT pages by reading all of them back and with
+    # one CRC32 per lock region. a flipped bit in the flash has to be
+    # detected both ways, with the CRC applet it costs one lock region of
+    # readback
+    firmware = create_firmware(FLASH_PAGE_COUNT * 256)
+    pages = [firmware[i:i + 256] for i in range(0, len(firmware), 256)]
+    results = {}
+
+    for name, crc_applet, flipped_bit in [('readback', False, None),
+                                          ('readback_bit_flip', False, len(firmware) * 8 // 3),
+                                          ('crc', True, None),
+                                          ('crc_bit_flip', True, len(firmware) * 8 // 3)]:
+        simulator, samba, reason = open_simulator(firmware, crc_applet)
+
+        if simulator is None:
+            return {'': {'skipped': reason}}
+
+        from brickv.samba import SAMBAException
+
+        if flipped_bit is not None:
+            simulator.chip.flash[flipped_bit // 8] ^= 1 << (flipped_bit % 8)
+
+        start_bytes = simulator.response_byte_count
+        start = time.time()
+
+        try:
+            samba.verify_pages(pages, 0, 'firmware', False)
+            detected = False
+        except SAMBAException:
+            detected = True
+
+        elapsed = time.time() - start
+
+        results[name] = {'iterations': 1,
+                         'items': len(pages),
+                         'per_op_us': elapsed / len(pages) * 1000000.0,
+                         'verify_s': elapsed,
+                         'response_bytes': simulator.response_byte_count - start_bytes,
+                         'error_detected': detected}
+
+        samba.port.close()
+        simulator.close()
+
+        check(detected == (flipped_bit is not None),
+              '{0}: error_detected is {1}'.format(name, detected))
+
+    return results
+
+def bench_parallel(args):
+    # flashes 1 and multiple simulated Bricks with one flash-brick-cli.py
+    # call. the simulators run in this process, the CLI in its own
+    reason = get_skip_reason()
+
+    if reason is not None:
+        return {'': {'skipped': reason}}
+
+    firmware = create_firmware(PARALLEL_PAGE_COUNT * 256)
+    script = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'brickv', 'flash-brick-cli.py')
+    fd, filename = tempfile.mkstemp(suffix='.bin')
+    os.write(fd, firmware)
+    os.close(fd)
+    results = {}
+
+    try:
+        for count in PARALLEL_BRICK_COUNTS:
+            simulators = []
+
+            for i in range(count):
+                simulator, samba, reason = open_simulator()
+
+                if simulator is None:
+                    return {'': {'skipped': reason}}
+
+                # the CLI opens the port itself
+                samba.port.close()
+                simulators.append(simulator)
+
+            command = [sys.executable, script, '-f', filename]
+
+            for simulator in simulators:
+                command += ['-p', simulator.port_name]
+
+            with open(os.devnull, 'w') as devnull:
+                start = time.time()
+                returncode = subprocess.call(command, stdout=devnull)
+                elapsed = time.time() - start
+
+            name = 'bricks_{0}'.format(count)
+            results[name] = {'iterations': 1,
+                             'items': count,
+                             'per_op_us': elapsed / count * 1000000.0,
+                             'total_s': elapsed,
+                             'success': returncode == 0,
+                             'exact': all(bytes(simulator.chip.flash[:len(firmware)]) == firmware for simulator in simulators)}
+
+            for simulator in simulators:
+                simulator.close()
+
+            check(results[name]['success'], '{0}: flash-brick-cli.py exited with {1}'.format(name, returncode))
+            check(results[name]['exact'], '{0}: flashed firmware differs'.format(name))
+    finally:
+        os.remove(filename)
+
+    return results
+
+BENCHMARKS = [('samba.write_pages', bench_write_pages),
+              ('samba.flash', bench_flash),
+              ('samba.verify', bench_verify),
+              ('samba.parallel', bench_parallel)]
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Benchmarks for flashing with the SAM-BA protocol')
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+benchmark.py: Helpers for the brickv benchmarks
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import sys
+import threading
+import time
+
+# Allow the benchmarks to be directly started from the benchmarks directory
+# without "brickv" being in the path already
+if not 'brickv' in sys.modules:
+    head, tail = os.path.split(os.path.dirname(os.path.realpath(__file__)))
+    if not head in sys.path:
+        sys.path.insert(0, head)
+
+from brickv.config_common import BRICKV_VERSION
+
+# every result has a 'per_op_us' entry, lower is better. compare_benchmarks.py
+# uses it to detect regressions between two result files
+
+class CheckError(Exception):
+    pass
+
+def check(condition, message):
+    """
+    Fails the benchmark with message if condition is False. Used for the
+    behavior a benchmark depends on, e.g. that the flashed data is exact.
+    A failed benchmark makes main() exit with status 1.
+    """
+
+    if not condition:
+        raise CheckError(message)
+
+def measure(func, items=1, min_time=0.2, repeat=3):
+    """
+    Calls func repeatedly and returns the best time per call. If a call
+    processes multiple items (e.g. all form strings) then items is the
+    number of items per call.
+    """
+
+    # find an iteration count that takes at least min_time
+    iterations = 1
+
+    while True:
+        start = time.time()
+
+        for i in range(iterations):
+            func()
+
+        elapsed = time.time() - start
+
+        if elapsed >= min_time:
+            break
+
+        iterations *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+
+    best = elapsed
+
+    for i in range(repeat - 1):
+        start = time.time()
+
+        for i in range(iterations):
+            func()
+
+        best = min(best, time.time() - start)
+
+    per_op = best / (iterations * items)
+
+    return {'iterations': iterations,
+            'items': items,
+            'per_op_us': per_op * 1000000.0,
+            'ops_per_second': 1.0 / per_op if per_op > 0 else float('inf')}
+
+def latency_stats(latencies):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    return {'iterations': count,
+            'per_op_us': sum(latencies) / count * 1000000.0,
+            'median_us': latencies[count // 2] * 1000000.0,
+            'p99_us': latencies[min(count - 1, int(count * 0.99))] * 1000000.0,
+            'max_us': latencies[-1] * 1000000.0}
+
+class LoopbackServer:
+    """
+    Listening socket on localhost that accepts a single client. The
+    benchmark side of the socket pair is available as server.peer after
+    the client connected. Everything the client sends is discarded.
+    """
+
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(1)
+        self.port = self.socket.getsockname()[1]
+        self.peer = None
+        self.connected = threading.Event()
+        self.received = 0
+
+        thread = threading.Thread(target=self.loop)
+        thread.daemon = True
+        thread.start()
+
+    def loop(self):
+        self.peer, _ = self.socket.accept()
+        self.peer.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connected.set()
+
+        while True:
+            try:
+                data = self.peer.recv(65536)
+            except socket.error:
+                break
+
+            if len(data) == 0:
+                break
+
+            self.received += len(data)
+
+    def wait_for_peer(self):
+        self.connected.wait(5)
+
+        return self.peer
+
+    def close(self):
+        if self.peer is not None:
+            try:
+                self.peer.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+            self.peer.close()
+
+        self.socket.close()
+
+async_application = None
+
+def get_async_application():
+    """
+    Returns a Qt application and starts the async_call threads on first
+    use. Returns None if PyQt4 is not available.
+    """
+
+    global async_application
+
+    if async_application is None:
+        try:
+            from PyQt4.QtCore import QCoreApplication
+        except ImportError:
+            return None
+
+        from brickv.async_call import async_start_threads
+
+        async_application = QCoreApplication([])
+        async_start_threads(async_application)
+
+    return async_application
+
+def main(benchmarks, description):
+    """
+    Runs the (name, function) pairs in benchmarks and writes the results
+    as JSON. Each function gets the parsed arguments and returns a dict of
+    result names to result dicts.
+    """
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-o', '--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('-f', '--filter', help='only run benchmarks whose name matches this regular expression')
+    parser.add_argument('--min-time', default=0.2, type=float, help='minimum measuring time per benchmark in seconds')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _ in benchmarks:
+            print(name)
+
+        return
+
+    results = {}
+    failed = False
+
+    for name, func in benchmarks:
+        if args.filter is not None and re.search(args.filter, name) is None:
+            continue
+
+        sys.stderr.write('{0} ...\n'.format(name))
+
+        try:
+            func_results = func(args)
+        except CheckError as e:
+            func_results = {'': {'failed': str(e)}}
+            failed = True
+
+        for result_name, result in sorted(func_results.items()):
+            full_name = name if len(result_name) == 0 else name + '.' + result_name
+            results[full_name] = result
+
+            if 'skipped' in result:
+                sys.stderr.write('  {0}: skipped, {1}\n'.format(full_name, result['skipped']))
+            elif 'failed' in result:
+                sys.stderr.write('  {0}: FAILED, {1}\n'.format(full_name, result['failed']))
+            else:
+                sys.stderr.write('  {0}: {1:.3f} us/op\n'.format(full_name, result['per_op_us']))
+
+    report = {'brickv_version': BRICKV_VERSION,
+              'python_version': platform.python_version(),
+              'python_implementation': platform.python_implementation(),
+              'platform': platform.platform(),
+              'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results}
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if failed:
+        sys.exit(1)
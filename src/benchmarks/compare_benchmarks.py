@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+compare_benchmarks.py: Compares two benchmark result files
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import argparse
+import json
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares two benchmark result files written by run_benchmarks.py')
+    parser.add_argument('old', help='result file of the baseline')
+    parser.add_argument('new', help='result file to compare against the baseline')
+    parser.add_argument('--threshold', default=10.0, type=float,
+                        help='slowdown in percent that counts as regression (default: 10)')
+
+    args = parser.parse_args()
+
+    with open(args.old, 'r') as f:
+        old = json.load(f)
+
+    with open(args.new, 'r') as f:
+        new = json.load(f)
+
+    print('{0} ({1}, Python {2}) -> {3} ({4}, Python {5})'
+          .format(args.old, old['brickv_version'], old['python_version'],
+                  args.new, new['brickv_version'], new['python_version']))
+
+    regressions = 0
+
+    for name in sorted(set(old['results']) | set(new['results'])):
+        old_result = old['results'].get(name, {})
+        new_result = new['results'].get(name, {})
+
+        if not 'per_op_us' in old_result or not 'per_op_us' in new_result:
+            print('  {0:50} not comparable'.format(name))
+            continue
+
+        old_time = old_result['per_op_us']
+        new_time = new_result['per_op_us']
+        change = (new_time - old_time) / old_time * 100.0
+
+        if change > args.threshold:
+            marker = ' REGRESSION'
+            regressions += 1
+        else:
+            marker = ''
+
+        print('  {0:50} {1:12.3f} us -> {2:12.3f} us {3:+7.1f}%{4}'
+              .format(name, old_time, new_time, change, marker))
+
+    if regressions > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+run_benchmarks.py: Runs all brickv benchmarks and writes the results as JSON
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+from benchmark import main
+
+import bench_bindings
+import bench_async_call
+import bench_enumeration
+import bench_plot
+import bench_data_logger
+import bench_recording
+import bench_samba
+import bench_firmware_cache
+
+BENCHMARKS = bench_bindings.BENCHMARKS + \
+             bench_async_call.BENCHMARKS + \
+             bench_enumeration.BENCHMARKS + \
+             bench_plot.BENCHMARKS + \
+             bench_data_logger.BENCHMARKS + \
+             bench_recording.BENCHMARKS + \
+             bench_samba.BENCHMARKS + \
+             bench_firmware_cache.BENCHMARKS
+
+if __name__ == "__main__":
+    main(BENCHMARKS, 'Runs the brickv benchmarks and writes the results as JSON')
@@ -22,10 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from PyQt4.QtGui import QApplication
-from PyQt4.QtCore import QThread, QEvent
+from PyQt4.QtCore import QObject, QThread, QEvent
 from threading import Lock
+from brickv.async_device_queue import AsyncCall, AsyncDeviceQueue, async_get_device_key
 
 import logging
+import time
 import traceback
 
 try:
@@ -35,82 +37,250 @@ except ImportError:
 
 ASYNC_EVENT = 12345
 
-async_call_queue = Queue()
+# number of worker threads. calls for the same device are executed in
+# order by one worker at a time, calls for different devices in parallel.
+# this way a device that runs into timeouts only stalls its own calls
+ASYNC_WORKER_COUNT = 4
+
+async_device_queues = {} # uid -> AsyncDeviceQueue, protected by async_session_lock
+async_ready_queue = Queue() # uids of device queues with calls to execute
 async_event_queue = Queue()
+async_event_lock = Lock()
+async_event_pending = False # protected by async_event_lock
+async_event_receiver = None
 async_session_lock = Lock()
 async_session_id = 1
 
+class AsyncEventStatistics:
+    def __init__(self):
+        self.events = 0 # ASYNC_EVENTs handled in the GUI thread
+        self.results = 0 # results delivered by these events
+        self.dispatch_time = 0.0 # GUI thread time spent delivering results
+
+async_event_statistics = AsyncEventStatistics()
+
 def async_call(func_to_call, parameter=None, return_ok=None, return_error=None):
+    key = async_get_device_key(func_to_call)
+
     with async_session_lock:
-        async_call_queue.put((func_to_call, parameter, return_ok, return_error, async_session_id))
+        if key not in async_device_queues:
+            async_device_queues[key] = AsyncDeviceQueue()
+
+        device_queue = async_device_queues[key]
+
+        # the same getter with the same parameter is already queued, deliver
+        # its result to this caller too
+        if device_queue.merge(func_to_call, parameter, return_ok, return_error):
+            return
+
+        dropped = device_queue.add(AsyncCall(func_to_call, parameter, return_ok, return_error, async_session_id))
+
+        if not device_queue.scheduled:
+            device_queue.scheduled = True
+            async_ready_queue.put(key)
+
+    if dropped is not None:
+        for return_error in dropped.return_errors:
+            if return_error != None:
+                async_put_result(return_error)
 
 def async_event_handler():
+    global async_event_pending
+
+    start = time.time()
+    results = 0
+
+    # clear the flag before draining the queue. a result that is queued
+    # while draining either gets delivered now or posts a new event
+    with async_event_lock:
+        async_event_pending = False
+
     while not async_event_queue.empty():
         try:
             func = async_event_queue.get(False, 0)
             if func:
+                results += 1
                 func()
         except StopIteration:
             pass
         except:
             logging.exception('Error while delivering async call result')
 
+    async_event_statistics.events += 1
+    async_event_statistics.results += results
+    async_event_statistics.dispatch_time += time.time() - start
+
+def async_put_result(func):
+    global async_event_pending
+
+    async_event_queue.put(func)
+
+    # at most one ASYNC_EVENT is pending at a time, all results that
+    # arrive until it is handled are delivered by it
+    with async_event_lock:
+        if async_event_pending:
+            return
+
+        async_event_pending = True
+
+    QApplication.postEvent(async_event_receiver, QEvent(ASYNC_EVENT))
+
+class AsyncEventReceiver(QObject):
+    def event(self, event):
+        if event.type() == ASYNC_EVENT:
+            async_event_handler()
+            return True
+
+        return QObject.event(self, event)
+
 def async_next_session():
     with async_session_lock:
         global async_session_id
         async_session_id += 1
 
-        with async_call_queue.mutex:
-            async_call_queue.queue.clear()
+        for device_queue in async_device_queues.values():
+            device_queue.clear()
+
+def async_get_statistics():
+    """
+    Returns a dict of device UID to queue statistics. Calls that are not
+    bound methods of a device are listed under None. Merged counts getters
+    that were attached to an identical queued getter, dropped counts getters
+    that were dropped because of ASYNC_MAX_QUEUE_DEPTH.
+    """
+
+    statistics = {}
+
+    with async_session_lock:
+        for key, device_queue in async_device_queues.items():
+            if device_queue.call_count > 0:
+                wait_time_average = device_queue.wait_time_total / device_queue.call_count
+            else:
+                wait_time_average = 0.0
+
+            statistics[key] = {'depth': len(device_queue.calls),
+                               'max_depth': device_queue.max_depth,
+                               'calls': device_queue.call_count,
+                               'merged': device_queue.merged_count,
+                               'dropped': device_queue.dropped_count,
+                               'wait_time_average': wait_time_average,
+                               'wait_time_max': device_queue.wait_time_max}
+
+    return statistics
+
+def async_get_event_statistics():
+    """
+    Returns the number of handled ASYNC_EVENTs, the number of results
+    delivered by them and the GUI thread time spent delivering them.
+    """
 
-def async_start_thread(parent):
+    return {'events': async_event_statistics.events,
+            'results': async_event_statistics.results,
+            'dispatch_time': async_event_statistics.dispatch_time}
+
+def async_start_threads(parent):
     class AsyncThread(QThread):
         def __init__(self, parent=None):
             QThread.__init__(self, parent)
 
+        def next_call(self):
+            while True:
+                key = async_ready_queue.get()
+
+                with async_session_lock:
+                    device_queue = async_device_queues[key]
+
+                    if len(device_queue.calls) == 0:
+                        # cleared by async_next_session
+                        device_queue.scheduled = False
+                        continue
+
+                    call = device_queue.calls.popleft()
+                    wait_time = time.time() - call.queued_time
+
+                    device_queue.remove_pending_getter(call)
+
+                    device_queue.call_count += 1
+                    device_queue.wait_time_total += wait_time
+                    device_queue.wait_time_max = max(device_queue.wait_time_max, wait_time)
+
+                    return key, device_queue, call
+
+        def call_done(self, device_queue, key):
+            with async_session_lock:
+                if len(device_queue.calls) > 0:
+                    # requeue at the end to let the other devices go first
+                    async_ready_queue.put(key)
+                else:
+                    device_queue.scheduled = False
+
         def run(self):
             while True:
-                func_to_call, parameter, return_ok, return_error, session_id = async_call_queue.get()
-                if not func_to_call:
-                    continue
+                key, device_queue, call = self.next_call()
 
-                return_value = None
                 try:
-                    if parameter == None:
-                        return_value = func_to_call()
-                    elif isinstance(parameter, tuple):
-                        return_value = func_to_call(*parameter)
-                    else:
-                        return_value = func_to_call(parameter)
-                except:
-                    traceback.print_exc()
-                    with async_session_lock:
-                        if session_id != async_session_id:
-                            continue
+                    self.execute(device_queue, call)
+                finally:
+                    self.call_done(device_queue, key)
 
-                    if return_error != None:
-                        async_event_queue.put(return_error)
-                        with async_call_queue.mutex:
-                            async_call_queue.queue.clear()
+        def execute(self, device_queue, call):
+            func_to_call = call.func_to_call
+            parameter = call.parameter
 
-                        QApplication.postEvent(self, QEvent(ASYNC_EVENT))
-                        continue
+            if not func_to_call:
+                return
 
-                if return_ok != None:
+            return_value = None
+            try:
+                if parameter == None:
+                    return_value = func_to_call()
+                elif isinstance(parameter, tuple):
+                    return_value = func_to_call(*parameter)
+                else:
+                    return_value = func_to_call(parameter)
+            except:
+                traceback.print_exc()
+                with async_session_lock:
+                    if call.session_id != async_session_id:
+                        return
+
+                return_errors = [return_error for return_error in call.return_errors if return_error != None]
+
+                if len(return_errors) > 0:
+                    # only drop the calls queued for the failing device
                     with async_session_lock:
-                        if session_id != async_session_id:
-                            continue
-
-                    if return_value == None:
-                        async_event_queue.put(return_ok)
-                        QApplication.postEvent(self, QEvent(ASYNC_EVENT))
-                    else:
-                        def return_lambda(return_ok, value):
-                            return lambda: return_ok(value)
-
-                        async_event_queue.put(return_lambda(return_ok, return_value))
-                        QApplication.postEvent(self, QEvent(ASYNC_EVENT))
-
-    async_thread = AsyncThread(parent)
-    async_thread.start()
-    return async_thread
+                        device_queue.clear()
+
+                    for return_error in return_errors:
+                        async_put_result(return_error)
+
+                    return
+
+            with async_session_lock:
+                if call.session_id != async_session_id:
+                    return
+
+            for return_ok in call.return_oks:
+                if return_ok == None:
+                    continue
+
+                if return_value == None:
+                    async_put_result(return_ok)
+                else:
+                    def return_lambda(return_ok, value):
+                        return lambda: return_ok(value)
+
+                    async_put_result(return_lambda(return_ok, return_value))
+
+    global async_event_receiver
+
+    # lives in the GUI thread, so ASYNC_EVENTs are handled there
+    async_event_receiver = AsyncEventReceiver(parent)
+    async_threads = []
+
+    for i in range(ASYNC_WORKER_COUNT):
+        async_thread = AsyncThread(parent)
+        async_thread.start()
+        async_threads.append(async_thread)
+
+    return async_threads
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+async_device_queue.py: Per device call queues of async_call
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# The queues don't depend on Qt, async_call.py executes them with QThreads
+# and delivers the results with Qt events.
+
+from collections import deque
+
+import time
+
+# a full device queue drops its oldest getter to make room for a new call.
+# setters are always queued, a dropped call gets its return_error called
+ASYNC_MAX_QUEUE_DEPTH = 100
+
+class AsyncCall:
+    def __init__(self, func_to_call, parameter, return_ok, return_error, session_id):
+        self.func_to_call = func_to_call
+        self.parameter = parameter
+        self.return_oks = [return_ok]
+        self.return_errors = [return_error]
+        self.session_id = session_id
+        self.queued_time = time.time()
+        self.is_getter = async_is_getter(func_to_call)
+
+class AsyncDeviceQueue:
+    def __init__(self):
+        self.calls = deque()
+        self.pending_getters = {} # (func_to_call, parameter) -> queued AsyncCall
+        self.scheduled = False # in async_ready_queue or being executed
+        self.max_depth = 0
+        self.call_count = 0
+        self.merged_count = 0
+        self.dropped_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def clear(self):
+        self.calls.clear()
+        self.pending_getters.clear()
+
+    def add(self, call):
+        """
+        Queues call, returns the call that was dropped to stay within
+        ASYNC_MAX_QUEUE_DEPTH or None. The dropped call is the oldest queued
+        getter, or call itself if it is a getter and only setters are queued.
+        """
+
+        dropped = None
+
+        if len(self.calls) >= ASYNC_MAX_QUEUE_DEPTH:
+            dropped = self.get_oldest_getter()
+
+            if dropped is None and call.is_getter:
+                dropped = call
+                self.dropped_count += 1
+                return dropped
+
+            if dropped is not None:
+                self.calls.remove(dropped)
+                self.remove_pending_getter(dropped)
+                self.dropped_count += 1
+
+        self.calls.append(call)
+        self.max_depth = max(self.max_depth, len(self.calls))
+
+        getter_key = async_get_getter_key(call.func_to_call, call.parameter)
+
+        if getter_key is not None:
+            self.pending_getters[getter_key] = call
+
+        return dropped
+
+    def merge(self, func_to_call, parameter, return_ok, return_error):
+        """
+        Attaches the return callbacks to an identical queued getter. Returns
+        False if there is none.
+        """
+
+        getter_key = async_get_getter_key(func_to_call, parameter)
+
+        if getter_key not in self.pending_getters:
+            return False
+
+        call = self.pending_getters[getter_key]
+        call.return_oks.append(return_ok)
+        call.return_errors.append(return_error)
+        self.merged_count += 1
+
+        return True
+
+    def get_oldest_getter(self):
+        for call in self.calls:
+            if call.is_getter:
+                return call
+
+        return None
+
+    def remove_pending_getter(self, call):
+        # from now on identical getters have to be queued again
+        getter_key = async_get_getter_key(call.func_to_call, call.parameter)
+
+        if self.pending_getters.get(getter_key) is call:
+            del self.pending_getters[getter_key]
+
+def async_get_device_key(func_to_call):
+    # calls are ordered per device, everything that is not a bound
+    # method of a device shares the None queue
+    return getattr(getattr(func_to_call, '__self__', None), 'uid', None)
+
+def async_is_getter(func_to_call):
+    name = getattr(func_to_call, '__name__', '')
+
+    return name.startswith('get_') or name.startswith('is_')
+
+def async_get_getter_key(func_to_call, parameter):
+    # only getters can be merged, merging setters would reorder them
+    if not async_is_getter(func_to_call):
+        return None
+
+    getter_key = (func_to_call, parameter)
+
+    try:
+        hash(getter_key)
+    except TypeError:
+        return None
+
+    return getter_key
@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+#
+# Redistribution and use in source and binary forms of this file,
+# with or without modification, are permitted. See the Creative
+# Commons Zero (CC0 1.0) License for more details.
+
+# NOTE: this module uses asyncio and requires python 3.7 or newer, in contrast
+#       to ip_connection it cannot be used with python 2
+
+import asyncio
+import hashlib
+import hmac
+import os
+import struct
+import time
+
+try:
+    from .ip_connection import IPConnection, Device, BrickDaemon, Error, get_codec, \
+                               get_uid_from_data, get_length_from_data, \
+                               get_function_id_from_data, get_sequence_number_from_data
+except (ValueError, ImportError, SystemError):
+    from ip_connection import IPConnection, Device, BrickDaemon, Error, get_codec, \
+                              get_uid_from_data, get_length_from_data, \
+                              get_function_id_from_data, get_sequence_number_from_data
+
+class AsyncDevice:
+    """
+    Wraps a Brick or Bricklet object that was created for an
+    AsyncIPConnection. All functions of the wrapped device become coroutine
+    functions, for example:
+
+    servo = AsyncDevice(BrickServo(uid, ipcon))
+    position = await servo.get_position(0)
+
+    Constants and other attributes are passed through unchanged.
+    """
+
+    def __init__(self, device):
+        self.device = device
+
+    def __getattr__(self, name):
+        attribute = getattr(self.device, name)
+
+        if not callable(attribute) or name == 'register_callback':
+            return attribute
+
+        ipcon = self.device.ipcon
+
+        async def call(*args):
+            return await ipcon.call(attribute, *args)
+
+        call.__name__ = name
+        call.__doc__ = attribute.__doc__
+
+        return call
+
+class AsyncIPConnection:
+    """
+    IP Connection for asyncio. Instead of a receive, a callback and a
+    disconnect probe thread per connection everything runs as tasks on the
+    event loop, so one process can talk to many Brick Daemons at once.
+
+    Bricks and Bricklets are created with the normal binding classes and
+    wrapped into an AsyncDevice to get awaitable functions. Callbacks are
+    called on the event loop.
+    """
+
+    DISCONNECT_PROBE_INTERVAL = IPConnection.DISCONNECT_PROBE_INTERVAL
+    MAX_PENDING_REQUESTS = IPConnection.MAX_PENDING_REQUESTS
+
+    # the packet dispatching and decoding does not touch any thread related
+    # state and is shared with the threaded IPConnection
+    dispatch_packet = IPConnection.dispatch_packet
+    deserialize_data = IPConnection.deserialize_data
+
+    class Deferred(Exception):
+        pass
+
+    def __init__(self, loop=None):
+        """
+        Creates an IP Connection object that can be used to enumerate the available
+        devices. It is also required for the constructor of Bricks and Bricklets.
+        """
+
+        self.loop = loop
+        self.host = None
+        self.port = None
+        self.secret = None
+        self.timeout = 2.5
+        self.auto_reconnect = True
+        self.auto_reconnect_pending = False
+        self.auto_reauthenticate = True
+        self.next_sequence_number = 0
+        self.next_authenticate_nonce = 0
+        self.devices = {}
+        self.registered_callbacks = {}
+        self.callback_timestamp = None
+        self.reader = None
+        self.writer = None
+        self.receive_task = None
+        self.disconnect_probe_task = None
+        self.disconnect_probe_flag = False
+        self.disconnect_requested = False
+        self.pending_requests = {} # (uid, function_id, sequence_number) -> future
+        self.pending_request_slots = {} # uid -> asyncio.Semaphore
+        self.deferring = False
+        self.deferred_request = None
+        self.replayed_response = None
+        self.brickd = BrickDaemon("2", self)
+
+    async def connect(self, host, port):
+        """
+        Creates a TCP/IP connection to the given *host* and *port*. The host
+        and port can point to a Brick Daemon or to a WIFI/Ethernet Extension.
+        """
+
+        if self.writer is not None:
+            raise Error(Error.ALREADY_CONNECTED,
+                        'Already connected to {0}:{1}'.format(self.host, self.port))
+
+        self.host = host
+        self.port = port
+        self.secret = None
+
+        await self.connect_unlocked(IPConnection.CONNECT_REASON_REQUEST)
+
+    async def disconnect(self):
+        """
+        Disconnects the TCP/IP connection from the Brick Daemon or the
+        WIFI/Ethernet Extension.
+        """
+
+        self.disconnect_requested = True
+
+        if self.auto_reconnect_pending:
+            self.auto_reconnect_pending = False
+            return
+
+        if self.writer is None:
+            raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+        await self.disconnect_unlocked(IPConnection.DISCONNECT_REASON_REQUEST)
+
+    async def authenticate(self, secret):
+        """
+        Performs an authentication handshake with the connected Brick Daemon
+        or WIFI/Ethernet Extension, see IPConnection.authenticate.
+        """
+
+        secret_bytes = secret.encode('ascii')
+
+        if self.next_authenticate_nonce == 0:
+            self.next_authenticate_nonce = struct.unpack('<I', os.urandom(4))[0]
+
+        server_nonce = await self.call(self.brickd.get_authentication_nonce)
+        client_nonce = struct.unpack('<4B', struct.pack('<I', self.next_authenticate_nonce))
+        self.next_authenticate_nonce = (self.next_authenticate_nonce + 1) % (1 << 32)
+
+        h = hmac.new(secret_bytes, digestmod=hashlib.sha1)
+
+        h.update(struct.pack('<4B', *server_nonce))
+        h.update(struct.pack('<4B', *client_nonce))
+
+        digest = struct.unpack('<20B', h.digest())
+
+        await self.call(self.brickd.authenticate, client_nonce, digest)
+
+        self.secret = secret
+
+    def get_connection_state(self):
+        """
+        Returns CONNECTION_STATE_DISCONNECTED, CONNECTION_STATE_CONNECTED or
+        CONNECTION_STATE_PENDING, see IPConnection.get_connection_state.
+        """
+
+        if self.writer is not None:
+            return IPConnection.CONNECTION_STATE_CONNECTED
+        elif self.auto_reconnect_pending:
+            return IPConnection.CONNECTION_STATE_PENDING
+        else:
+            return IPConnection.CONNECTION_STATE_DISCONNECTED
+
+    def set_auto_reconnect(self, auto_reconnect):
+        """
+        Enables or disables auto-reconnect. Default value is *True*.
+        """
+
+        self.auto_reconnect = bool(auto_reconnect)
+
+    def get_auto_reconnect(self):
+        """
+        Returns *true* if auto-reconnect is enabled, *false* otherwise.
+        """
+
+        return self.auto_reconnect
+
+    def set_auto_reauthenticate(self, auto_reauthenticate):
+        """
+        Enables or disables auto-reauthenticate. Default value is *True*.
+        """
+
+        self.auto_reauthenticate = bool(auto_reauthenticate)
+
+    def get_auto_reauthenticate(self):
+        """
+        Returns *true* if auto-reauthenticate is enabled, *false* otherwise.
+        """
+
+        return self.auto_reauthenticate
+
+    def set_timeout(self, timeout):
+        """
+        Sets the timeout in seconds for getters and for setters for which the
+        response expected flag is activated.
+
+        Default timeout is 2.5.
+        """
+
+        timeout = float(timeout)
+
+        if timeout < 0:
+            raise ValueError('Timeout cannot be negative')
+
+        self.timeout = timeout
+
+    def get_timeout(self):
+        """
+        Returns the timeout as set by set_timeout.
+        """
+
+        return self.timeout
+
+    def enumerate(self):
+        """
+        Broadcasts an enumerate request. All devices will respond with an
+        enumerate callback.
+        """
+
+        request, _, _ = self.create_packet_header(None, 8, IPConnection.FUNCTION_ENUMERATE)
+
+        self.send(request)
+
+    def register_callback(self, id, callback):
+        """
+        Registers a callback with ID *id* to the function *callback*.
+        """
+
+        self.registered_callbacks[id] = callback
+
+    def get_callback_timestamp(self):
+        """
+        Returns the time at which the packet of the callback that is currently
+        being called was received, in seconds of time.monotonic(). Only valid
+        within a callback function.
+        """
+
+        return self.callback_timestamp
+
+    async def call(self, function, *args):
+        """
+        Calls the device function *function* with the arguments *args* and
+        returns its return value without blocking the event loop.
+        """
+
+        device = getattr(function, '__self__', None)
+
+        if isinstance(device, Device):
+            # up to 15 requests can be in-flight per device
+            slot = self.pending_request_slots.get(device.uid)
+
+            if slot is None:
+                slot = asyncio.Semaphore(AsyncIPConnection.MAX_PENDING_REQUESTS)
+                self.pending_request_slots[device.uid] = slot
+        else:
+            slot = None
+
+        if slot is not None:
+            await slot.acquire()
+
+        try:
+            # the device function is called twice. the first call ends in
+            # send_request that sends the request and raises Deferred. the
+            # second call gets the response from send_request and does the
+            # same post-processing as for the threaded IPConnection
+            self.deferring = True
+
+            try:
+                return function(*args)
+            except AsyncIPConnection.Deferred:
+                key = self.deferred_request
+            finally:
+                self.deferring = False
+                self.deferred_request = None
+
+            if key is None:
+                return None
+
+            try:
+                response = await asyncio.wait_for(self.pending_requests[key], self.timeout)
+            except asyncio.TimeoutError:
+                msg = 'Did not receive response for function {0} in time'.format(key[1])
+                raise Error(Error.TIMEOUT, msg)
+            except asyncio.CancelledError:
+                if self.writer is None:
+                    raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+                raise
+            finally:
+                self.pending_requests.pop(key, None)
+
+            self.replayed_response = response
+
+            try:
+                return function(*args)
+            finally:
+                self.replayed_response = None
+        finally:
+            if slot is not None:
+                slot.release()
+
+    def send_request(self, device, function_id, data, form, form_ret):
+        if self.deferring:
+            codec = get_codec(form)
+            payload = codec.pack(data)
+
+            while True:
+                request, response_expected, sequence_number = \
+                    self.create_packet_header(device, 8 + codec.size, function_id)
+                key = (device.uid, function_id, sequence_number)
+
+                # the sequence number might have wrapped around while an
+                # older request for the same function is still in-flight
+                if not response_expected or key not in self.pending_requests:
+                    break
+
+            self.send(request + payload)
+
+            if response_expected:
+                self.pending_requests[key] = self.get_loop().create_future()
+                self.deferred_request = key
+            else:
+                self.deferred_request = None
+
+            raise AsyncIPConnection.Deferred()
+
+        if self.replayed_response is None:
+            raise Error(Error.NOT_SUPPORTED,
+                        'Device functions have to be called via AsyncIPConnection.call or AsyncDevice')
+
+        response = self.replayed_response
+        self.replayed_response = None
+
+        return self.unpack_response(response, function_id, form_ret)
+
+    unpack_response = IPConnection.unpack_response
+
+    def get_loop(self):
+        # only called from coroutines, so there is always a running loop
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+
+        return self.loop
+
+    def get_next_sequence_number(self):
+        sequence_number = self.next_sequence_number + 1
+        self.next_sequence_number = sequence_number % 15
+        return sequence_number
+
+    create_packet_header = IPConnection.create_packet_header
+
+    def send(self, packet):
+        if self.writer is None:
+            raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+        self.writer.write(packet)
+        self.disconnect_probe_flag = False
+
+    async def connect_unlocked(self, connect_reason):
+        try:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as e:
+            raise Error(Error.NOT_CONNECTED,
+                        'Could not connect to {0}:{1}: {2}'.format(self.host, self.port, e))
+
+        self.disconnect_requested = False
+        self.auto_reconnect_pending = False
+        self.receive_task = self.get_loop().create_task(self.receive_loop(self.reader))
+        self.disconnect_probe_task = self.get_loop().create_task(self.disconnect_probe_loop())
+
+        self.dispatch_meta(IPConnection.CALLBACK_CONNECTED, connect_reason)
+
+    async def disconnect_unlocked(self, disconnect_reason):
+        writer = self.writer
+
+        if writer is None:
+            return
+
+        self.writer = None
+        self.reader = None
+        self.secret = None
+
+        for task in [self.disconnect_probe_task, self.receive_task]:
+            if task is not None and task is not asyncio.current_task(self.get_loop()):
+                task.cancel()
+
+        self.disconnect_probe_task = None
+        self.receive_task = None
+
+        for future in self.pending_requests.values():
+            if not future.done():
+                future.cancel()
+
+        writer.close()
+
+        self.dispatch_meta(IPConnection.CALLBACK_DISCONNECTED, disconnect_reason)
+
+    async def receive_loop(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(8)
+                length = get_length_from_data(header)
+
+                if length > 8:
+                    packet = header + await reader.readexactly(length - 8)
+                else:
+                    packet = header
+
+                self.handle_response(packet)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.IncompleteReadError:
+            disconnect_reason = IPConnection.DISCONNECT_REASON_SHUTDOWN
+        except OSError:
+            disconnect_reason = IPConnection.DISCONNECT_REASON_ERROR
+
+        if self.reader is reader:
+            await self.handle_disconnect_by_peer(disconnect_reason)
+
+    async def disconnect_probe_loop(self):
+        request, _, _ = self.create_packet_header(None, 8, IPConnection.FUNCTION_DISCONNECT_PROBE)
+
+        while True:
+            await asyncio.sleep(AsyncIPConnection.DISCONNECT_PROBE_INTERVAL)
+
+            if self.disconnect_probe_flag:
+                try:
+                    self.send(request)
+                except Error:
+                    break
+            else:
+                self.disconnect_probe_flag = True
+
+    async def handle_disconnect_by_peer(self, disconnect_reason):
+        secret = self.secret
+
+        await self.disconnect_unlocked(disconnect_reason)
+
+        if not self.auto_reconnect or self.disconnect_requested:
+            return
+
+        self.auto_reconnect_pending = True
+
+        while self.auto_reconnect_pending and self.auto_reconnect:
+            # FIXME: wait a moment here, otherwise the next connect attempt
+            # will succeed, even if there is no open server socket
+            await asyncio.sleep(0.1)
+
+            if not self.auto_reconnect_pending:
+                break
+
+            try:
+                await self.connect_unlocked(IPConnection.CONNECT_REASON_AUTO_RECONNECT)
+            except Error:
+                continue
+
+            if self.auto_reauthenticate and secret is not None:
+                try:
+                    await self.authenticate(secret)
+                except Error:
+                    # FIXME: how to handle errors here?
+                    pass
+
+            break
+
+        self.auto_reconnect_pending = False
+
+    def dispatch_meta(self, function_id, parameter):
+        cb = self.registered_callbacks.get(function_id)
+
+        if cb is not None:
+            cb(parameter)
+
+    def handle_response(self, packet):
+        self.disconnect_probe_flag = False
+
+        function_id = get_function_id_from_data(packet)
+        sequence_number = get_sequence_number_from_data(packet)
+
+        if sequence_number == 0:
+            # callbacks are dispatched directly on the event loop
+            self.callback_timestamp = time.monotonic()
+
+            # an error in a user callback must not end the receive loop,
+            # otherwise all pending requests would hang. it is reported
+            # like an error in any other callback of the event loop
+            try:
+                self.dispatch_packet(packet)
+            except Exception as e:
+                self.get_loop().call_exception_handler({'message': 'Exception in callback for function {0}'.format(function_id),
+                                                        'exception': e})
+
+            return
+
+        key = (get_uid_from_data(packet), function_id, sequence_number)
+        future = self.pending_requests.get(key)
+
+        if future is not None and not future.done():
+            future.set_result(packet)
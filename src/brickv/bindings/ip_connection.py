@@ -6,7 +6,7 @@
 # with or without modification, are permitted. See the Creative
 # Commons Zero (CC0 1.0) License for more details.
 
-from threading import Thread, Lock, Semaphore
+from threading import Thread, Lock, Semaphore, local
 
 # current_thread for python 2.6, currentThread for python 2.5
 try:
@@ -30,6 +30,74 @@ import math
 import hmac
 import hashlib
 
+def get_native_monotonic_time_function():
+    # python 2 has no monotonic clock, use the one of the operating system
+    import ctypes
+    import ctypes.util
+
+    if sys.platform == 'win32':
+        kernel32 = ctypes.windll.kernel32
+        frequency = ctypes.c_int64()
+
+        if not kernel32.QueryPerformanceFrequency(ctypes.byref(frequency)):
+            return None
+
+        def monotonic_time():
+            counter = ctypes.c_int64()
+            kernel32.QueryPerformanceCounter(ctypes.byref(counter))
+            return counter.value / float(frequency.value)
+    elif sys.platform == 'darwin':
+        class mach_timebase_info_data_t(ctypes.Structure):
+            _fields_ = [('numer', ctypes.c_uint32), ('denom', ctypes.c_uint32)]
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        libc.mach_absolute_time.restype = ctypes.c_uint64
+        timebase = mach_timebase_info_data_t()
+
+        if libc.mach_timebase_info(ctypes.byref(timebase)) != 0:
+            return None
+
+        scale = timebase.numer / float(timebase.denom) / 1000000000.0
+
+        def monotonic_time():
+            return libc.mach_absolute_time() * scale
+    else:
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        if sys.platform.startswith('freebsd'):
+            CLOCK_MONOTONIC = 4
+        else:
+            CLOCK_MONOTONIC = 1
+
+        # clock_gettime is in librt for glibc before 2.17
+        libc = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = libc.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec())) != 0:
+            return None
+
+        def monotonic_time():
+            t = timespec()
+            clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t))
+            return t.tv_sec + t.tv_nsec / 1000000000.0
+
+    return monotonic_time
+
+# monotonic clock for python 3, python 2 uses the one of the operating system
+# and falls back to the wall clock if that is not available
+try:
+    from time import monotonic as get_monotonic_time
+except ImportError:
+    try:
+        get_monotonic_time = get_native_monotonic_time_function()
+    except Exception:
+        get_monotonic_time = None
+
+    if get_monotonic_time is None:
+        get_monotonic_time = time.time
+
 # use normal tuples instead of namedtuples in python version below 2.6
 if sys.hexversion < 0x02060000:
     def namedtuple(typename, field_names, verbose=False, rename=False):
@@ -55,6 +123,137 @@ def get_sequence_number_from_data(data):
 def get_error_code_from_data(data):
     return (struct.unpack('<B', data[7:8])[0] >> 6) & 0x03
 
+def decode_char(c):
+    if sys.hexversion >= 0x03000000:
+        c = c.decode('ascii')
+
+    return c
+
+def decode_string(s):
+    if sys.hexversion >= 0x03000000:
+        s = s.decode('ascii')
+
+    i = s.find(chr(0))
+    if i >= 0:
+        s = s[:i]
+
+    return s
+
+def encode_char(c):
+    if sys.hexversion < 0x03000000:
+        if type(c) == types.UnicodeType:
+            return chr(ord(c))
+    elif isinstance(c, str):
+        return bytes([ord(c)])
+
+    return c
+
+def encode_string(s):
+    if sys.hexversion < 0x03000000:
+        if type(s) == types.UnicodeType:
+            return ''.join(map(chr, map(ord, s)))
+    elif isinstance(s, str):
+        return bytes(map(ord, s))
+
+    return s
+
+class Codec:
+    """
+    Packs and unpacks the payload described by a form string such as
+    'c B 8s 3H'. The form is compiled once into a single struct.Struct plus
+    a list of (kind, count) entries describing how the flat list of struct
+    values maps back to the individual fields.
+    """
+
+    FIELD_VALUE = 0
+    FIELD_ARRAY = 1
+    FIELD_CHAR = 2
+    FIELD_CHAR_ARRAY = 3
+    FIELD_STRING = 4
+
+    def __init__(self, form):
+        self.form = form
+        self.fields = []
+
+        if len(form) > 0:
+            items = form.split(' ')
+        else:
+            items = []
+
+        for f in items:
+            # number of values struct produces for this field, a 1-element
+            # array is handled as a plain value
+            count = len(struct.unpack('<' + f, b'\0' * struct.calcsize('<' + f)))
+
+            if 's' in f:
+                self.fields.append((Codec.FIELD_STRING, 1))
+            elif 'c' in f:
+                if count > 1:
+                    self.fields.append((Codec.FIELD_CHAR_ARRAY, count))
+                else:
+                    self.fields.append((Codec.FIELD_CHAR, 1))
+            elif count > 1:
+                self.fields.append((Codec.FIELD_ARRAY, count))
+            else:
+                self.fields.append((Codec.FIELD_VALUE, 1))
+
+        self.struct = struct.Struct('<' + ''.join(items))
+        self.size = self.struct.size
+
+    def pack(self, data):
+        values = []
+
+        for (kind, count), d in zip(self.fields, data):
+            if kind == Codec.FIELD_VALUE:
+                values.append(d)
+            elif kind == Codec.FIELD_ARRAY:
+                values.extend(d)
+            elif kind == Codec.FIELD_STRING:
+                values.append(encode_string(d))
+            elif kind == Codec.FIELD_CHAR:
+                values.append(encode_char(d))
+            else:
+                if count != len(d):
+                    raise ValueError('Incorrect char list length')
+
+                values.extend(map(encode_char, d))
+
+        return self.struct.pack(*values)
+
+    def unpack(self, data):
+        values = self.struct.unpack_from(data)
+        ret = []
+        i = 0
+
+        for kind, count in self.fields:
+            if kind == Codec.FIELD_VALUE:
+                ret.append(values[i])
+            elif kind == Codec.FIELD_ARRAY:
+                ret.append(values[i:i + count])
+            elif kind == Codec.FIELD_STRING:
+                ret.append(decode_string(values[i]))
+            elif kind == Codec.FIELD_CHAR:
+                ret.append(decode_char(values[i]))
+            else:
+                ret.append(tuple(map(decode_char, values[i:i + count])))
+
+            i += count
+
+        if len(ret) == 1:
+            return ret[0]
+        else:
+            return ret
+
+codec_cache = {}
+
+def get_codec(form):
+    try:
+        return codec_cache[form]
+    except KeyError:
+        codec = Codec(form)
+        codec_cache[form] = codec # benign race, both threads build the same codec
+        return codec
+
 BASE58 = '123456789abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ'
 def base58encode(value):
     encoded = ''
@@ -125,10 +324,10 @@ class Device:
         self.api_version = (0, 0, 0)
         self.registered_callbacks = {}
         self.callback_formats = {}
-        self.expected_response_function_id = None # protected by request_lock
-        self.expected_response_sequence_number = None # protected by request_lock
-        self.response_queue = Queue()
         self.request_lock = Lock()
+        self.pending_requests = {} # protected by pending_request_lock
+        self.pending_request_lock = Lock()
+        self.pending_request_slots = Semaphore(IPConnection.MAX_PENDING_REQUESTS)
 
         self.response_expected = [Device.RESPONSE_EXPECTED_INVALID_FUNCTION_ID] * 256
         self.response_expected[IPConnection.FUNCTION_ENUMERATE] = Device.RESPONSE_EXPECTED_ALWAYS_FALSE
@@ -286,6 +485,12 @@ class IPConnection:
 
     DISCONNECT_PROBE_INTERVAL = 5
 
+    RECEIVE_CHUNK_SIZE = 8192
+    RECEIVE_BUFFER_SIZE = 4 * RECEIVE_CHUNK_SIZE
+
+    # sequence numbers are 4 bit wide and 0 is reserved for callbacks
+    MAX_PENDING_REQUESTS = 15
+
     class CallbackContext:
         def __init__(self):
             self.queue = None
@@ -293,6 +498,23 @@ class IPConnection:
             self.packet_dispatch_allowed = False
             self.lock = None
 
+    class PendingRequest:
+        def __init__(self, device, function_id, sequence_number):
+            self.device = device
+            self.function_id = function_id
+            self.sequence_number = sequence_number
+            self.queue = Queue()
+
+    class BatchContext:
+        def __init__(self):
+            self.deferring = False
+            self.deferred_request = None
+            self.replayed_requests = []
+            self.deadline = None
+
+    class BatchDeferred(Exception):
+        pass
+
     def __init__(self):
         """
         Creates an IP Connection object that can be used to enumerate the available
@@ -307,6 +529,8 @@ class IPConnection:
         self.auto_reconnect_allowed = False
         self.auto_reconnect_pending = False
         self.auto_reauthenticate = True
+        self.pipelining = False
+        self.batch_local = local()
         self.sequence_number_lock = Lock()
         self.next_sequence_number = 0 # protected by sequence_number_lock
         self.next_authenticate_nonce = 0 # protected by sequence_number_lock
@@ -318,7 +542,9 @@ class IPConnection:
         self.socket_send_lock = Lock()
         self.receive_flag = False
         self.receive_thread = None
+        self.receive_timestamp = None # only used by the receive thread
         self.callback = None
+        self.callback_timestamp = None # only used by the callback thread
         self.disconnect_probe_flag = False
         self.disconnect_probe_queue = None
         self.disconnect_probe_thread = None
@@ -475,6 +701,25 @@ class IPConnection:
 
         return self.auto_reauthenticate
 
+    def set_pipelining(self, pipelining):
+        """
+        Enables or disables pipelining. If pipelining is enabled, requests
+        to the same device are not serialized anymore. Up to 15 requests per
+        device can be in-flight at the same time, their responses are
+        matched by function ID and sequence number.
+
+        Default value is *False*.
+        """
+
+        self.pipelining = bool(pipelining)
+
+    def get_pipelining(self):
+        """
+        Returns *true* if pipelining is enabled, *false* otherwise.
+        """
+
+        return self.pipelining
+
     def set_timeout(self, timeout):
         """
         Sets the timeout in seconds for getters and for setters for which the
@@ -536,6 +781,84 @@ class IPConnection:
 
         self.registered_callbacks[id] = callback
 
+    def get_callback_timestamp(self):
+        """
+        Returns the time at which the packet of the callback that is currently
+        being called was received, in seconds of a monotonic clock. Only
+        valid within a callback function.
+        """
+
+        return self.callback_timestamp
+
+    def call_many(self, calls):
+        """
+        Calls several device functions at once and returns a list of their
+        return values. Each entry of *calls* is either a device function or
+        a (function, arguments) tuple, for example:
+
+        ipcon.call_many([servo.get_stack_input_voltage,
+                         (servo.get_current_position, (0,))])
+
+        All requests are sent before waiting for the first response, so up
+        to 15 calls are done in a single round trip. Longer lists are split
+        into groups of 15 calls. An error raised by one of the calls is
+        passed on, the remaining responses of its group are discarded.
+
+        Each function is called twice: the first call only sends its request,
+        the second call gets the response of that request and converts it to
+        the return value. Only pass device functions of the bindings, other
+        code in the functions runs twice.
+        """
+
+        results = []
+
+        for offset in range(0, len(calls), IPConnection.MAX_PENDING_REQUESTS):
+            results += self.call_many_group(calls[offset:offset + IPConnection.MAX_PENDING_REQUESTS])
+
+        return results
+
+    def call_many_group(self, calls):
+        batch = IPConnection.BatchContext()
+        previous_batch = getattr(self.batch_local, 'batch', None)
+        results = [None] * len(calls)
+        deferred = []
+
+        self.batch_local.batch = batch
+
+        try:
+            # send all requests, send_request raises BatchDeferred instead
+            # of waiting for the response
+            batch.deferring = True
+
+            for i, call in enumerate(calls):
+                if isinstance(call, tuple):
+                    function, args = call
+                else:
+                    function, args = call, ()
+
+                try:
+                    results[i] = function(*args)
+                except IPConnection.BatchDeferred:
+                    deferred.append((i, function, args, batch.deferred_request))
+
+            batch.deferring = False
+            batch.deadline = get_monotonic_time() + self.timeout
+
+            # call the functions again, this time send_request picks up the
+            # response of the request that was already sent instead of sending
+            # a new one, so the device function can unpack it as usual
+            for i, function, args, pending_request in deferred:
+                batch.replayed_requests = [pending_request]
+                results[i] = function(*args)
+        finally:
+            self.batch_local.batch = previous_batch
+
+            for _, _, _, pending_request in deferred:
+                if pending_request is not None:
+                    self.end_pipelined_request(pending_request)
+
+        return results
+
     def connect_unlocked(self, is_auto_reconnect):
         # NOTE: assumes that socket_lock is locked
 
@@ -684,14 +1007,67 @@ class IPConnection:
         self.secret = None
 
     def receive_loop(self, socket_id):
-        if sys.hexversion < 0x03000000:
-            pending_data = ''
-        else:
-            pending_data = bytes()
+        # memoryview is new in python 2.7
+        if sys.hexversion < 0x02070000:
+            self.receive_loop_without_memoryview(socket_id)
+            return
+
+        # received data is collected in a preallocated buffer, complete
+        # packets are copied out by offset. pending data is only moved to
+        # the front of the buffer if there is not enough room left for the
+        # next recv_into call
+        buffer = bytearray(IPConnection.RECEIVE_BUFFER_SIZE)
+        view = memoryview(buffer)
+        start = 0 # start of pending data
+        end = 0 # end of pending data
+
+        while self.receive_flag:
+            if len(buffer) - end < IPConnection.RECEIVE_CHUNK_SIZE:
+                buffer[0:end - start] = buffer[start:end]
+                end -= start
+                start = 0
+
+            try:
+                length = self.socket.recv_into(view[end:end + IPConnection.RECEIVE_CHUNK_SIZE])
+            except socket.error:
+                if self.receive_flag:
+                    self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_ERROR, socket_id, False)
+                break
+
+            if length == 0:
+                if self.receive_flag:
+                    self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_SHUTDOWN, socket_id, False)
+                break
+
+            end += length
+            self.receive_timestamp = get_monotonic_time()
+
+            while self.receive_flag:
+                if end - start < 8:
+                    # Wait for complete header
+                    break
+
+                length = buffer[start + 4]
+
+                if end - start < length:
+                    # Wait for complete packet
+                    break
+
+                packet = view[start:start + length].tobytes()
+                start += length
+
+                self.handle_response(packet)
+
+            if start == end:
+                start = 0
+                end = 0
+
+    def receive_loop_without_memoryview(self, socket_id):
+        pending_data = ''
 
         while self.receive_flag:
             try:
-                data = self.socket.recv(8192)
+                data = self.socket.recv(IPConnection.RECEIVE_CHUNK_SIZE)
             except socket.error:
                 if self.receive_flag:
                     self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_ERROR, socket_id, False)
@@ -703,6 +1079,7 @@ class IPConnection:
                 break
 
             pending_data += data
+            self.receive_timestamp = get_monotonic_time()
 
             while self.receive_flag:
                 if len(pending_data) < 8:
@@ -831,7 +1208,8 @@ class IPConnection:
                 elif kind == IPConnection.QUEUE_PACKET:
                     # don't dispatch callbacks when the receive thread isn't running
                     if callback.packet_dispatch_allowed:
-                        self.dispatch_packet(data)
+                        packet, self.callback_timestamp = data
+                        self.dispatch_packet(packet)
 
     # NOTE: the disconnect probe thread is not allowed to hold the socket_lock at any
     #       time because it is created and joined while the socket_lock is locked
@@ -857,45 +1235,13 @@ class IPConnection:
                 self.disconnect_probe_flag = True
 
     def deserialize_data(self, data, form):
-        ret = []
-        for f in form.split(' '):
-            f = '<' + f
-            length = struct.calcsize(f)
-
-            x = struct.unpack(f, data[:length])
-            if len(x) > 1:
-                if 'c' in f:
-                    x = tuple([self.handle_deserialized_char(c) for c in x])
-                ret.append(x)
-            elif 'c' in f:
-                ret.append(self.handle_deserialized_char(x[0]))
-            elif 's' in f:
-                ret.append(self.handle_deserialized_string(x[0]))
-            else:
-                ret.append(x[0])
-
-            data = data[length:]
-
-        if len(ret) == 1:
-            return ret[0]
-        else:
-            return ret
+        return get_codec(form).unpack(data)
 
     def handle_deserialized_char(self, c):
-        if sys.hexversion >= 0x03000000:
-            c = c.decode('ascii')
-
-        return c
+        return decode_char(c)
 
     def handle_deserialized_string(self, s):
-        if sys.hexversion >= 0x03000000:
-            s = s.decode('ascii')
-
-        i = s.find(chr(0))
-        if i >= 0:
-            s = s[:i]
-
-        return s
+        return decode_string(s)
 
     def send(self, packet):
         with self.socket_lock:
@@ -912,84 +1258,126 @@ class IPConnection:
             self.disconnect_probe_flag = False
 
     def send_request(self, device, function_id, data, form, form_ret):
-        length = 8 + struct.calcsize('<' + form)
-        request, response_expected, sequence_number = \
-            self.create_packet_header(device, length, function_id)
-
-        def pack_string(f, d):
-            if sys.hexversion < 0x03000000:
-                if type(d) == types.UnicodeType:
-                    f = f.replace('s', 'B')
-                    l = map(ord, d)
-                    l += [0] * (int(f.replace('B', '')) - len(l))
-                    return struct.pack('<' + f, *l)
-
-                else:
-                    return struct.pack('<' + f, d)
+        codec = get_codec(form)
+        payload = codec.pack(data)
+        length = 8 + codec.size
+        batch = getattr(self.batch_local, 'batch', None)
+
+        if batch is not None and batch.deferring:
+            # first pass of call_many: send the request and return to
+            # call_many without waiting for the response
+            if device.get_response_expected(function_id):
+                batch.deferred_request = self.start_pipelined_request(device, function_id, length, payload)
             else:
-                if isinstance(d, str):
-                    return struct.pack('<' + f, bytes(map(ord, d)))
-                else:
-                    return struct.pack('<' + f, d)
+                request, _, _ = self.create_packet_header(device, length, function_id)
+                self.send(request + payload)
+                batch.deferred_request = None
 
-        for f, d in zip(form.split(' '), data):
-            if len(f) > 1 and not 's' in f and not 'c' in f:
-                request += struct.pack('<' + f, *d)
-            elif 's' in f:
-                request += pack_string(f, d)
-            elif 'c' in f:
-                if len(f) > 1:
-                    if int(f.replace('c', '')) != len(d):
-                        raise ValueError('Incorrect char list length');
-                    for k in d:
-                        request += pack_string('c', k)
-                else:
-                    request += pack_string(f, d)
-            else:
-                request += struct.pack('<' + f, d)
+            raise IPConnection.BatchDeferred()
 
-        if response_expected:
+        if batch is not None and len(batch.replayed_requests) > 0:
+            # second pass of call_many: the request was already sent
+            pending_request = batch.replayed_requests.pop()
+
+            if pending_request is None:
+                return None
+
+            response = self.finish_pipelined_request(pending_request, batch.deadline)
+        elif not device.get_response_expected(function_id):
+            request, _, _ = self.create_packet_header(device, length, function_id)
+
+            self.send(request + payload)
+            return None
+        elif self.pipelining:
+            pending_request = self.start_pipelined_request(device, function_id, length, payload)
+            response = self.finish_pipelined_request(pending_request)
+        else:
+            # without pipelining requests to the same device are serialized,
+            # but their sequence numbers are allocated the same way as for
+            # pipelined requests. otherwise a blocking request could get the
+            # same function ID and sequence number as a pipelined one that
+            # is in-flight at the same time, for example from call_many
             with device.request_lock:
-                device.expected_response_function_id = function_id
-                device.expected_response_sequence_number = sequence_number
+                pending_request = self.start_pipelined_request(device, function_id, length, payload)
+                response = self.finish_pipelined_request(pending_request)
 
-                try:
-                    self.send(request)
-
-                    while True:
-                        response = device.response_queue.get(True, self.timeout)
-
-                        if function_id == get_function_id_from_data(response) and \
-                           sequence_number == get_sequence_number_from_data(response):
-                            # ignore old responses that arrived after the timeout expired, but before setting
-                            # expected_response_function_id and expected_response_sequence_number back to None
-                            break
-                except Empty:
-                    msg = 'Did not receive response for function {0} in time'.format(function_id)
-                    raise Error(Error.TIMEOUT, msg)
-                finally:
-                    device.expected_response_function_id = None
-                    device.expected_response_sequence_number = None
-
-            error_code = get_error_code_from_data(response)
-
-            if error_code == 0:
-                # no error
-                pass
-            elif error_code == 1:
-                msg = 'Got invalid parameter for function {0}'.format(function_id)
-                raise Error(Error.INVALID_PARAMETER, msg)
-            elif error_code == 2:
-                msg = 'Function {0} is not supported'.format(function_id)
-                raise Error(Error.NOT_SUPPORTED, msg)
-            else:
-                msg = 'Function {0} returned an unknown error'.format(function_id)
-                raise Error(Error.UNKNOWN_ERROR_CODE, msg)
+        return self.unpack_response(response, function_id, form_ret)
+
+    def unpack_response(self, response, function_id, form_ret):
+        # raises the error reported in the header of the response, otherwise
+        # returns the deserialized payload. shared with AsyncIPConnection
+        error_code = get_error_code_from_data(response)
+
+        if error_code == 0:
+            # no error
+            pass
+        elif error_code == 1:
+            msg = 'Got invalid parameter for function {0}'.format(function_id)
+            raise Error(Error.INVALID_PARAMETER, msg)
+        elif error_code == 2:
+            msg = 'Function {0} is not supported'.format(function_id)
+            raise Error(Error.NOT_SUPPORTED, msg)
+        else:
+            msg = 'Function {0} returned an unknown error'.format(function_id)
+            raise Error(Error.UNKNOWN_ERROR_CODE, msg)
+
+        if len(form_ret) > 0:
+            return self.deserialize_data(response[8:], form_ret)
+
+    def start_pipelined_request(self, device, function_id, length, payload):
+        # all requests that expect a response get their sequence number here,
+        # under pending_request_lock, so no two of them can wait for the same
+        # function ID and sequence number at the same time.
+        # blocks if there are already 15 requests in-flight for this device
+        device.pending_request_slots.acquire()
+
+        try:
+            with device.pending_request_lock:
+                while True:
+                    request, _, sequence_number = \
+                        self.create_packet_header(device, length, function_id)
+
+                    # the sequence number might have wrapped around while an
+                    # older request for the same function is still in-flight
+                    if (function_id, sequence_number) not in device.pending_requests:
+                        break
+
+                pending_request = IPConnection.PendingRequest(device, function_id, sequence_number)
+                device.pending_requests[(function_id, sequence_number)] = pending_request
+        except:
+            device.pending_request_slots.release()
+            raise
+
+        try:
+            self.send(request + payload)
+        except:
+            self.end_pipelined_request(pending_request)
+            raise
+
+        return pending_request
 
-            if len(form_ret) > 0:
-                return self.deserialize_data(response[8:], form_ret)
+    def finish_pipelined_request(self, pending_request, deadline=None):
+        if deadline is None:
+            timeout = self.timeout
         else:
-            self.send(request)
+            timeout = max(deadline - get_monotonic_time(), 0)
+
+        try:
+            return pending_request.queue.get(True, timeout)
+        except Empty:
+            msg = 'Did not receive response for function {0} in time'.format(pending_request.function_id)
+            raise Error(Error.TIMEOUT, msg)
+        finally:
+            self.end_pipelined_request(pending_request)
+
+    def end_pipelined_request(self, pending_request):
+        device = pending_request.device
+        key = (pending_request.function_id, pending_request.sequence_number)
+
+        with device.pending_request_lock:
+            if device.pending_requests.get(key) is pending_request:
+                del device.pending_requests[key]
+                device.pending_request_slots.release()
 
     def get_next_sequence_number(self):
         with self.sequence_number_lock:
@@ -1005,7 +1393,7 @@ class IPConnection:
 
         if sequence_number == 0 and function_id == IPConnection.CALLBACK_ENUMERATE:
             if IPConnection.CALLBACK_ENUMERATE in self.registered_callbacks:
-                self.callback.queue.put((IPConnection.QUEUE_PACKET, packet))
+                self.callback.queue.put((IPConnection.QUEUE_PACKET, (packet, self.receive_timestamp)))
             return
 
         uid = get_uid_from_data(packet)
@@ -1018,12 +1406,13 @@ class IPConnection:
 
         if sequence_number == 0:
             if function_id in device.registered_callbacks:
-                self.callback.queue.put((IPConnection.QUEUE_PACKET, packet))
+                self.callback.queue.put((IPConnection.QUEUE_PACKET, (packet, self.receive_timestamp)))
             return
 
-        if device.expected_response_function_id == function_id and \
-           device.expected_response_sequence_number == sequence_number:
-            device.response_queue.put(packet)
+        pending_request = device.pending_requests.get((function_id, sequence_number))
+
+        if pending_request is not None:
+            pending_request.queue.put(packet)
             return
 
         # Response seems to be OK, but can't be handled
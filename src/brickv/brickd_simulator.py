@@ -0,0 +1,637 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+brickd_simulator.py: Local Brick Daemon stand-in for load and latency testing
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# The simulator speaks the TCP/IP protocol of the Brick Daemon and simulates
+# stacks of Bricks and Bricklets. Request and response formats are taken from
+# the binding classes in brickv.bindings, so every device known to the
+# bindings can be simulated. Getters return scripted or generated values,
+# callbacks are sent with the period configured by the client via the
+# set_*_callback_period functions or with a fixed flood period that the
+# client cannot change.
+#
+# Example configuration file (--config):
+#
+# {
+#   "devices": [
+#     {"class": "BrickMaster", "uid": "6qzRzc", "position": "0"},
+#     {"class": "BrickletTemperature", "uid": "bTh", "connected_uid": "6qzRzc",
+#      "position": "a", "values": {"get_temperature": 2150},
+#      "callbacks": {"temperature": {"period": 100, "values": [2100, 2150, 2200]}}}
+#   ]
+# }
+
+import argparse
+import glob
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+# Allow brickd_simulator to be directly started by calling "brickd_simulator.py"
+# without "brickv" being in the path already
+if not 'brickv' in sys.modules:
+    head, tail = os.path.split(os.path.dirname(os.path.realpath(__file__)))
+    if not head in sys.path:
+        sys.path.insert(0, head)
+
+from brickv.bindings.ip_connection import IPConnection, Device, BrickDaemon, \
+                                          get_codec, base58encode, base58decode, \
+                                          get_uid_from_data, get_length_from_data, \
+                                          get_function_id_from_data
+
+ENUMERATE_FORM = '8s 8s c 3B 3B H B'
+IDENTITY_FORM = '8s 8s c 3B 3B H'
+
+BRICKD_UID = base58decode('2')
+
+DEFAULT_BRICKLET_CLASSES = ['BrickletTemperature', 'BrickletAmbientLight',
+                            'BrickletHumidity', 'BrickletVoltageCurrent',
+                            'BrickletBarometer', 'BrickletSoundIntensity',
+                            'BrickletDistanceIR', 'BrickletIO4']
+
+class FunctionInfo:
+    def __init__(self, function_id, name, form, form_ret):
+        self.function_id = function_id
+        self.name = name
+        self.form = form
+        self.form_ret = form_ret
+
+class DeviceClassInfo:
+    """
+    Request and callback formats of a binding class, recorded by calling
+    every function of the class with a recording IP Connection.
+    """
+
+    class Recorded(Exception):
+        pass
+
+    class Recorder:
+        def __init__(self):
+            self.devices = {}
+            self.recorded = None
+
+        def send_request(self, device, function_id, data, form, form_ret):
+            self.recorded = (function_id, form, form_ret)
+            raise DeviceClassInfo.Recorded()
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.name = cls.__name__
+        self.device_identifier = cls.DEVICE_IDENTIFIER
+        self.functions = {} # function_id -> FunctionInfo
+        self.callbacks = {} # callback_id -> (name, form)
+        self.period_setters = {} # function_id -> callback_id
+        self.period_getters = {} # function_id -> callback_id
+
+        recorder = DeviceClassInfo.Recorder()
+        device = cls('1', recorder)
+
+        for attribute in dir(cls):
+            if attribute.startswith('FUNCTION_'):
+                name = attribute[len('FUNCTION_'):].lower()
+                method = getattr(device, name, None)
+
+                if method is None:
+                    continue
+
+                argument_count = method.__func__.__code__.co_argcount - 1
+
+                try:
+                    method(*([0] * argument_count))
+                except DeviceClassInfo.Recorded:
+                    function_id, form, form_ret = recorder.recorded
+                    self.functions[function_id] = FunctionInfo(function_id, name, form, form_ret)
+            elif attribute.startswith('CALLBACK_'):
+                callback_id = getattr(cls, attribute)
+                self.callbacks[callback_id] = (attribute[len('CALLBACK_'):].lower(),
+                                               device.callback_formats[callback_id])
+
+        callback_ids = dict((name, callback_id) for callback_id, (name, _) in self.callbacks.items())
+
+        for function_id, function in self.functions.items():
+            m = re.match('^(set|get)_(.+)_callback_period$', function.name)
+
+            if m is not None and m.group(2) in callback_ids:
+                if m.group(1) == 'set':
+                    self.period_setters[function_id] = callback_ids[m.group(2)]
+                else:
+                    self.period_getters[function_id] = callback_ids[m.group(2)]
+
+def load_device_class_infos():
+    infos = {}
+    bindings_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bindings')
+
+    for path in sorted(glob.glob(os.path.join(bindings_path, 'brick*.py'))):
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module = __import__('brickv.bindings.' + module_name, fromlist=[module_name])
+
+        for value in module.__dict__.values():
+            if isinstance(value, type(Device)) and value is not Device and \
+               issubclass(value, Device) and hasattr(value, 'DEVICE_IDENTIFIER') and \
+               value.__module__ == module.__name__:
+                infos[value.__name__] = DeviceClassInfo(value)
+
+    return infos
+
+def generate_values(form, tick):
+    values = []
+
+    if len(form) == 0:
+        return values
+
+    for f in form.split(' '):
+        kind = f[-1]
+
+        if len(f) > 1 and kind != 's':
+            count = int(f[:-1])
+        else:
+            count = 1
+
+        if kind == 's':
+            value = ''
+        elif kind == 'c':
+            value = 'x'
+        elif kind == '?':
+            value = tick % 2 == 0
+        else:
+            value = tick % 100
+
+        if count > 1:
+            values.append(tuple([value] * count))
+        else:
+            values.append(value)
+
+    return values
+
+def script_values(script, form, tick):
+    if script is None:
+        return generate_values(form, tick)
+
+    if isinstance(script, list) and len(script) > 0 and \
+       (len(form.split(' ')) == 1 or isinstance(script[0], list)):
+        # list of values, cycled through
+        value = script[tick % len(script)]
+    else:
+        value = script
+
+    if len(form.split(' ')) == 1:
+        return [value]
+
+    return [tuple(v) if isinstance(v, list) else v for v in value]
+
+class SimulatedDevice:
+    def __init__(self, class_info, uid, connected_uid, position,
+                 hardware_version=(1, 0, 0), firmware_version=(2, 0, 0),
+                 values=None, callbacks=None):
+        self.class_info = class_info
+        self.uid = uid
+        self.uid_number = base58decode(uid)
+        self.connected_uid = connected_uid
+        self.position = position
+        self.hardware_version = tuple(hardware_version)
+        self.firmware_version = tuple(firmware_version)
+        self.values = values or {} # function name -> scripted value(s)
+        self.callback_scripts = {} # callback_id -> scripted value(s)
+        self.callback_periods = {} # callback_id -> period in ms
+        self.ticks = {} # function or callback id -> number of calls
+        self.lock = threading.Lock()
+
+        callback_ids = dict((name, callback_id) for callback_id, (name, _) in class_info.callbacks.items())
+
+        for name, config in (callbacks or {}).items():
+            callback_id = callback_ids[name]
+            self.callback_scripts[callback_id] = config.get('values')
+
+            if config.get('period', 0) > 0:
+                self.callback_periods[callback_id] = config['period']
+
+    def next_tick(self, key):
+        with self.lock:
+            tick = self.ticks.get(key, 0)
+            self.ticks[key] = tick + 1
+
+        return tick
+
+    def enumerate_payload(self, enumeration_type):
+        return get_codec(ENUMERATE_FORM).pack((self.uid, self.connected_uid, self.position,
+                                               self.hardware_version, self.firmware_version,
+                                               self.class_info.device_identifier, enumeration_type))
+
+    def callback_payload(self, callback_id):
+        _, form = self.class_info.callbacks[callback_id]
+        values = script_values(self.callback_scripts.get(callback_id), form,
+                               self.next_tick(('callback', callback_id)))
+
+        return get_codec(form).pack(values)
+
+    def handle_request(self, simulator, function_id, payload):
+        # returns (error_code, response payload)
+        if function_id == 255:
+            return 0, get_codec(IDENTITY_FORM).pack((self.uid, self.connected_uid, self.position,
+                                                     self.hardware_version, self.firmware_version,
+                                                     self.class_info.device_identifier))
+
+        function = self.class_info.functions.get(function_id)
+
+        if function is None:
+            return 2, b'' # not supported
+
+        if function_id in self.class_info.period_setters:
+            callback_id = self.class_info.period_setters[function_id]
+            data = get_codec(function.form).unpack(payload)
+
+            if isinstance(data, list):
+                period = data[-1]
+            else:
+                period = data
+
+            # in flood mode the period is acknowledged but not changed, so
+            # a plugin stopping its callbacks doesn't end the flood
+            if simulator.flood_period <= 0:
+                simulator.set_callback_period(self, callback_id, period)
+
+            return 0, b''
+
+        if function_id in self.class_info.period_getters:
+            callback_id = self.class_info.period_getters[function_id]
+
+            return 0, get_codec(function.form_ret).pack([self.callback_periods.get(callback_id, 0)])
+
+        values = script_values(self.values.get(function.name), function.form_ret,
+                               self.next_tick(function_id))
+
+        return 0, get_codec(function.form_ret).pack(values)
+
+class ClientHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_queue = Queue()
+        self.authenticated = self.server.simulator.secret is None
+        self.server_nonce = os.urandom(4)
+        self.sender = threading.Thread(target=self.send_loop)
+        self.sender.daemon = True
+        self.sender.start()
+        self.server.simulator.add_client(self)
+
+    def finish(self):
+        self.server.simulator.remove_client(self)
+        self.send_queue.put(None)
+
+    def send_loop(self):
+        # responses are delayed by the configured latency, callbacks are not.
+        # the queue is in due time order because the latency is constant
+        while True:
+            item = self.send_queue.get()
+
+            if item is None:
+                break
+
+            due, data = item
+            delay = due - time.time()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            # send everything that is due in one go
+            while not self.send_queue.empty():
+                item = self.send_queue.queue[0]
+
+                if item is None or item[0] > time.time():
+                    break
+
+                data += self.send_queue.get()[1]
+
+            try:
+                self.request.sendall(data)
+            except socket.error:
+                break
+
+    def queue_packet(self, data, latency=0):
+        self.send_queue.put((time.time() + latency, data))
+
+    def handle(self):
+        simulator = self.server.simulator
+        pending = b''
+
+        while True:
+            try:
+                data = self.request.recv(8192)
+            except socket.error:
+                break
+
+            if len(data) == 0:
+                break
+
+            pending += data
+
+            while len(pending) >= 8 and len(pending) >= get_length_from_data(pending):
+                length = get_length_from_data(pending)
+                packet = pending[:length]
+                pending = pending[length:]
+
+                if not simulator.handle_packet(self, packet):
+                    return
+
+class Simulator:
+    def __init__(self, devices, secret=None, latency=0, flood_period=0):
+        self.devices = dict((device.uid_number, device) for device in devices)
+        self.secret = secret
+        self.latency = latency
+        self.flood_period = flood_period
+        self.clients = []
+        self.clients_lock = threading.Lock()
+        self.schedule = [] # heap of (due, uid_number, callback_id, generation)
+        self.schedule_generations = {} # (uid_number, callback_id) -> generation
+        self.schedule_condition = threading.Condition()
+        self.request_count = 0
+        self.callback_count = 0
+
+        for device in devices:
+            for callback_id, period in device.callback_periods.items():
+                self.set_callback_period(device, callback_id, period)
+
+            if flood_period > 0:
+                for callback_id in device.class_info.callbacks:
+                    if callback_id in device.class_info.period_setters.values():
+                        self.set_callback_period(device, callback_id, flood_period)
+
+        self.scheduler = threading.Thread(target=self.schedule_loop)
+        self.scheduler.daemon = True
+        self.scheduler.start()
+
+    def add_client(self, client):
+        with self.clients_lock:
+            self.clients.append(client)
+
+    def remove_client(self, client):
+        with self.clients_lock:
+            self.clients.remove(client)
+
+    def broadcast(self, data):
+        with self.clients_lock:
+            clients = list(self.clients)
+
+        for client in clients:
+            if client.authenticated:
+                client.queue_packet(data)
+
+    def set_callback_period(self, device, callback_id, period):
+        with self.schedule_condition:
+            key = (device.uid_number, callback_id)
+            generation = self.schedule_generations.get(key, 0) + 1
+            self.schedule_generations[key] = generation
+
+            if period > 0:
+                device.callback_periods[callback_id] = period
+                heapq.heappush(self.schedule, (time.time() + period / 1000.0,
+                                               device.uid_number, callback_id, generation))
+                self.schedule_condition.notify()
+            else:
+                device.callback_periods.pop(callback_id, None)
+
+    def schedule_loop(self):
+        while True:
+            with self.schedule_condition:
+                while len(self.schedule) == 0:
+                    self.schedule_condition.wait()
+
+                due, uid_number, callback_id, generation = self.schedule[0]
+                delay = due - time.time()
+
+                if delay > 0:
+                    self.schedule_condition.wait(min(delay, 0.1))
+                    continue
+
+                heapq.heappop(self.schedule)
+
+                if self.schedule_generations.get((uid_number, callback_id)) != generation:
+                    continue # period was changed in the meantime
+
+                device = self.devices[uid_number]
+                period = device.callback_periods[callback_id] / 1000.0
+                now = time.time()
+
+                # don't try to catch up if the simulator falls behind
+                heapq.heappush(self.schedule, (max(due + period, now - 1.0),
+                                               uid_number, callback_id, generation))
+
+            payload = device.callback_payload(callback_id)
+            header = struct.pack('<IBBBB', uid_number, 8 + len(payload), callback_id, 0, 0)
+
+            self.callback_count += 1
+            self.broadcast(header + payload)
+
+    def handle_packet(self, client, packet):
+        uid = get_uid_from_data(packet)
+        function_id = get_function_id_from_data(packet)
+        sequence_number_and_options = struct.unpack('<B', packet[6:7])[0]
+        response_expected = (sequence_number_and_options & 0x08) != 0
+        payload = packet[8:]
+
+        self.request_count += 1
+
+        if function_id == IPConnection.FUNCTION_DISCONNECT_PROBE:
+            return True
+
+        if uid == BRICKD_UID:
+            if function_id == BrickDaemon.FUNCTION_GET_AUTHENTICATION_NONCE:
+                response = client.server_nonce
+            elif function_id == BrickDaemon.FUNCTION_AUTHENTICATE:
+                client_nonce, digest = get_codec('4B 20B').unpack(payload)
+                h = hmac.new((self.secret or '').encode('ascii'), digestmod=hashlib.sha1)
+                h.update(client.server_nonce)
+                h.update(struct.pack('<4B', *client_nonce))
+
+                if struct.pack('<20B', *digest) != h.digest():
+                    # like brickd, drop clients that fail to authenticate
+                    return False
+
+                client.authenticated = True
+                response = b''
+            else:
+                return True
+
+            if response_expected:
+                client.queue_packet(struct.pack('<IBBBB', uid, 8 + len(response), function_id,
+                                                sequence_number_and_options, 0) + response, self.latency)
+
+            return True
+
+        if not client.authenticated:
+            return False
+
+        if function_id == IPConnection.FUNCTION_ENUMERATE:
+            for device in sorted(self.devices.values(), key=lambda device: device.position):
+                data = device.enumerate_payload(IPConnection.ENUMERATION_TYPE_AVAILABLE)
+                header = struct.pack('<IBBBB', device.uid_number, 8 + len(data),
+                                     IPConnection.CALLBACK_ENUMERATE, 0, 0)
+                client.queue_packet(header + data, self.latency)
+
+            return True
+
+        device = self.devices.get(uid)
+
+        if device is None:
+            return True
+
+        error_code, response = device.handle_request(self, function_id, payload)
+
+        if response_expected:
+            if error_code != 0:
+                response = b''
+
+            client.queue_packet(struct.pack('<IBBBB', uid, 8 + len(response), function_id,
+                                            sequence_number_and_options, error_code << 6) + response,
+                                self.latency)
+
+        return True
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, simulator):
+        socketserver.TCPServer.__init__(self, address, ClientHandler)
+        self.simulator = simulator
+
+def create_stacks(class_infos, stack_count, bricks_per_stack, bricklets_per_brick,
+                  bricklet_classes, first_uid=100000):
+    devices = []
+    uid = first_uid
+
+    for stack in range(stack_count):
+        for brick in range(bricks_per_stack):
+            brick_uid = base58encode(uid)
+            uid += 1
+
+            # the stack position is a single digit
+            devices.append(SimulatedDevice(class_infos['BrickMaster'], brick_uid, '0', str(brick % 10)))
+
+            for port in range(bricklets_per_brick):
+                class_info = class_infos[bricklet_classes[(uid + port) % len(bricklet_classes)]]
+
+                devices.append(SimulatedDevice(class_info, base58encode(uid), brick_uid, 'abcd'[port]))
+                uid += 1
+
+    return devices
+
+def load_config(class_infos, filename):
+    with open(filename, 'r') as f:
+        config = json.load(f)
+
+    devices = []
+
+    for entry in config['devices']:
+        devices.append(SimulatedDevice(class_infos[entry['class']],
+                                       entry['uid'],
+                                       entry.get('connected_uid', '0'),
+                                       entry.get('position', '0'),
+                                       entry.get('hardware_version', (1, 0, 0)),
+                                       entry.get('firmware_version', (2, 0, 0)),
+                                       entry.get('values'),
+                                       entry.get('callbacks')))
+
+    return devices
+
+def start_simulator(devices, host='localhost', port=0, secret=None, latency=0, flood_period=0):
+    """
+    Starts a simulator in a background thread and returns the server. The
+    actual port is available as server.server_address[1].
+    """
+
+    simulator = Simulator(devices, secret, latency, flood_period)
+    server = Server((host, port), simulator)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulates a Brick Daemon with stacks of Bricks and Bricklets')
+    parser.add_argument('--host', default='localhost', help='the host to listen on')
+    parser.add_argument('--port', default=4223, type=int, help='the port to listen on')
+    parser.add_argument('--config', help='JSON file describing the simulated devices')
+    parser.add_argument('--stacks', default=1, type=int, help='number of generated stacks')
+    parser.add_argument('--bricks-per-stack', default=1, type=int, help='number of Master Bricks per generated stack')
+    parser.add_argument('--bricklets-per-brick', default=4, type=int, help='number of Bricklets per generated Brick (0-4)')
+    parser.add_argument('--bricklet-class', action='append', dest='bricklet_classes',
+                        help='binding class of the generated Bricklets, can be given multiple times')
+    parser.add_argument('--callback-period', default=0, type=int,
+                        help='send all period callbacks with this period in ms, regardless of the client configuration')
+    parser.add_argument('--latency', default=0, type=float, help='response latency in seconds')
+    parser.add_argument('--secret', help='require authentication with this secret')
+
+    args = parser.parse_args()
+    class_infos = load_device_class_infos()
+
+    if args.config is not None:
+        devices = load_config(class_infos, args.config)
+    else:
+        devices = create_stacks(class_infos, args.stacks, args.bricks_per_stack,
+                                min(args.bricklets_per_brick, 4),
+                                args.bricklet_classes or DEFAULT_BRICKLET_CLASSES)
+
+    server = start_simulator(devices, args.host, args.port, args.secret,
+                             args.latency, args.callback_period)
+    simulator = server.simulator
+
+    print('Simulating {0} devices on {1}:{2}'.format(len(devices), args.host, server.server_address[1]))
+
+    last_requests = 0
+    last_callbacks = 0
+
+    try:
+        while True:
+            time.sleep(5)
+
+            requests = simulator.request_count
+            callbacks = simulator.callback_count
+
+            print('{0} clients, {1:.0f} requests/s, {2:.0f} callbacks/s'
+                  .format(len(simulator.clients), (requests - last_requests) / 5.0,
+                          (callbacks - last_callbacks) / 5.0))
+
+            last_requests = requests
+            last_callbacks = callbacks
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+callback_coalescer.py: Coalesced delivery of Brick/Bricklet callbacks to the GUI
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+from PyQt4.QtCore import QObject, QTimer, pyqtSignal
+from brickv.bindings.ip_connection import base58decode, uid64_to_uid32
+from threading import Lock
+from collections import OrderedDict
+
+import logging
+import time
+
+# callbacks are delivered to the GUI thread at most once per frame
+FRAME_INTERVAL = 16 # ms
+
+class CallbackStatistics:
+    def __init__(self, uid):
+        self.uid = uid
+        self.received = 0 # values received from the callback thread
+        self.delivered = 0 # values delivered to the GUI thread
+        self.merged = 0 # values replaced by a newer value before delivery
+
+class CallbackCoalescer(QObject):
+    qtcb_pending = pyqtSignal()
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+
+        self.lock = Lock()
+        self.pending = OrderedDict() # protected by lock
+        self.flush_pending = False # protected by lock
+        self.sequence_number = 0 # protected by lock
+        self.statistics = {} # (uid, callback_id) -> CallbackStatistics, protected by lock
+        self.registrations = {} # uid -> [(device, callback_id, callback)], protected by lock
+        self.last_flush = 0
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
+        # emitted from the callback thread, the queued connection moves
+        # the flush scheduling to the GUI thread
+        self.qtcb_pending.connect(self.schedule_flush)
+
+    def register_callback(self, device, callback_id, function, coalesce, key, sample_function):
+        statistics_key = (device.uid, callback_id)
+        ipcon = device.ipcon
+
+        def callback(*args):
+            if sample_function is not None:
+                try:
+                    sample_function(ipcon.get_callback_timestamp(), *args)
+                except:
+                    logging.exception('Error while sampling callback')
+
+            if not coalesce:
+                self.put(statistics_key, None, function, args)
+            elif key is None:
+                self.put(statistics_key, statistics_key, function, args)
+            else:
+                self.put(statistics_key, statistics_key + (key(*args),), function, args)
+
+        with self.lock:
+            if not statistics_key in self.statistics:
+                self.statistics[statistics_key] = CallbackStatistics(device.uid)
+
+            self.registrations.setdefault(device.uid, []).append((device, callback_id, callback))
+
+        device.register_callback(callback_id, callback)
+
+    def unregister_callbacks(self, uid):
+        with self.lock:
+            registrations = self.registrations.pop(uid, [])
+
+            for device, callback_id, callback in registrations:
+                self.statistics.pop((device.uid, callback_id), None)
+
+            # drop values that are not delivered yet, their plugin is gone
+            for pending_key, (statistics, function, args) in list(self.pending.items()):
+                if statistics.uid == uid:
+                    del self.pending[pending_key]
+
+        for device, callback_id, callback in registrations:
+            if device.registered_callbacks.get(callback_id) is callback:
+                del device.registered_callbacks[callback_id]
+
+    # called from the callback thread
+    def put(self, statistics_key, pending_key, function, args):
+        with self.lock:
+            statistics = self.statistics.get(statistics_key)
+
+            if statistics is None:
+                return # unregistered while the callback was in-flight
+
+            statistics.received += 1
+
+            if pending_key is None:
+                # not coalesced, every value is delivered in order
+                self.sequence_number += 1
+                pending_key = self.sequence_number
+            elif pending_key in self.pending:
+                # the newer value is delivered after the values that arrived
+                # before it, not at the position of the replaced one
+                del self.pending[pending_key]
+                statistics.merged += 1
+
+            self.pending[pending_key] = (statistics, function, args)
+
+            if self.flush_pending:
+                return
+
+            self.flush_pending = True
+
+        self.qtcb_pending.emit()
+
+    def schedule_flush(self):
+        delay = self.last_flush + FRAME_INTERVAL / 1000.0 - time.time()
+
+        self.flush_timer.start(max(0, int(delay * 1000)))
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = OrderedDict()
+            self.flush_pending = False
+
+            for statistics, function, args in pending.values():
+                statistics.delivered += 1
+
+        self.last_flush = time.time()
+
+        for statistics, function, args in pending.values():
+            try:
+                function(*args)
+            except:
+                logging.exception('Error while delivering coalesced callback')
+
+    def get_statistics(self):
+        with self.lock:
+            return dict((key, (statistics.received, statistics.delivered, statistics.merged))
+                        for key, statistics in self.statistics.items())
+
+coalescer = None
+
+def get_coalescer():
+    global coalescer
+
+    # created on first use, this happens in the GUI thread
+    if coalescer is None:
+        coalescer = CallbackCoalescer()
+
+    return coalescer
+
+def register_coalesced_callback(device, callback_id, function, coalesce=True, key=None,
+                                sample_function=None):
+    """
+    Registers function to be called in the GUI thread for the given callback
+    of device. Values arriving within the same frame are delivered in one
+    batch. If coalesce is True only the latest value per device and callback
+    is delivered, if key is given then the latest value per device, callback
+    and key(*args) is delivered, e.g. per sensor for callbacks that report
+    values of multiple sensors. Use coalesce=False for event callbacks where
+    every value matters.
+
+    If sample_function is given it is called for every value before it gets
+    coalesced, with the receive timestamp of the value followed by the
+    callback arguments. It is called in the callback thread and must not
+    touch any widgets, see PlotWidget.add_samples.
+    """
+
+    get_coalescer().register_callback(device, callback_id, function, coalesce, key, sample_function)
+
+def unregister_coalesced_callbacks(uid):
+    """
+    Unregisters all callbacks registered by register_coalesced_callback for
+    the device with the given UID string and drops its values that are not
+    delivered yet. Called when the plugin of the device is destroyed.
+    """
+
+    uid = base58decode(uid)
+
+    if uid > 0xFFFFFFFF:
+        uid = uid64_to_uid32(uid)
+
+    get_coalescer().unregister_callbacks(uid)
+
+def get_coalesced_callback_statistics():
+    """
+    Returns a dict of (uid, callback_id) to (received, delivered, merged)
+    value counts.
+    """
+
+    return get_coalescer().get_statistics()
@@ -17,6 +17,8 @@ def get_secret(): return DEFAULT_SECRET
 def set_secret(secret): pass
 def get_remember_secret(): return DEFAULT_REMEMBER_SECRET
 def set_remember_secret(remember): pass
+def get_plot_history_length(): return DEFAULT_PLOT_HISTORY_LENGTH
+def set_plot_history_length(length): pass
 
 if sys.platform.startswith('linux') or sys.platform.startswith('freebsd'):
     from config_linux import *
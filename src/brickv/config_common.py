@@ -16,3 +16,17 @@ DEFAULT_PORT = 4223
 DEFAULT_USE_AUTHENTICATION = False
 DEFAULT_SECRET = ''
 DEFAULT_REMEMBER_SECRET = False
+
+# length of the plotted history of new plots, the last one selected in a plot
+# is stored in the config
+DEFAULT_PLOT_HISTORY_LENGTH = 20 # s
+
+# number of Bricklet plugins created on demand that are kept after their tab
+# got hidden, the least recently viewed ones are destroyed beyond this number.
+# 0 keeps all of them
+PLUGIN_CACHE_SIZE = 0
+
+# downloaded firmwares and plugins are kept in this directory, None disables
+# the cache. the least recently used ones are removed beyond the size
+FIRMWARE_CACHE_DIRNAME = None
+FIRMWARE_CACHE_SIZE = 64 * 1024 * 1024 # bytes
@@ -34,6 +34,13 @@ else:
 
 CONFIG_DIRNAME = os.path.dirname(CONFIG_FILENAME)
 
+XDG_CACHE_HOME = os.getenv('XDG_CACHE_HOME')
+
+if XDG_CACHE_HOME is None or len(XDG_CACHE_HOME) < 1:
+    FIRMWARE_CACHE_DIRNAME = os.path.expanduser('~/.cache/Tinkerforge/brickv/firmwares')
+else:
+    FIRMWARE_CACHE_DIRNAME = os.path.join(XDG_CACHE_HOME, 'Tinkerforge/brickv/firmwares')
+
 def get_config_value(section, option, default):
     scp = ConfigParser.SafeConfigParser()
     scp.read(CONFIG_FILENAME)
@@ -113,3 +120,12 @@ def get_remember_secret():
 
 def set_remember_secret(remember):
     set_config_value('Authentication', 'RememberSecret', str(bool(remember)))
+
+def get_plot_history_length():
+    try:
+        return max(int(get_config_value('Plot', 'HistoryLength', str(DEFAULT_PLOT_HISTORY_LENGTH))), 1)
+    except ValueError:
+        return DEFAULT_PLOT_HISTORY_LENGTH
+
+def set_plot_history_length(length):
+    set_config_value('Plot', 'HistoryLength', str(int(length)))
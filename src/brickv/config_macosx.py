@@ -29,6 +29,8 @@ import subprocess
 CONFIG_FILENAME = os.path.expanduser('~/Library/Preferences/com.tinkerforge.brickv.plist')
 CONFIG_DIRNAME = os.path.dirname(CONFIG_FILENAME)
 
+FIRMWARE_CACHE_DIRNAME = os.path.expanduser('~/Library/Caches/com.tinkerforge.brickv/firmwares')
+
 def get_plist_value(name, default):
     try:
         subprocess.call(['plutil', '-convert', 'xml1', CONFIG_FILENAME])
@@ -109,3 +111,12 @@ def get_remember_secret():
 
 def set_remember_secret(remember):
     set_plist_value('RememberSecret', str(bool(remember)))
+
+def get_plot_history_length():
+    try:
+        return max(int(get_plist_value('PlotHistoryLength', DEFAULT_PLOT_HISTORY_LENGTH)), 1)
+    except ValueError:
+        return DEFAULT_PLOT_HISTORY_LENGTH
+
+def set_plot_history_length(length):
+    set_plist_value('PlotHistoryLength', int(length))
@@ -23,9 +23,13 @@ Boston, MA 02111-1307, USA.
 
 from brickv.config_common import *
 import _winreg as winreg
+import os
 
 KEY_NAME = 'Software\\Tinkerforge\\Brickv'
 
+FIRMWARE_CACHE_DIRNAME = os.path.join(os.getenv('LOCALAPPDATA') or os.getenv('APPDATA') or os.path.expanduser('~'),
+                                      'Tinkerforge', 'Brickv', 'firmwares')
+
 def get_registry_value(name, default):
     try:
         reg = winreg.OpenKey(winreg.HKEY_CURRENT_USER, KEY_NAME)
@@ -123,3 +127,12 @@ def get_remember_secret():
 
 def set_remember_secret(remember):
     set_registry_value('RememberSecret', winreg.REG_DWORD, int(bool(remember)))
+
+def get_plot_history_length():
+    try:
+        return max(int(get_registry_value('PlotHistoryLength', DEFAULT_PLOT_HISTORY_LENGTH)), 1)
+    except ValueError:
+        return DEFAULT_PLOT_HISTORY_LENGTH
+
+def set_plot_history_length(length):
+    set_registry_value('PlotHistoryLength', winreg.REG_DWORD, int(length))
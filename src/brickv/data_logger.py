@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+data_logger.py: Headless logging of the callback values of all devices
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# The data logger is started by "brickv --log" and runs without Qt. It
+# enumerates the devices, configures the same callback periods as the
+# plugins of the devices do and writes every callback value as one CSV line
+#
+#   time,uid,callback,value[,value...]
+#
+# with the receive time of the value in seconds since the epoch, or to a
+# recording file (see recording.py). The values are written as the bindings
+# report them. The callback thread only queues the values, a writer thread
+# formats and writes them in batches.
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from collections import deque
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+# Allow data_logger to be directly started by calling "data_logger.py"
+# without "brickv" being in the path already
+if not 'brickv' in sys.modules:
+    head, tail = os.path.split(os.path.dirname(os.path.realpath(__file__)))
+    if not head in sys.path:
+        sys.path.insert(0, head)
+
+from brickv.bindings.ip_connection import IPConnection, Error, get_monotonic_time
+from brickv.plugin_system.plugins import log_callbacks
+
+# queued values are written at least this often
+LOG_FLUSH_INTERVAL = 1.0 # s
+
+# and as soon as this many values are queued
+LOG_BATCH_SIZE = 10000
+
+# buffer size of the output file
+LOG_BUFFER_SIZE = 1024 * 1024
+
+def format_values(values):
+    parts = []
+
+    for value in values:
+        if isinstance(value, (tuple, list)):
+            parts.extend(str(v) for v in value)
+        else:
+            parts.append(str(value))
+
+    return ','.join(parts)
+
+class LoggedCallback:
+    def __init__(self, uid, callback_id, name, form):
+        self.uid = uid
+        self.callback_id = callback_id
+        self.name = name
+        self.form = form
+        self.stream = None # RecordingStream, only used by the writer thread
+
+class LoggedDevice:
+    def __init__(self, device, callback_periods):
+        self.device = device
+        self.callback_periods = callback_periods # [(callback name, period parameter)]
+
+    def set_callback_periods(self, enable):
+        for name, parameter in self.callback_periods:
+            setter = getattr(self.device, 'set_{0}_callback_period'.format(name))
+
+            if isinstance(parameter, tuple):
+                # per sensor periods, the period is the last parameter
+                if not enable:
+                    parameter = parameter[:-1] + (0,)
+
+                setter(*parameter)
+            else:
+                setter(parameter if enable else 0)
+
+class DataLogger:
+    """
+    Logs the callback values of all devices of ipcon that have a plugin with
+    callback periods to output, a file for CSV or a RecordingWriter. The
+    devices are configured by the thread that calls run(), so slow responses
+    don't stall the callback thread.
+    """
+
+    def __init__(self, ipcon, output, flush_interval=LOG_FLUSH_INTERVAL, batch_size=LOG_BATCH_SIZE):
+        self.ipcon = ipcon
+        self.output = output
+        self.recording = output if hasattr(output, 'add_stream') else None
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.devices = {} # uid -> LoggedDevice, only used by the run() thread
+        self.configure_queue = Queue() # (uid, device identifier or None to remove)
+
+        # (receive timestamp, LoggedCallback, values) added by the callback
+        # thread, drained by the writer thread. appending to a deque is
+        # atomic, so no lock is needed
+        self.pending = deque()
+        self.flush_event = threading.Event()
+        self.stopped = False
+        self.writer = None
+
+        # the receive timestamps are monotonic, the log gets wall clock time
+        self.time_offset = time.time() - get_monotonic_time()
+
+        self.value_count = 0
+        self.byte_count = 0
+        self.write_count = 0
+
+    def start(self):
+        self.ipcon.register_callback(IPConnection.CALLBACK_ENUMERATE, self.cb_enumerate)
+        self.ipcon.register_callback(IPConnection.CALLBACK_CONNECTED, self.cb_connected)
+
+        self.writer = threading.Thread(target=self.write_loop)
+        self.writer.daemon = True
+        self.writer.start()
+
+        self.ipcon.enumerate()
+
+    def stop(self):
+        # configure the remaining devices first, so their callbacks get disabled
+        self.configure_devices(0)
+
+        for uid, logged_device in self.devices.items():
+            try:
+                logged_device.set_callback_periods(False)
+            except Error:
+                logging.warning('Could not disable callbacks of {0}'.format(uid))
+
+        self.stopped = True
+        self.flush_event.set()
+
+        if self.writer is not None:
+            self.writer.join()
+
+        # values that arrived during or after the last write of the writer
+        # thread, the caller closes the output after this
+        self.write_pending()
+
+    def run(self, duration=None):
+        # configures new devices until duration is over or forever
+        end = None if duration is None else time.time() + duration
+
+        while end is None or time.time() < end:
+            timeout = 0.5 if end is None else max(min(end - time.time(), 0.5), 0)
+            self.configure_devices(timeout)
+
+    def configure_devices(self, timeout):
+        try:
+            uid, device_identifier = self.configure_queue.get(timeout > 0, timeout)
+        except Empty:
+            return
+
+        while True:
+            if device_identifier is None:
+                self.devices.pop(uid, None)
+            elif not uid in self.devices:
+                try:
+                    self.add_device(uid, device_identifier)
+                except Error as e:
+                    logging.warning('Could not configure callbacks of {0}: {1}'.format(uid, e))
+
+            try:
+                uid, device_identifier = self.configure_queue.get(False)
+            except Empty:
+                return
+
+    def add_device(self, uid, device_identifier):
+        module_name, class_name, callback_periods = log_callbacks[device_identifier]
+        module = importlib.import_module('brickv.bindings.' + module_name)
+        device = getattr(module, class_name)(uid, self.ipcon)
+        logged_device = LoggedDevice(device, callback_periods)
+
+        for name, parameter in callback_periods:
+            callback_id = getattr(device, 'CALLBACK_' + name.upper())
+            logged_callback = LoggedCallback(uid, callback_id, name, device.callback_formats[callback_id])
+
+            device.register_callback(callback_id, self.get_callback(logged_callback))
+
+        logged_device.set_callback_periods(True)
+        self.devices[uid] = logged_device
+
+        logging.info('Logging {0} of {1} {2}'.format(', '.join(sorted(set(name for name, _ in callback_periods))),
+                                                     class_name, uid))
+
+    def get_callback(self, logged_callback):
+        pending = self.pending
+        ipcon = self.ipcon
+
+        def callback(*args):
+            pending.append((ipcon.get_callback_timestamp(), logged_callback, args))
+
+            if len(pending) >= self.batch_size:
+                self.flush_event.set()
+
+        return callback
+
+    def cb_enumerate(self, uid, connected_uid, position, hardware_version,
+                     firmware_version, device_identifier, enumeration_type):
+        if enumeration_type == IPConnection.ENUMERATION_TYPE_DISCONNECTED:
+            self.configure_queue.put((uid, None))
+        elif device_identifier in log_callbacks:
+            if enumeration_type == IPConnection.ENUMERATION_TYPE_CONNECTED:
+                # the device was reset and lost its callback periods
+                self.configure_queue.put((uid, None))
+
+            self.configure_queue.put((uid, device_identifier))
+
+    def cb_connected(self, connect_reason):
+        if connect_reason == IPConnection.CONNECT_REASON_AUTO_RECONNECT:
+            self.ipcon.enumerate()
+
+    def write_loop(self):
+        while not self.stopped:
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+
+            try:
+                self.write_pending()
+            except:
+                logging.exception('Error while writing log')
+
+    def write_pending(self):
+        count = len(self.pending)
+
+        if count == 0:
+            return
+
+        if self.recording is not None:
+            self.byte_count += self.write_recording(count)
+        else:
+            self.byte_count += self.write_csv(count)
+
+        self.value_count += count
+        self.write_count += 1
+
+    def write_csv(self, count):
+        lines = []
+        time_offset = self.time_offset
+
+        for i in range(count):
+            timestamp, logged_callback, values = self.pending.popleft()
+            lines.append('{0:.6f},{1},{2},{3}\n'.format(timestamp + time_offset, logged_callback.uid,
+                                                         logged_callback.name, format_values(values)))
+
+        data = ''.join(lines)
+
+        self.output.write(data)
+        self.output.flush()
+
+        return len(data)
+
+    def write_recording(self, count):
+        # the RecordingWriter buffers the values and writes full chunks
+        position = self.recording.file.tell()
+        time_offset = self.time_offset
+
+        for i in range(count):
+            timestamp, logged_callback, values = self.pending.popleft()
+
+            if logged_callback.stream is None:
+                logged_callback.stream = self.recording.add_stream(logged_callback.uid, logged_callback.callback_id,
+                                                                   logged_callback.name, logged_callback.form)
+
+            logged_callback.stream.append(timestamp + time_offset, values)
+
+        return self.recording.file.tell() - position
+
+    def get_statistics(self):
+        """
+        Returns the number of logged devices, of written values, bytes and
+        write calls and of values waiting to be written.
+        """
+
+        return {'devices': len(self.devices),
+                'values': self.value_count,
+                'bytes': self.byte_count,
+                'writes': self.write_count,
+                'pending': len(self.pending)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='brickv --log',
+                                     description='Logs the callback values of all Bricks and Bricklets')
+    parser.add_argument('--host', default='localhost', help='the host of the Brick Daemon')
+    parser.add_argument('--port', default=4223, type=int, help='the port of the Brick Daemon')
+    parser.add_argument('--secret', help='authenticate with this secret')
+    parser.add_argument('-o', '--output', help='append the values to this file instead of writing them to stdout')
+    parser.add_argument('--format', default='csv', choices=['csv', 'recording'],
+                        help='write CSV or a compressed recording file, recordings need --output')
+    parser.add_argument('--flush-interval', default=LOG_FLUSH_INTERVAL, type=float,
+                        help='write the queued values at least this often, in seconds')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+    if args.format == 'recording':
+        if args.output is None:
+            parser.error('--format recording needs --output')
+
+        from brickv.recording import RecordingWriter
+
+        output = RecordingWriter(args.output)
+    elif args.output is not None:
+        output = open(args.output, 'a', LOG_BUFFER_SIZE)
+    else:
+        output = sys.stdout
+
+    ipcon = IPConnection()
+    ipcon.connect(args.host, args.port)
+
+    if args.secret is not None:
+        ipcon.authenticate(args.secret)
+
+    data_logger = DataLogger(ipcon, output, args.flush_interval)
+    data_logger.start()
+
+    try:
+        data_logger.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+
+    data_logger.stop()
+    ipcon.disconnect()
+
+    statistics = data_logger.get_statistics()
+    logging.info('Logged {0} values of {1} devices'.format(statistics['values'], statistics['devices']))
+
+    if output is not sys.stdout:
+        output.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
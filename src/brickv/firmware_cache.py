@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+firmware_cache.py: On-disk cache for downloaded firmwares and plugins
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# The cache stores each file once under its SHA-256 in "objects/" and maps
+# keys like "bricks/master/2.1.0" or "bricklets/temperature/2.0.1" to the
+# hashes in "index.json". Files are checked against their hash when read,
+# a damaged file counts as a miss. The least recently used files are removed
+# when the cache grows beyond its size.
+#
+# The cache can be seeded from a directory with firmwares and plugins as
+# they are named on tinkerforge.com and a latest_versions.txt, so flashing
+# works without internet access:
+#
+#   python firmware_cache.py seed /path/to/firmwares
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+try:
+    from urllib2 import urlopen, URLError
+except ImportError:
+    from urllib.request import urlopen
+    from urllib.error import URLError
+
+# Allow firmware_cache to be directly started by calling "firmware_cache.py"
+# without "brickv" being in the path already
+if not 'brickv' in sys.modules:
+    head, tail = os.path.split(os.path.dirname(os.path.realpath(__file__)))
+    if not head in sys.path:
+        sys.path.insert(0, head)
+
+from brickv.config_common import FIRMWARE_CACHE_SIZE
+
+LATEST_VERSIONS_KEY = 'latest_versions.txt'
+
+# a cached latest_versions.txt is used without asking tinkerforge.com for
+# this long. older ones are only used if tinkerforge.com is not reachable
+LATEST_VERSIONS_MAX_AGE = 15 * 60 # s
+
+# beta versions are probed from this number down to 1 if a version is not
+# available as a release
+MAX_BETA = 5
+
+# a cached beta version is used without looking for the release or a newer
+# beta version for this long
+BETA_MAX_AGE = 15 * 60 # s
+
+# tinkerforge.com has to answer within this time, otherwise the cache is used
+DOWNLOAD_TIMEOUT = 5 # s
+
+FIRMWARE_FILENAME_PATTERN = re.compile(r'^(brick|bricklet)_(\w+?)_firmware_(\d+)_(\d+)_(\d+)(?:_beta(\d+))?\.bin$')
+
+def get_firmware_key(kind, url_part, version):
+    # kind is 'bricks' or 'bricklets'
+    return '{0}/{1}/{2}.{3}.{4}'.format(kind, url_part, *version)
+
+class FirmwareCache:
+    def __init__(self, dirname, max_size=FIRMWARE_CACHE_SIZE):
+        self.dirname = dirname
+        self.max_size = max_size
+        self.index_filename = os.path.join(dirname, 'index.json')
+        self.index = {} # key -> {'sha256', 'size', 'stored', 'used', 'checked', 'beta'}
+
+        try:
+            with open(self.index_filename, 'r') as f:
+                self.index = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def get_object_filename(self, sha256):
+        return os.path.join(self.dirname, 'objects', sha256)
+
+    def get(self, key):
+        """
+        Returns the cached data for key or None.
+        """
+
+        entry = self.index.get(key)
+
+        if entry is None:
+            return None
+
+        try:
+            with open(self.get_object_filename(entry['sha256']), 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            data = None
+
+        if data is None or hashlib.sha256(data).hexdigest() != entry['sha256']:
+            self.remove(key)
+            return None
+
+        # written with the next change, a lost use only affects the eviction
+        # order
+        entry['used'] = time.time()
+
+        return data
+
+    def get_age(self, key):
+        """
+        Returns the number of seconds since key was stored or None.
+        """
+
+        entry = self.index.get(key)
+
+        if entry is None:
+            return None
+
+        return max(time.time() - entry['stored'], 0)
+
+    def get_checked_age(self, key):
+        """
+        Returns the number of seconds since tinkerforge.com was last asked
+        for a newer version of key or None.
+        """
+
+        entry = self.index.get(key)
+
+        if entry is None:
+            return None
+
+        return max(time.time() - entry.get('checked', entry['stored']), 0)
+
+    def set_checked(self, key):
+        entry = self.index.get(key)
+
+        if entry is None:
+            return
+
+        entry['checked'] = time.time()
+        self.write_index()
+
+    def get_beta(self, key):
+        """
+        Returns the beta number of the firmware or plugin stored for key, 0
+        for a release or None if it is unknown.
+        """
+
+        entry = self.index.get(key)
+
+        if entry is None:
+            return None
+
+        return entry.get('beta')
+
+    def put(self, key, data, stored=None, beta=None):
+        """
+        Stores data for key. beta is the beta number of a firmware or plugin,
+        0 for a release. Errors are ignored, the cache is optional.
+        """
+
+        if len(data) > self.max_size:
+            return
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        filename = self.get_object_filename(sha256)
+
+        try:
+            if not os.path.exists(filename):
+                write_file(filename, data)
+        except (IOError, OSError):
+            return
+
+        now = time.time()
+        self.index[key] = {'sha256': sha256, 'size': len(data),
+                           'stored': now if stored is None else stored, 'used': now,
+                           'checked': now, 'beta': beta}
+
+        self.evict()
+        self.write_index()
+
+    def remove(self, key):
+        if self.remove_entry(key):
+            self.write_index()
+
+    def remove_entry(self, key):
+        # removes key without writing the index, returns False if there is
+        # no such key
+        entry = self.index.pop(key, None)
+
+        if entry is None:
+            return False
+
+        # other keys can refer to the same file
+        if not any(other['sha256'] == entry['sha256'] for other in self.index.values()):
+            try:
+                os.remove(self.get_object_filename(entry['sha256']))
+            except OSError:
+                pass
+
+        return True
+
+    def clear(self):
+        for key in list(self.index.keys()):
+            self.remove_entry(key)
+
+        self.write_index()
+
+    def get_size(self):
+        return sum(entry['size'] for entry in dict((entry['sha256'], entry) for entry in self.index.values()).values())
+
+    def evict(self):
+        # removes the least recently used files until the cache fits, the
+        # caller writes the index
+        used = {} # sha256 -> last use of any key referring to it
+
+        for entry in self.index.values():
+            used[entry['sha256']] = max(used.get(entry['sha256'], 0), entry['used'])
+
+        size = self.get_size()
+
+        for sha256 in sorted(used.keys(), key=lambda sha256: used[sha256]):
+            if size <= self.max_size:
+                break
+
+            for key, entry in list(self.index.items()):
+                if entry['sha256'] == sha256:
+                    object_size = entry['size']
+                    self.remove_entry(key)
+
+            size -= object_size
+
+    def write_index(self):
+        try:
+            write_file(self.index_filename, json.dumps(self.index, indent=1, sort_keys=True).encode('utf-8'))
+        except (IOError, OSError):
+            pass
+
+    def seed(self, dirname):
+        """
+        Adds the firmwares, plugins and latest_versions.txt found in dirname
+        and its subdirectories. Returns the number of added files.
+        """
+
+        count = 0
+
+        for root, dirnames, filenames in os.walk(dirname):
+            for filename in sorted(filenames):
+                m = FIRMWARE_FILENAME_PATTERN.match(filename)
+                beta = None
+
+                if m is not None:
+                    kind = 'bricks' if m.group(1) == 'brick' else 'bricklets'
+                    key = get_firmware_key(kind, m.group(2), (int(m.group(3)), int(m.group(4)), int(m.group(5))))
+                    beta = int(m.group(6) or 0)
+                elif filename == LATEST_VERSIONS_KEY:
+                    key = LATEST_VERSIONS_KEY
+                else:
+                    continue
+
+                path = os.path.join(root, filename)
+
+                with open(path, 'rb') as f:
+                    # a seeded latest_versions.txt is as old as its file
+                    self.put(key, f.read(), os.path.getmtime(path), beta)
+
+                count += 1
+
+        return count
+
+def write_file(filename, data):
+    # writes a temporary file first, so a crash doesn't leave a partial file
+    dirname = os.path.dirname(filename)
+
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    temporary_filename = filename + '.tmp'
+
+    with open(temporary_filename, 'wb') as f:
+        f.write(data)
+
+    if os.path.exists(filename):
+        os.remove(filename) # os.rename doesn't overwrite on Windows
+
+    os.rename(temporary_filename, filename)
+
+def download(url, progress=None, chunk_size=1024):
+    """
+    Returns the content of url, raises URLError. progress is called as
+    progress(value, maximum) while downloading.
+    """
+
+    return read_response(urlopen(url, timeout=DOWNLOAD_TIMEOUT), progress, chunk_size)
+
+def read_response(response, progress=None, chunk_size=1024):
+    try:
+        length = int(response.headers.get('Content-Length', 0))
+        chunks = []
+        value = 0
+
+        if progress is not None:
+            progress(0, length)
+
+        chunk = response.read(chunk_size)
+
+        while len(chunk) > 0:
+            chunks.append(chunk)
+            value += len(chunk)
+
+            if progress is not None:
+                progress(value, length)
+
+            chunk = response.read(chunk_size)
+    finally:
+        response.close()
+
+    return b''.join(chunks)
+
+def download_firmware(cache, base_url, kind, url_part, version, progress=None, chunk_size=1024,
+                      max_age=BETA_MAX_AGE):
+    """
+    Returns a Brick firmware (kind 'bricks') or a Bricklet plugin (kind
+    'bricklets') from cache or downloaded from base_url and added to cache.
+    If the version isn't available as a release then the beta versions are
+    tried. A cached beta version is replaced by the release or a newer beta
+    version, it is looked for if the last time is more than max_age ago.
+    Returns None if it can't be downloaded. cache can be None.
+    """
+
+    key = get_firmware_key(kind, url_part, version)
+    cached = None
+    cached_beta = None
+
+    if cache is not None:
+        cached = cache.get(key)
+        cached_beta = cache.get_beta(key)
+
+        if cached is not None and (cached_beta == 0 or cache.get_checked_age(key) < max_age):
+            if progress is not None:
+                progress(len(cached), len(cached))
+
+            return cached
+
+    prefix = base_url + '{0}/{1}/{2}_{1}_firmware_{3}_{4}_{5}'.format(kind, url_part, kind[:-1], *version)
+    urls = [(prefix + '.bin', 0)] + [(prefix + '_beta{0}.bin'.format(beta), beta) for beta in range(MAX_BETA, 0, -1)]
+
+    # only a newer version replaces a cached beta version, one of unknown
+    # origin is replaced by any version
+    if cached is not None and cached_beta is not None:
+        urls = urls[:1] + [(url, beta) for url, beta in urls[1:] if beta > cached_beta]
+
+    for url, beta in urls:
+        # the other URLs would time out as well
+        try:
+            response = urlopen(url, timeout=DOWNLOAD_TIMEOUT)
+        except socket.timeout:
+            break
+        except URLError as e:
+            if isinstance(e.reason, socket.timeout):
+                break
+
+            continue
+
+        # the URL exists, errors while reading are not retried
+        try:
+            data = read_response(response, progress, chunk_size)
+        except IOError:
+            break
+
+        if cache is not None:
+            cache.put(key, data, beta=beta)
+
+        return data
+
+    if cached is not None:
+        cache.set_checked(key)
+
+        if progress is not None:
+            progress(len(cached), len(cached))
+
+    return cached
+
+def download_latest_versions(cache, url, max_age=LATEST_VERSIONS_MAX_AGE):
+    """
+    Returns the content of latest_versions.txt from cache if it isn't older
+    than max_age, otherwise downloaded from url. If the download fails then
+    an older one from cache is returned, or None if there is none.
+    """
+
+    if cache is not None:
+        age = cache.get_age(LATEST_VERSIONS_KEY)
+
+        if age is not None and age < max_age:
+            data = cache.get(LATEST_VERSIONS_KEY)
+
+            if data is not None:
+                return data
+
+    try:
+        data = download(url)
+    except IOError:
+        if cache is not None:
+            return cache.get(LATEST_VERSIONS_KEY)
+
+        return None
+
+    if cache is not None:
+        cache.put(LATEST_VERSIONS_KEY, data)
+
+    return data
+
+def main():
+    from brickv import config
+
+    parser = argparse.ArgumentParser(description='Manages the firmware and plugin cache of Brick Viewer')
+    parser.add_argument('--dir', default=config.FIRMWARE_CACHE_DIRNAME, help='the cache directory')
+    subparsers = parser.add_subparsers(dest='command')
+    seed_parser = subparsers.add_parser('seed', help='add the firmwares, plugins and latest_versions.txt of a directory')
+    seed_parser.add_argument('directory')
+    subparsers.add_parser('list', help='list the cached files')
+    subparsers.add_parser('clear', help='remove all cached files')
+
+    args = parser.parse_args()
+
+    if args.dir is None:
+        parser.error('no cache directory for this platform, use --dir')
+
+    cache = FirmwareCache(args.dir)
+
+    if args.command == 'seed':
+        print('Added {0} files to {1}'.format(cache.seed(args.directory), args.dir))
+    elif args.command == 'list':
+        for key in sorted(cache.index.keys()):
+            beta = cache.get_beta(key)
+
+            if beta:
+                print('{0} beta{1} ({2} bytes)'.format(key, beta, cache.index[key]['size']))
+            else:
+                print('{0} ({1} bytes)'.format(key, cache.index[key]['size']))
+
+        print('{0} of {1} bytes used'.format(cache.get_size(), cache.max_size))
+    elif args.command == 'clear':
+        cache.clear()
+
+if __name__ == "__main__":
+    main()
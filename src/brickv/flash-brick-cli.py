@@ -1,7 +1,17 @@
 import argparse
+import fnmatch
+import glob
+import sys
+import threading
+import time
 from samba import SAMBA, SAMBAException, get_serial_ports
 from serial import SerialException
 
+try:
+	from Queue import Queue, Empty
+except ImportError:
+	from queue import Queue, Empty
+
 class CLIProgress:
 	def __init__(self):
 		self.message = ""
@@ -29,10 +39,129 @@ class CLIProgress:
 		self.max = value
 		self.print_progress()
 
+class BatchProgress:
+	# progress of one of multiple ports, printed as lines prefixed with the
+	# port name, so the output of parallel ports doesn't get mixed up
+	def __init__(self, port, lock):
+		self.port = port
+		self.lock = lock
+		self.message = ""
+		self.max = 0
+		self.quarter = 0
+
+	def print_line(self, line):
+		with self.lock:
+			print("{0}: {1}".format(self.port, line))
+			sys.stdout.flush()
+
+	def reset(self, title, max):
+		self.message = title
+		self.max = max
+		self.quarter = 0
+		self.print_line(title)
+
+	def update(self, value):
+		if self.max > 0 and 4 * value // self.max > self.quarter:
+			self.quarter = 4 * value // self.max
+			self.print_line("{0}: {1:>3} %".format(self.message, 25 * self.quarter))
+
+	def cancel(self):
+		pass
+
+	def setMaximum(self, value):
+		self.max = value
+
+def resolve_ports(patterns):
+	# a pattern is a port name or a glob pattern like "/dev/ttyACM*" that
+	# is matched against the existing files and the known serial ports
+	known_ports = [port[0] for port in get_serial_ports()]
+	ports = []
+
+	for pattern in patterns:
+		if any(c in pattern for c in '*?['):
+			matches = sorted(set(glob.glob(pattern) + fnmatch.filter(known_ports, pattern)))
+		else:
+			matches = [pattern]
+
+		for port in matches:
+			if port not in ports:
+				ports.append(port)
+
+	return ports
+
+def flash_port(port, firmware, differential, crc_applet, progress):
+	# returns None on success, otherwise the error message
+	samba = None
+
+	try:
+		samba = SAMBA(port, progress, crc_applet)
+		samba.flash(firmware, None, False, differential)
+	except SerialException as e:
+		return str(e)
+	except SAMBAException as e:
+		return 'Could not connect to Brick: {0}'.format(e)
+	finally:
+		if samba is not None:
+			samba.port.close()
+
+	return None
+
+def flash_ports(ports, firmware, differential, crc_applet, jobs):
+	# flashes up to jobs ports at the same time, all of them share the same
+	# firmware. returns {port: (error or None, duration)}
+	lock = threading.Lock()
+	pending = Queue()
+	results = {}
+
+	for port in ports:
+		pending.put(port)
+
+	def worker():
+		while True:
+			try:
+				port = pending.get(False)
+			except Empty:
+				return
+
+			progress = BatchProgress(port, lock)
+			start = time.time()
+
+			# any other error only fails this port, the summary needs a
+			# result for each of them
+			try:
+				error = flash_port(port, firmware, differential, crc_applet, progress)
+			except Exception as e:
+				error = 'Unexpected error: {0}'.format(e)
+
+			results[port] = (error, time.time() - start)
+
+			if error is None:
+				progress.print_line("Done in {0:.1f} s".format(results[port][1]))
+			else:
+				progress.print_line("(Error) {0}".format(error))
+
+	threads = []
+
+	for i in range(min(jobs, len(ports))):
+		thread = threading.Thread(target=worker)
+		thread.daemon = True
+		thread.start()
+		threads.append(thread)
+
+	# join with a timeout, otherwise Ctrl+C is not handled until all are done
+	for thread in threads:
+		while thread.is_alive():
+			thread.join(0.5)
+
+	return results
+
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser(description='Used to flash firmware onto a brick')
-	parser.add_argument("-p", "--port", dest = "port", required = True, type=str, help = "the name of the serial-port the brick is connected to")
+	parser.add_argument("-p", "--port", dest = "ports", required = True, type=str, action = "append", help = "the name of the serial-port the brick is connected to, can be given multiple times and can be a glob pattern like /dev/ttyACM* to flash multiple bricks in parallel")
 	parser.add_argument("-f", "--file", dest = "file", required = True, type=str, help = "The path to the firmware-file")
+	parser.add_argument("-d", "--differential", dest = "differential", action = "store_true", help = "only erase and write the pages that differ from the current flash content, implies --crc-applet")
+	parser.add_argument("-c", "--crc-applet", dest = "crc_applet", action = "store_true", help = "compare the flash content with CRC32 checksums computed on the brick instead of reading it back (experimental)")
+	parser.add_argument("-j", "--jobs", dest = "jobs", default = 0, type=int, help = "flash at most this many bricks at the same time, all of them by default")
 	
 	args = parser.parse_args()
 	
@@ -44,15 +173,36 @@ if __name__ == "__main__":
 		print("(Error) Could not read file: {0}".format(e.strerror))
 		exit(-1)
 	
-	try:
-		samba = SAMBA(args.port, CLIProgress())
-		samba.flash(firmware, None, False)
-	except SerialException as e:
-		print("(Error) {0}".format(e))
-		exit(-1)
-	except SAMBAException as e:
-		print('(Error) Could not connect to Brick: {0}'.format(e))
+	# finding the changed pages needs the CRC applet
+	crc_applet = args.crc_applet or args.differential
+	ports = resolve_ports(args.ports)
+	
+	if len(ports) == 0:
+		print("(Error) No serial-port matches {0}".format(", ".join(args.ports)))
 		exit(-1)
-	finally:
-		samba = None
-	exit(0)
+	
+	if len(ports) == 1 and ports == args.ports:
+		try:
+			samba = SAMBA(ports[0], CLIProgress(), crc_applet)
+			samba.flash(firmware, None, False, args.differential)
+		except SerialException as e:
+			print("(Error) {0}".format(e))
+			exit(-1)
+		except SAMBAException as e:
+			print('(Error) Could not connect to Brick: {0}'.format(e))
+			exit(-1)
+		finally:
+			samba = None
+		exit(0)
+	
+	start = time.time()
+	results = flash_ports(ports, firmware, args.differential, crc_applet, args.jobs if args.jobs > 0 else len(ports))
+	failed = [port for port in ports if results[port][0] is not None]
+	
+	print("")
+	print("Flashed {0} of {1} bricks in {2:.1f} s".format(len(ports) - len(failed), len(ports), time.time() - start))
+	
+	for port in failed:
+		print("(Error) {0}: {1}".format(port, results[port][0]))
+	
+	exit(-1 if len(failed) > 0 else 0)
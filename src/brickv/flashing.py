@@ -30,6 +30,8 @@ from PyQt4.QtCore import Qt, QTimer
 from PyQt4.QtGui import QApplication, QColor, QFrame, QFileDialog, QMessageBox, QProgressDialog, QStandardItemModel, QStandardItem, QBrush
 from brickv.samba import SAMBA, SAMBAException, SAMBARebootError, get_serial_ports
 from brickv.infos import get_version_string
+from brickv.firmware_cache import FirmwareCache, download_firmware, download_latest_versions, LATEST_VERSIONS_MAX_AGE
+from brickv import config
 from brickv import infos
 
 import sys
@@ -90,6 +92,11 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
         self.plugin_infos = {}
         self.brick_infos = []
 
+        if config.FIRMWARE_CACHE_DIRNAME is None:
+            self.firmware_cache = None
+        else:
+            self.firmware_cache = FirmwareCache(config.FIRMWARE_CACHE_DIRNAME, config.FIRMWARE_CACHE_SIZE)
+
         self.parent = parent
         self.tab_widget.currentChanged.connect(self.tab_changed)
         self.button_serial_port_refresh.pressed.connect(self.refresh_serial_ports)
@@ -125,12 +132,12 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
         self.update_tree_view.setSortingEnabled(True)
         self.update_tree_view.header().setSortIndicator(0, Qt.AscendingOrder)
 
-        self.update_button_refresh.pressed.connect(self.refresh_updates_pressed)
+        self.update_button_refresh.pressed.connect(self.update_button_refresh_pressed)
         self.update_button_bricklets.pressed.connect(self.auto_update_bricklets_pressed)
 
         self.update_ui_state()
 
-    def refresh_latest_version_info(self, progress):
+    def refresh_latest_version_info(self, progress, max_age=LATEST_VERSIONS_MAX_AGE):
         self.tool_infos = {}
         self.firmware_infos = {}
         self.plugin_infos = {}
@@ -147,11 +154,10 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
 
         okay = True
 
-        try:
-            response = urllib2.urlopen(LATEST_VERSIONS_URL)
-            latest_versions_data = response.read()
-            response.close()
-        except urllib2.URLError:
+        # a cached version is used if tinkerforge.com is not reachable
+        latest_versions_data = download_latest_versions(self.firmware_cache, LATEST_VERSIONS_URL, max_age)
+
+        if latest_versions_data is None:
             okay = False
             progress.cancel()
             self.combo_firmware.setDisabled(True)
@@ -375,6 +381,7 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
         self.button_firmware_save.setEnabled(not is_firmware_select and not is_no_bootloader)
         self.edit_custom_firmware.setEnabled(is_firmware_custom)
         self.button_firmware_browse.setEnabled(is_firmware_custom)
+        self.check_firmware_differential.setEnabled(not is_firmware_select and not is_no_bootloader)
 
         is_plugin_select = self.combo_plugin.currentText() == SELECT
         is_plugin_custom = self.combo_plugin.currentText() == CUSTOM
@@ -404,9 +411,11 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
 
     def firmware_save_pressed(self):
         port = str(self.combo_serial_port.itemData(self.combo_serial_port.currentIndex()).toString())
+        differential = self.check_firmware_differential.isChecked()
 
         try:
-            samba = SAMBA(port)
+            # finding the changed pages needs the CRC applet
+            samba = SAMBA(port, crc_applet=differential)
         except SAMBAException, e:
             self.refresh_serial_ports()
             self.popup_fail('Brick', 'Could not connect to Brick: {0}'.format(str(e)))
@@ -447,41 +456,13 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
 
             progress.reset('Downloading {0} Brick firmware {1}.{2}.{3}'.format(name, *version), 0)
 
-            response = None
-
-            try:
-                response = urllib2.urlopen(FIRMWARE_URL + 'bricks/{0}/brick_{0}_firmware_{1}_{2}_{3}.bin'.format(url_part, *version))
-            except urllib2.URLError:
-                pass
-
-            beta = 5
+            def report_download(value, maximum):
+                progress.setMaximum(maximum)
+                progress.update(value)
 
-            while response is None and beta > 0:
-                try:
-                    response = urllib2.urlopen(FIRMWARE_URL + 'bricks/{0}/brick_{0}_firmware_{2}_{3}_{4}_beta{1}.bin'.format(url_part, beta, *version))
-                except urllib2.URLError:
-                    beta -= 1
-
-            if response is None:
-                progress.cancel()
-                self.popup_fail('Brick', 'Could not download {0} Brick firmware {1}.{2}.{3}'.format(name, *version))
-                return
-
-            try:
-                length = int(response.headers['Content-Length'])
-                progress.setMaximum(length)
-                progress.update(0)
-                QApplication.processEvents()
-                firmware = ''
-                chunk = response.read(1024)
-
-                while len(chunk) > 0:
-                    firmware += chunk
-                    progress.update(len(firmware))
-                    chunk = response.read(1024)
+            firmware = download_firmware(self.firmware_cache, FIRMWARE_URL, 'bricks', url_part, version, report_download)
 
-                response.close()
-            except urllib2.URLError:
+            if firmware is None:
                 progress.cancel()
                 self.popup_fail('Brick', 'Could not download {0} Brick firmware {1}.{2}.{3}'.format(name, *version))
                 return
@@ -589,7 +570,7 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
                                        message)
 
         try:
-            samba.flash(firmware, imu_calibration, lock_imu_calibration_pages)
+            samba.flash(firmware, imu_calibration, lock_imu_calibration_pages, differential)
             # close serial device before showing dialog, otherwise exchanging
             # the brick while the dialog is open will force it to show up as ttyACM1
             samba = None
@@ -721,48 +702,19 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
         progress.setMaximum(0)
         progress.show()
 
-        response = None
+        def report_download(value, maximum):
+            progress.setMaximum(maximum)
+            progress.setValue(value)
 
-        try:
-            response = urllib2.urlopen(FIRMWARE_URL + 'bricklets/{0}/bricklet_{0}_firmware_{1}_{2}_{3}.bin'.format(url_part, *version))
-        except urllib2.URLError:
-            pass
-
-        beta = 5
-
-        while response is None and beta > 0:
-            try:
-                response = urllib2.urlopen(FIRMWARE_URL + 'bricklets/{0}/bricklet_{0}_firmware_{2}_{3}_{4}_beta{1}.bin'.format(url_part, beta, *version))
-            except urllib2.URLError:
-                beta -= 1
+        plugin = download_firmware(self.firmware_cache, FIRMWARE_URL, 'bricklets', url_part, version, report_download, 256)
 
-        if response is None:
+        if plugin is None:
             progress.cancel()
             if popup:
                 self.popup_fail('Bricklet', 'Could not download {0} Bricklet plugin {1}.{2}.{3}'.format(name, *version))
             return None
 
-        try:
-            length = int(response.headers['Content-Length'])
-            progress.setMaximum(length)
-            progress.setValue(0)
-            QApplication.processEvents()
-            plugin = []
-            chunk = response.read(256)
-
-            while len(chunk) > 0:
-                plugin += map(ord, chunk) # Convert plugin to list of bytes
-                progress.setValue(len(plugin))
-                chunk = response.read(256)
-
-            response.close()
-        except urllib2.URLError:
-            progress.cancel()
-            if popup:
-                self.popup_fail('Bricklet', 'Could not download {0} Bricklet plugin {1}.{2}.{3}'.format(name, *version))
-            return None
-
-        return plugin
+        return map(ord, plugin) # Convert plugin to list of bytes
 
     def write_bricklet_plugin(self, plugin, device, port, name, progress, popup=True):
         # Write
@@ -980,7 +932,12 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
             self.brick_changed(self.combo_brick.currentIndex())
             self.port_changed(self.combo_port.currentIndex())
 
-    def refresh_updates_pressed(self):
+    def update_button_refresh_pressed(self):
+        # a refresh by the user doesn't use a recently cached
+        # latest_versions.txt
+        self.refresh_updates_pressed(0)
+
+    def refresh_updates_pressed(self, max_age=LATEST_VERSIONS_MAX_AGE):
         if self.tab_widget.currentIndex() != 0:
             self.refresh_updates_pending = True
             return
@@ -1031,7 +988,7 @@ class FlashingWindow(QFrame, Ui_widget_flashing):
             return
 
         if okay:
-            self.refresh_latest_version_info(progress)
+            self.refresh_latest_version_info(progress, max_age)
 
         def get_color_for_device(device):
             if device.firmware_version_installed >= device.firmware_version_latest:
@@ -22,6 +22,7 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv import config
+from brickv.bindings.brick_master import BrickMaster
 
 UID_BRICKV = '$BRICKV'
 UID_BRICKD = '$BRICKD'
@@ -142,8 +143,89 @@ class BrickMasterInfo(BrickInfo):
 def get_version_string(version_tuple):
     return '.'.join(map(str, version_tuple))
 
+def get_connected_infos(uid):
+    return [infos[connected_uid] for connected_uid in connected_uids.get(uid, ())]
+
+def set_connected_uid(info, connected_uid):
+    if info.connected_uid in connected_uids:
+        connected_uids[info.connected_uid].discard(info.uid)
+
+    info.connected_uid = connected_uid
+
+    if not connected_uid in connected_uids:
+        connected_uids[connected_uid] = set()
+
+    connected_uids[connected_uid].add(info.uid)
+
+def update_device_info(uid, connected_uid, position, hardware_version,
+                       firmware_version, device_identifier, enumeration_type):
+    """
+    Creates or updates the info for an enumerated device and links it with
+    its Brick or its Bricklets. Returns the info.
+    """
+
+    if device_identifier == BrickMaster.DEVICE_IDENTIFIER:
+        info_class = BrickMasterInfo
+    elif position in ('a', 'b', 'c', 'd', 'A', 'B', 'C', 'D'):
+        position = position.lower()
+        info_class = BrickletInfo
+    else:
+        info_class = BrickInfo
+
+    if uid in infos:
+        info = infos[uid]
+    else:
+        info = info_class()
+        info.uid = uid
+        infos[uid] = info
+
+    if info.type == 'bricklet':
+        brick_info = infos.get(connected_uid)
+
+        if brick_info is not None and brick_info.type == 'brick':
+            brick_info.bricklets[position] = info
+    elif info.type == 'brick':
+        for bricklet_info in get_connected_infos(uid):
+            if bricklet_info.type == 'bricklet':
+                info.bricklets[bricklet_info.position] = bricklet_info
+
+    set_connected_uid(info, connected_uid)
+
+    info.position = position
+    info.hardware_version = hardware_version
+    info.firmware_version_installed = firmware_version
+    info.device_identifier = device_identifier
+    info.protocol_version = 2
+    info.enumeration_type = enumeration_type
+
+    return info
+
+def remove_info(uid):
+    """
+    Removes the info for uid and unlinks it from its Brick. Returns the
+    removed info or None.
+    """
+
+    info = infos.pop(uid, None)
+
+    if info is None or info.type not in ('brick', 'bricklet'):
+        return info
+
+    brick_info = infos.get(info.connected_uid)
+
+    if brick_info is not None and brick_info.type == 'brick':
+        for port in brick_info.bricklets:
+            if brick_info.bricklets[port] is info:
+                brick_info.bricklets[port] = None
+
+    if info.connected_uid in connected_uids:
+        connected_uids[info.connected_uid].discard(uid)
+
+    return info
+
 if not 'infos' in globals():
     infos = {UID_BRICKV: ToolInfo(), UID_BRICKD: ToolInfo()}
     infos[UID_BRICKV].name = 'Brick Viewer'
     infos[UID_BRICKV].firmware_version_installed = tuple(map(int, config.BRICKV_VERSION.split('.')))
     infos[UID_BRICKD].name = 'Brick Daemon'
+    connected_uids = {} # connected UID -> set of UIDs of the devices connected to it
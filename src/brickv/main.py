@@ -43,12 +43,14 @@ if not 'brickv' in sys.modules:
     if not head in sys.path:
         sys.path.insert(0, head)
 
-from PyQt4.QtGui import QApplication
-from PyQt4.QtCore import QEvent
-
 from brickv import config
-from brickv.mainwindow import MainWindow
-from brickv.async_call import ASYNC_EVENT, async_event_handler
+
+# the data logger runs headless and has to work without PyQt4
+headless = '--log' in sys.argv[1:]
+
+if not headless:
+    from PyQt4.QtGui import QApplication
+    from brickv.mainwindow import MainWindow
 
 logging.basicConfig( 
     level = config.LOGGING_LEVEL, 
@@ -56,18 +58,28 @@ logging.basicConfig(
     datefmt = config.LOGGING_DATEFMT
 ) 
 
-class BrickViewer(QApplication):
-    def notify(self, receiver, event):
-        if event.type() > QEvent.User:
-            if event.type() == ASYNC_EVENT:
-                async_event_handler()
-        return super(BrickViewer, self).notify(receiver, event)
+def log_main():
+    from brickv import data_logger
+
+    argv = sys.argv[1:]
+    argv.remove('--log')
+
+    sys.exit(data_logger.main(argv))
 
 def main():
-    brick_viewer = BrickViewer(sys.argv)
+    if headless:
+        log_main()
+
+    brick_viewer = QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
-    sys.exit(brick_viewer.exec_())
+    exit_code = brick_viewer.exec_()
+
+    # list the modules loaded at startup and the plugins loaded on demand
+    if '--import-report' in sys.argv:
+        print main_window.plugin_manager.get_import_report()
+
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -33,12 +33,14 @@ from brickv.plugin_system.plugin_manager import PluginManager
 from brickv.bindings.ip_connection import IPConnection
 from brickv.flashing import FlashingWindow
 from brickv.advanced import AdvancedWindow
-from brickv.async_call import async_start_thread, async_next_session
-from brickv.bindings.brick_master import BrickMaster
+from brickv.async_call import async_start_threads, async_next_session
+from brickv.callback_coalescer import unregister_coalesced_callbacks
 from brickv.program_path import get_program_path
 from brickv import config
 from brickv import infos
 
+from collections import OrderedDict
+
 import os
 import signal
 import sys
@@ -46,6 +48,10 @@ import time
 
 HOST_HISTORY_SIZE = 5
 
+# sorting the tree view and updating the flashing and advanced windows is
+# done once this long after the last enumerate callback of a burst
+TREE_VIEW_REFRESH_DELAY = 100 # ms
+
 class MainTableModel(QAbstractTableModel):
     def __init__(self, header, data, parent=None, *args):
         QAbstractTableModel.__init__(self, parent, *args)
@@ -87,7 +93,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         signal.signal(signal.SIGINT, self.exit_brickv)
         signal.signal(signal.SIGTERM, self.exit_brickv)
 
-        self.async_thread = async_start_thread(self)
+        self.async_threads = async_start_threads(self)
 
         self.setWindowTitle("Brick Viewer " + config.BRICKV_VERSION)
 
@@ -95,6 +101,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.tree_view_model = QStandardItemModel()
         self.tree_view.setModel(self.tree_view_model)
         self.tree_view.doubleClicked.connect(self.item_double_clicked)
+        self.tree_view_rows = {} # uid -> (parent uid, row items)
         self.set_tree_view_defaults()
 
         # Remove dummy tab
@@ -122,9 +129,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.flashing_window = None
         self.advanced_window = None
+        self.deferred_plugins = OrderedDict() # uid -> plugin container, least recently viewed first
         self.delayed_refresh_updates_timer = QTimer()
         self.delayed_refresh_updates_timer.timeout.connect(self.delayed_refresh_updates)
         self.delayed_refresh_updates_timer.setInterval(500)
+        self.tree_view_refresh_timer = QTimer()
+        self.tree_view_refresh_timer.setSingleShot(True)
+        self.tree_view_refresh_timer.timeout.connect(self.refresh_tree_view)
+        self.tree_view_refresh_timer.setInterval(TREE_VIEW_REFRESH_DELAY)
         self.reset_view()
         self.button_advanced.setDisabled(True)
 
@@ -233,6 +245,16 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def tab_changed(self, i):
         try:
             uid = self.tab_widget.widget(i)._uid
+        except:
+            uid = None
+
+        if uid in self.deferred_plugins:
+            # mark as most recently viewed
+            self.deferred_plugins[uid] = self.deferred_plugins.pop(uid)
+        elif uid in infos.infos and infos.infos[uid].plugin == None:
+            self.create_deferred_plugin(infos.infos[uid])
+
+        try:
             infos.infos[uid].plugin.start()
         except:
             pass
@@ -245,6 +267,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.last_tab = i
 
+        self.evict_deferred_plugins()
+
     def reset_view(self):
         self.tab_widget.setCurrentIndex(0)
 
@@ -260,13 +284,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     infos.infos[key].plugin.destroy()
                 except:
                     pass
+
+                unregister_coalesced_callbacks(key)
                 keys_to_remove.append(key)
 
         for key in keys_to_remove:
-            try:
-                infos.infos.pop(key)
-            except:
-                pass
+            infos.remove_info(key)
+
+        self.deferred_plugins.clear()
 
         for i in reversed(range(1, self.tab_widget.count())):
             self.tab_widget.removeTab(i)
@@ -434,6 +459,43 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         return container
 
+    def create_deferred_plugin_container(self, uid):
+        container = QWidget()
+        container._uid = uid
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        return container
+
+    def create_deferred_plugin(self, info):
+        plugin = self.plugin_manager.get_plugin(info.device_identifier, self.ipcon,
+                                                info.uid, info.firmware_version_installed)
+        container = self.create_plugin_container(plugin, info.connected_uid, info.position)
+
+        info.plugin = plugin
+        info.plugin_container.layout().addWidget(container)
+
+        self.deferred_plugins[info.uid] = container
+
+    def evict_deferred_plugins(self):
+        # the plugin of the current tab is the most recently viewed one and
+        # is never evicted
+        while config.PLUGIN_CACHE_SIZE > 0 and len(self.deferred_plugins) > config.PLUGIN_CACHE_SIZE:
+            uid, container = self.deferred_plugins.popitem(False)
+            info = infos.infos.get(uid)
+
+            if info is not None:
+                try:
+                    info.plugin.destroy()
+                except:
+                    pass
+
+                unregister_coalesced_callbacks(uid)
+                info.plugin = None
+
+            container.setParent(None)
+            container.deleteLater()
+
     def tab_for_uid(self, uid):
         for i in range(1, self.tab_widget.count()):
             try:
@@ -454,94 +516,70 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         if enumeration_type in [IPConnection.ENUMERATION_TYPE_AVAILABLE,
                                 IPConnection.ENUMERATION_TYPE_CONNECTED]:
-            if device_identifier == BrickMaster.DEVICE_IDENTIFIER:
-                info = infos.BrickMasterInfo()
-            elif position in ('a', 'b', 'c', 'd', 'A', 'B', 'C', 'D'):
-                position = position.lower()
-                info = infos.BrickletInfo()
-            else:
-                info = infos.BrickInfo()
+            info = infos.update_device_info(uid, connected_uid, position,
+                                            hardware_version, firmware_version,
+                                            device_identifier, enumeration_type)
 
-            if uid in infos.infos:
-                info = infos.infos[uid]
-            else:
-                infos.infos[uid] = info
-
-            for device in infos.infos.values():
-                if device.type == 'brick':
-                    if info.type == 'bricklet':
-                        if device.uid == connected_uid:
-                            device.bricklets[position] = info
-                if device.type == 'bricklet':
-                    if info.type == 'brick':
-                        if uid == device.connected_uid:
-                            info.bricklets[device.position] = device
-
-            info.uid = uid
-            info.connected_uid = connected_uid
-            info.position = position
-            info.hardware_version = hardware_version
-            info.firmware_version_installed = firmware_version
-            info.device_identifier = device_identifier
-            info.protocol_version = 2
-            info.enumeration_type = enumeration_type
-
-            for device in infos.infos.values():
-                if device.type in ('brick', 'bricklet'):
-                    if device.uid == uid and device.plugin != None:
-                        return
-
-            plugin = self.plugin_manager.get_plugin(device_identifier, self.ipcon,
-                                                    uid, firmware_version)
-
-            if plugin is not None:
-                info.plugin = plugin
-                if plugin.is_hardware_version_relevant(hardware_version):
-                    info.name = '{0} {1}.{2}'.format(plugin.name,
-                                                     hardware_version[0],
-                                                     hardware_version[1])
+            if info.plugin == None and info.plugin_container == None:
+                metadata = self.plugin_manager.get_plugin_metadata(device_identifier)
+
+                if info.type == 'bricklet' and metadata != None:
+                    # the plugin is created when its tab is shown first
+                    info.name, info.url_part = metadata
+
+                    c = self.create_deferred_plugin_container(uid)
+                    info.plugin_container = c
+                    self.tab_widget.addTab(c, info.name)
                 else:
-                    info.name = plugin.name
+                    plugin = self.plugin_manager.get_plugin(device_identifier, self.ipcon,
+                                                            uid, firmware_version)
+
+                    if plugin is not None:
+                        info.plugin = plugin
+                        if plugin.is_hardware_version_relevant(hardware_version):
+                            info.name = '{0} {1}.{2}'.format(plugin.name,
+                                                             hardware_version[0],
+                                                             hardware_version[1])
+                        else:
+                            info.name = plugin.name
 
-                info.url_part = plugin.get_url_part()
+                        info.url_part = plugin.get_url_part()
 
-                c = self.create_plugin_container(plugin, connected_uid, position)
-                info.plugin_container = c
-                self.tab_widget.addTab(c, info.name)
+                        c = self.create_plugin_container(plugin, connected_uid, info.position)
+                        info.plugin_container = c
+                        self.tab_widget.addTab(c, info.name)
+
+            self.update_tree_view_row(info)
         elif enumeration_type == IPConnection.ENUMERATION_TYPE_DISCONNECTED:
-            for device_info in infos.infos.values():
-                if device_info.type in ('brick', 'bricklet'):
-                    if device_info.uid == uid:
+            device_info = infos.infos.get(uid)
+
+            if device_info is not None and device_info.type in ('brick', 'bricklet'):
+                try:
+                    self.tab_widget.setCurrentIndex(0)
+                    if device_info.plugin:
+                        try:
+                            device_info.plugin.stop()
+                        except:
+                            pass
+
                         try:
-                            self.tab_widget.setCurrentIndex(0)
-                            if device_info.plugin:
-                                try:
-                                    device_info.plugin.stop()
-                                except:
-                                    pass
-
-                                try:
-                                    device_info.plugin.destroy()
-                                except:
-                                    pass
-
-                            i = self.tab_for_uid(device_info.uid)
-                            self.tab_widget.removeTab(i)
+                            device_info.plugin.destroy()
                         except:
                             pass
 
-                if device_info.type == 'brick':
-                    for port in device_info.bricklets:
-                        if device_info.bricklets[port]:
-                            if device_info.bricklets[port].uid == uid:
-                                device_info.bricklets[port] = None
+                        unregister_coalesced_callbacks(uid)
 
-                try:
-                    infos.infos.pop(uid)
+                    i = self.tab_for_uid(device_info.uid)
+                    self.tab_widget.removeTab(i)
                 except:
                     pass
 
-        self.update_tree_view()
+                self.deferred_plugins.pop(uid, None)
+
+            self.remove_tree_view_row(uid)
+            infos.remove_info(uid)
+
+        self.schedule_tree_view_refresh()
 
     def cb_connected(self, connect_reason):
         self.disconnect_times = []
@@ -658,27 +696,88 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         QApplication.processEvents()
 
     def update_tree_view(self):
-        self.tree_view_model.clear()
+        self.tree_view_model.removeRows(0, self.tree_view_model.rowCount())
+        self.tree_view_rows = {}
 
-        for device_info in sorted(infos.infos.values(), cmp=lambda x, y: cmp(x.name, y.name)):
+        for device_info in infos.infos.values():
             if device_info.type == 'brick':
-                parent = [QStandardItem(device_info.name),
-                          QStandardItem(device_info.uid),
-                          QStandardItem('.'.join(map(str, device_info.firmware_version_installed)))]
-                for item in parent:
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-
-                self.tree_view_model.appendRow(parent)
-                for port in sorted(device_info.bricklets):
-                    if device_info.bricklets[port] and device_info.bricklets[port].protocol_version == 2:
-                        child = [QStandardItem(port.upper() + ': ' +device_info.bricklets[port].name),
-                                 QStandardItem(device_info.bricklets[port].uid),
-                                 QStandardItem('.'.join(map(str, device_info.bricklets[port].firmware_version_installed)))]
-                        for item in child:
-                            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                        parent[0].appendRow(child)
+                self.update_tree_view_row(device_info)
+
+        self.schedule_tree_view_refresh()
+
+    def update_tree_view_row(self, device_info):
+        """
+        Inserts or updates the row of a Brick or Bricklet in the tree view.
+        Bricklets are shown as children of their Brick, a Bricklet without
+        a Brick in the tree view is added together with its Brick.
+        """
+
+        brick_row = self.tree_view_rows.get(device_info.connected_uid)
+
+        if device_info.type == 'brick':
+            parent_uid = None
+            parent_item = self.tree_view_model.invisibleRootItem()
+            name = device_info.name
+        elif device_info.type == 'bricklet' and device_info.protocol_version == 2 and \
+             brick_row is not None and brick_row[0] is None:
+            parent_uid = device_info.connected_uid
+            parent_item = brick_row[1][0]
+            name = device_info.position.upper() + ': ' + device_info.name
+        else:
+            self.remove_tree_view_row(device_info.uid)
+            return
+
+        texts = [name, device_info.uid, '.'.join(map(str, device_info.firmware_version_installed))]
+        row = self.tree_view_rows.get(device_info.uid)
+
+        if row is not None and row[0] != parent_uid:
+            # Bricklet moved to another Brick
+            self.remove_tree_view_row(device_info.uid)
+            row = None
+
+        if row is not None:
+            for item, text in zip(row[1], texts):
+                if item.text() != text:
+                    item.setText(text)
+
+            return
+
+        items = [QStandardItem(text) for text in texts]
+        for item in items:
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+
+        parent_item.appendRow(items)
+        self.tree_view_rows[device_info.uid] = (parent_uid, items)
+
+        if device_info.type == 'brick':
+            for bricklet_info in infos.get_connected_infos(device_info.uid):
+                self.update_tree_view_row(bricklet_info)
+
+    def remove_tree_view_row(self, uid):
+        row = self.tree_view_rows.pop(uid, None)
+
+        if row is None:
+            return
+
+        parent_item = row[1][0]
+
+        # the Bricklet rows of a Brick are removed together with it
+        for i in range(parent_item.rowCount()):
+            self.tree_view_rows.pop(str(parent_item.child(i, 1).text()), None)
+
+        index = self.tree_view_model.indexFromItem(parent_item)
+        self.tree_view_model.removeRow(index.row(), index.parent())
+
+    def schedule_tree_view_refresh(self):
+        # restarting the timer delays the refresh until the burst is over
+        self.tree_view_refresh_timer.start()
+
+    def refresh_tree_view(self):
+        header = self.tree_view.header()
+
+        self.tree_view_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        self.tree_view.expandAll()
 
-        self.set_tree_view_defaults()
         self.update_flashing_window()
         self.update_advanced_window()
         self.delayed_refresh_updates_timer.start()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+plot_data.py: Buffers and level of detail data for the plots
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+import numpy
+
+# each level of a MinMaxPyramid combines this many blocks of the level below
+PYRAMID_FACTOR = 4
+
+class RingBuffer:
+    """
+    Fixed capacity buffer of float values. Every value is stored twice, at
+    index i and i + capacity, so the buffered values are always available
+    as one contiguous array without copying.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = numpy.zeros(2 * capacity)
+        self.start = 0
+        self.count = 0
+        self.total = 0 # number of values ever appended
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        end = (self.start + self.count) % self.capacity
+
+        self.data[end] = value
+        self.data[end + self.capacity] = value
+        self.total += 1
+
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def extend(self, values):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        length = len(values)
+
+        self.total += length
+
+        if length >= self.capacity:
+            self.data[:self.capacity] = values[-self.capacity:]
+            self.data[self.capacity:] = values[-self.capacity:]
+            self.start = 0
+            self.count = self.capacity
+            return
+
+        end = (self.start + self.count) % self.capacity
+        first = min(length, self.capacity - end)
+        rest = length - first
+
+        self.data[end:end + first] = values[:first]
+        self.data[end + self.capacity:end + self.capacity + first] = values[:first]
+
+        if rest > 0:
+            self.data[:rest] = values[first:]
+            self.data[self.capacity:self.capacity + rest] = values[first:]
+
+        overflow = self.count + length - self.capacity
+
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.count = self.capacity
+        else:
+            self.count += length
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+        self.total = 0
+
+    def discard(self, count):
+        # drops the first count values
+        count = min(count, self.count)
+
+        self.start = (self.start + count) % self.capacity
+        self.count -= count
+
+    def first(self):
+        return self.data[self.start]
+
+    def last(self):
+        return self.data[self.start + self.count - 1]
+
+    def set_last(self, value):
+        end = (self.start + self.count - 1) % self.capacity
+
+        self.data[end] = value
+        self.data[end + self.capacity] = value
+
+    def get(self, count=None):
+        # the last count values, or all of them
+        if count is None or count > self.count:
+            count = self.count
+
+        return self.data[self.start + self.count - count:self.start + self.count]
+
+class PyramidLevel:
+    def __init__(self, block_size, block_count):
+        self.block_size = block_size
+        self.x = RingBuffer(block_count) # x value of the first sample of a block
+        self.min = RingBuffer(block_count)
+        self.max = RingBuffer(block_count)
+
+    def clear(self):
+        self.x.clear()
+        self.min.clear()
+        self.max.clear()
+
+class MinMaxPyramid:
+    """
+    Minimum and maximum of the values of a time series per block of
+    samples, at multiple block sizes. Level k has blocks of
+    PYRAMID_FACTOR ** (k + 1) samples. The blocks are aligned to the
+    absolute sample index, so new samples only touch the last block of
+    each level.
+
+    The samples themselves are kept by the caller in two RingBuffers with the
+    given capacity, get() needs them to draw the newest samples without
+    decimation.
+    """
+
+    def __init__(self, capacity):
+        self.levels = []
+        self.total = 0
+
+        block_size = PYRAMID_FACTOR
+
+        while block_size < capacity:
+            # the oldest block might still overlap the buffered samples
+            # while its first samples got dropped already
+            self.levels.append(PyramidLevel(block_size, capacity // block_size + 2))
+            block_size *= PYRAMID_FACTOR
+
+    def append(self, x, y):
+        for level in self.levels:
+            if self.total % level.block_size == 0:
+                level.x.append(x)
+                level.min.append(y)
+                level.max.append(y)
+            else:
+                if y < level.min.last():
+                    level.min.set_last(y)
+
+                if y > level.max.last():
+                    level.max.set_last(y)
+
+        self.total += 1
+
+    def extend(self, xs, ys):
+        xs = numpy.asarray(xs, dtype=numpy.float64)
+        ys = numpy.asarray(ys, dtype=numpy.float64)
+        length = len(ys)
+
+        if length == 0:
+            return
+
+        for level in self.levels:
+            # the first samples complete the last block
+            offset = self.total % level.block_size
+            complete = 0
+
+            if offset != 0:
+                complete = min(level.block_size - offset, length)
+
+                level.min.set_last(min(level.min.last(), ys[:complete].min()))
+                level.max.set_last(max(level.max.last(), ys[:complete].max()))
+
+            if complete < length:
+                starts = numpy.arange(0, length - complete, level.block_size)
+
+                level.x.extend(xs[complete:][starts])
+                level.min.extend(numpy.minimum.reduceat(ys[complete:], starts))
+                level.max.extend(numpy.maximum.reduceat(ys[complete:], starts))
+
+        self.total += length
+
+    def clear(self):
+        for level in self.levels:
+            level.clear()
+
+        self.total = 0
+
+    def get(self, data_x, data_y, width):
+        """
+        Returns x and y arrays to draw the samples of data_x and data_y with
+        about width points per curve. If there are more samples than that
+        the minimum and maximum of each block of the smallest fitting level
+        are returned, so spikes stay visible.
+        """
+
+        count = len(data_y)
+
+        if count <= 2 * width or len(self.levels) == 0:
+            return data_x.get(), data_y.get()
+
+        first = data_y.total - count
+
+        for level in self.levels:
+            blocks = (data_y.total - 1) // level.block_size - first // level.block_size + 1
+
+            if blocks <= width or level is self.levels[-1]:
+                break
+
+        blocks = min(blocks, len(level.min))
+        x = numpy.empty(2 * blocks + 1)
+        y = numpy.empty(2 * blocks + 1)
+
+        x[0:-1:2] = level.x.get(blocks)
+        x[1::2] = x[0:-1:2]
+        y[0:-1:2] = level.min.get(blocks)
+        y[1::2] = level.max.get(blocks)
+
+        # the first block might start before the first buffered sample. the
+        # last block is drawn at its start, so the newest sample is added
+        x[0:2] = numpy.maximum(x[0:2], data_x.first())
+        x[-1] = data_x.last()
+        y[-1] = data_y.last()
+
+        return x, y
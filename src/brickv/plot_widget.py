@@ -21,19 +21,46 @@ Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 Boston, MA 02111-1307, USA.
 """
 
-from PyQt4.QtGui import QVBoxLayout, QWidget, QPushButton
-from PyQt4.QtCore import QTimer, Qt
+from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QComboBox, QLabel
+from PyQt4.QtCore import QObject, QTimer, Qt
 import PyQt4.Qwt5 as Qwt
+from brickv.callback_coalescer import FRAME_INTERVAL, register_coalesced_callback
+from brickv.async_call import async_call
+from brickv.plot_data import RingBuffer, MinMaxPyramid
+from brickv.bindings.ip_connection import get_monotonic_time
+from brickv import config
 
+from collections import deque
+
+import logging
+import time
+import numpy
+
+# lengths of the plotted history that can be selected below a PlotWidget
+HISTORY_LENGTHS = [(20, '20 s'), (60, '1 min'), (10 * 60, '10 min'), (60 * 60, '1 h')] # s
+
+# PlotWidget samples the getter values every 100 ms and scrolls the time
+# axis at this rate while no new values arrive
+SAMPLE_RATE = 10 # Hz
+
+# the buffers of a PlotWidget are sized for values arriving at this rate,
+# values arriving faster shorten the plotted history
+MAX_SAMPLE_RATE = 100 # Hz
+
+# number of frames the frame time statistics are calculated over
+FRAME_STATISTICS_SIZE = 100
 
 class Plot(Qwt.QwtPlot):
-    def __init__(self, y_axis, plot_list, axis_scales, *args):
+    def __init__(self, y_axis, plot_list, axis_scales, history_length,
+                 level_of_detail=False, *args):
         Qwt.QwtPlot.__init__(self, *args)
      
         self.setAxisTitle(Qwt.QwtPlot.xBottom, 'Time [s]')
         self.setAxisTitle(Qwt.QwtPlot.yLeft, y_axis)
         
         self.axis_scales = axis_scales
+        self.history_length = history_length
+        self.level_of_detail = level_of_detail
         self.has_legend = plot_list[0][0] != ''
         
         if self.has_legend: 
@@ -41,19 +68,29 @@ class Plot(Qwt.QwtPlot):
             legend.setItemMode(Qwt.QwtLegend.CheckableItem)
             self.insertLegend(legend, Qwt.QwtPlot.RightLegend)
         
-        self.setAutoReplot(True)
-        
+        # the PlotScheduler replots once per frame
+        self.setAutoReplot(False)
+
+        if self.axis_scales is not None:
+            for x in self.axis_scales:
+                self.setAxisScale(*x)
+
+        self.dirty_curves = set()
         self.curve = []
         
         self.data_x = []
         self.data_y = []
+        self.pyramids = [] # only used in level of detail mode
         
         for x in plot_list:
             c = Qwt.QwtPlotCurve(x[0])
 #            c.setRenderHint(Qwt.QwtPlotItem.RenderAntialiased)
             self.curve.append(c)
-            self.data_x.append([])
-            self.data_y.append([])
+            self.data_x.append(RingBuffer(history_length * MAX_SAMPLE_RATE))
+            self.data_y.append(RingBuffer(history_length * MAX_SAMPLE_RATE))
+
+            if level_of_detail:
+                self.pyramids.append(MinMaxPyramid(history_length * MAX_SAMPLE_RATE))
         
             c.attach(self)
             c.setPen(x[1])
@@ -71,35 +108,115 @@ class Plot(Qwt.QwtPlot):
         self.replot()
            
 
+    def set_history_length(self, history_length):
+        # the buffers are replaced by ones of the new size, the newest
+        # values are kept
+        self.history_length = history_length
+        capacity = history_length * MAX_SAMPLE_RATE
+
+        for i in range(len(self.curve)):
+            data_x = self.data_x[i].get()
+            data_y = self.data_y[i].get()
+
+            self.data_x[i] = RingBuffer(capacity)
+            self.data_y[i] = RingBuffer(capacity)
+            self.data_x[i].extend(data_x)
+            self.data_y[i].extend(data_y)
+
+            if self.level_of_detail:
+                self.pyramids[i] = MinMaxPyramid(capacity)
+                self.pyramids[i].extend(data_x, data_y)
+
+            self.dirty_curves.add(i)
+
     def add_data(self, i, data_x, data_y):
         self.data_x[i].append(data_x)
         self.data_y[i].append(data_y)
-        if len(self.data_x[i]) == 200: # 30 seconds
-            self.data_x[i] = self.data_x[i][10:]
-            self.data_y[i] = self.data_y[i][10:]
-#            self.data_x[i].pop(0)
-#            self.data_y[i].pop(0)
-            
-        self.setAxisScale(Qwt.QwtPlot.xBottom, self.data_x[i][0], self.data_x[i][0]+20) #self.data_x[i][-1])
 
-        if self.axis_scales is not None:
-            for x in self.axis_scales:
-                self.setAxisScale(*x)
+        if len(self.pyramids) > 0:
+            self.pyramids[i].append(data_x, data_y)
+
+        self.dirty_curves.add(i)
+
+    def extend_data(self, i, data_x, data_y):
+        self.data_x[i].extend(data_x)
+        self.data_y[i].extend(data_y)
+
+        if len(self.pyramids) > 0:
+            self.pyramids[i].extend(data_x, data_y)
+
+        self.dirty_curves.add(i)
+
+    def render(self, now):
+        # the time axis ends at now once the history is filled, all curves
+        # scroll along with it
+        x_min = max(now - self.history_length, 0.0)
+
+        self.setAxisScale(Qwt.QwtPlot.xBottom, x_min, x_min + self.history_length)
+
+        for i in range(len(self.curve)):
+            self.discard_data(i, x_min)
+            self.update_curve(i, now)
+
+        self.dirty_curves.clear()
+        self.replot()
+
+    def discard_data(self, i, x_min):
+        # keep the last value before x_min, so the curve starts at the axis
+        count = numpy.searchsorted(self.data_x[i].get(), x_min) - 1
+
+        if count > 0:
+            self.data_x[i].discard(count)
+            self.data_y[i].discard(count)
+
+    def update_curve(self, i, now):
+        width = self.canvas().width()
+
+        if len(self.pyramids) > 0:
+            # minimum and maximum per pixel column, spikes stay visible
+            data_x, data_y = self.pyramids[i].get(self.data_x[i], self.data_y[i], max(width, 1))
+        else:
+            data_x = self.data_x[i].get()
+            data_y = self.data_y[i].get()
+
+            # more values than pixels, only draw every step-th value. the
+            # selected values depend on the total value count, not on the
+            # position in the buffer, so they don't change between updates
+            if width > 0 and len(data_x) > width:
+                step = (len(data_x) + width - 1) // width
+                offset = -(self.data_x[i].total - len(data_x)) % step
+                data_x = data_x[offset::step]
+                data_y = data_y[offset::step]
+
+        # callbacks only report changed values, the last value is still
+        # valid now
+        if len(data_x) > 0 and data_x[-1] < now:
+            data_x = numpy.append(data_x, now)
+            data_y = numpy.append(data_y, data_y[-1])
+
+        self.curve[i].setData(data_x, data_y)
 
-        self.curve[i].setData(self.data_x[i], self.data_y[i])
-        
     def clear_graph(self):
         for i in range(len(self.data_x)):
-            self.data_x[i] = []
-            self.data_y[i] = []
-            
+            self.data_x[i].clear()
+            self.data_y[i].clear()
+            self.dirty_curves.add(i)
+
+        for pyramid in self.pyramids:
+            pyramid.clear()
+
 class PlotWidget(QWidget):
-    def __init__(self, y_axis, plot_list, clear_button = None, parent = None, axis_scales = None):
+    def __init__(self, y_axis, plot_list, clear_button = None, parent = None, axis_scales = None,
+                 history_length = None, level_of_detail = False):
         QWidget.__init__(self, parent)
         
-        self.stop = True
+        self._stop = True
+
+        # without a fixed history length the last selected one is used
+        if history_length is None:
+            history_length = config.get_plot_history_length()
         
-        self.plot = Plot(y_axis, plot_list, axis_scales)
+        self.plot = Plot(y_axis, plot_list, axis_scales, history_length, level_of_detail)
 
         if clear_button is None:
             self.clear_button = QPushButton('Clear Graph')
@@ -111,31 +228,275 @@ class PlotWidget(QWidget):
         layout = QVBoxLayout(self)
         layout.addWidget(self.plot)
 
+        # PlotWidgets sharing a clear button of the plugin don't get their
+        # own history selection
         if clear_button is None:
-            layout.addWidget(self.clear_button)
+            self.history_lengths = [length for length, text in HISTORY_LENGTHS]
+            self.combo_history = QComboBox()
+
+            for length, text in HISTORY_LENGTHS:
+                self.combo_history.addItem(text)
+
+            if history_length not in self.history_lengths:
+                self.history_lengths.append(history_length)
+                self.combo_history.addItem('{0} s'.format(history_length))
+
+            self.combo_history.setCurrentIndex(self.history_lengths.index(history_length))
+            self.combo_history.currentIndexChanged.connect(self.history_changed)
+
+            bottom_layout = QHBoxLayout()
+            bottom_layout.addWidget(QLabel('History:'))
+            bottom_layout.addWidget(self.combo_history)
+            bottom_layout.addWidget(self.clear_button, 1)
+            layout.addLayout(bottom_layout)
         
-        self.counter = 0
+        self.start_time = None # timestamp of x = 0, set by the first value
+        self.render_time = 0.0 # x at the last render
         self.update_func = []
+
+        # (timestamp, values) added by the callback threads, drained by the
+        # PlotScheduler in the GUI thread. appending to a deque is atomic, so
+        # no lock is needed
+        self.pending_samples = deque(maxlen=history_length * MAX_SAMPLE_RATE)
         
         for pl in plot_list:
             self.update_func.append(pl[2])
-        
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update)
-        self.timer.start(100)
-        
-    def update(self):
-        if self.stop:
-            return
-        
+
+    def get_stop(self):
+        return self._stop
+
+    def set_stop(self, stop):
+        # only started PlotWidgets are sampled and rendered
+        self._stop = stop
+
+        if stop:
+            get_plot_scheduler().remove_widget(self)
+        else:
+            get_plot_scheduler().add_widget(self)
+
+    stop = property(get_stop, set_stop)
+
+    def add_samples(self, timestamp, values):
+        """
+        Adds values with one value per curve, None leaves a curve out.
+        timestamp is the receive timestamp of the values as returned by
+        IPConnection.get_callback_timestamp(). This is meant to be called
+        in the callback thread, e.g. by the sample_function of
+        register_coalesced_callback, for curves that have None as getter.
+        """
+
+        if timestamp is None:
+            timestamp = get_monotonic_time()
+
+        self.pending_samples.append((timestamp, values))
+
+    def get_x(self, timestamp):
+        if self.start_time is None:
+            self.start_time = timestamp
+
+        return timestamp - self.start_time
+
+    def sample(self):
+        # curves without getter get their values by add_samples
+        x = None
+
         for i in range(len(self.update_func)):
+            if self.update_func[i] is None:
+                continue
+
             value = self.update_func[i]()
 
             if value is not None:
-                self.plot.add_data(i, self.counter/10.0, value)
-            
-        self.counter += 1
+                if x is None:
+                    x = self.get_x(get_monotonic_time())
+
+                self.plot.add_data(i, x, value)
+
+    def ingest_samples(self):
+        count = len(self.pending_samples)
+
+        if count == 0:
+            return
+
+        data_x = [[] for i in range(len(self.update_func))]
+        data_y = [[] for i in range(len(self.update_func))]
+
+        for k in range(count):
+            timestamp, values = self.pending_samples.popleft()
+            x = self.get_x(timestamp)
+
+            for i, value in enumerate(values):
+                if value is not None:
+                    data_x[i].append(x)
+                    data_y[i].append(value)
+
+        for i in range(len(data_x)):
+            if len(data_x[i]) > 0:
+                self.plot.extend_data(i, data_x[i], data_y[i])
+
+    def render(self):
+        if self.start_time is None:
+            now = 0.0
+        else:
+            now = get_monotonic_time() - self.start_time
+
+        # without new values the time axis still scrolls at SAMPLE_RATE
+        if len(self.plot.dirty_curves) == 0 and \
+           (self.start_time is None or now - self.render_time < 1.0 / SAMPLE_RATE):
+            return False
+
+        self.plot.render(now)
+        self.render_time = now
+
+        return True
             
+    def history_changed(self, index):
+        history_length = self.history_lengths[index]
+
+        config.set_plot_history_length(history_length)
+        self.plot.set_history_length(history_length)
+
+        # replot at once, even if the plot isn't started
+        if self.start_time is not None:
+            self.plot.render(get_monotonic_time() - self.start_time)
+
     def clear_pressed(self):
+        self.pending_samples.clear()
         self.plot.clear_graph()
-        self.counter = 0
+        self.start_time = None
+        self.render_time = 0.0
+
+class CurveValueWrapper:
+    """
+    Plots the value of a callback with a single value, e.g. the temperature
+    of a Temperature Bricklet, in a curve of a PlotWidget that has None as
+    getter. The callback values are added with their receive timestamp in
+    the callback thread, the value returned by get_value_async is added
+    when it arrives. function is called in the GUI thread with each value,
+    coalesced per frame, e.g. to update a label. The plotted value is the
+    value divided by divisor.
+    """
+
+    def __init__(self, plot_widget, device, callback_id, getter, function, divisor=1, curve=0):
+        self.plot_widget = plot_widget
+        self.getter = getter
+        self.function = function
+        self.divisor = float(divisor)
+        self.curve = curve
+
+        register_coalesced_callback(device, callback_id, function, sample_function=self.sample)
+
+    def sample(self, timestamp, value):
+        values = [None] * len(self.plot_widget.update_func)
+        values[self.curve] = value / self.divisor
+
+        self.plot_widget.add_samples(timestamp, values)
+
+    def get_value_async(self, error_callback=None):
+        async_call(self.getter, None, self.getter_returned, error_callback)
+
+    def getter_returned(self, value):
+        self.sample(None, value)
+        self.function(value)
+
+class PlotScheduler(QObject):
+    """
+    Samples the getters of all started PlotWidgets every 1 / SAMPLE_RATE
+    seconds, adds the values received by callbacks since the last frame and
+    replots the visible ones, at most once per frame. PlotWidgets in hidden
+    tabs are not replotted.
+    """
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+
+        self.widgets = []
+        self.last_sample = 0
+        self.frame_count = 0
+        self.frame_times = deque(maxlen=FRAME_STATISTICS_SIZE)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.frame)
+
+    def add_widget(self, widget):
+        if widget in self.widgets:
+            return
+
+        self.widgets.append(widget)
+
+        if not self.timer.isActive():
+            self.timer.start(FRAME_INTERVAL)
+
+    def remove_widget(self, widget):
+        if widget in self.widgets:
+            self.widgets.remove(widget)
+
+        if len(self.widgets) == 0:
+            self.timer.stop()
+
+    def frame(self):
+        start = time.time()
+        sample = start - self.last_sample >= 1.0 / SAMPLE_RATE
+
+        if sample:
+            # keep the average sample rate, the frames don't align with it
+            if start - self.last_sample >= 2.0 / SAMPLE_RATE:
+                self.last_sample = start
+            else:
+                self.last_sample += 1.0 / SAMPLE_RATE
+
+        rendered = False
+
+        for widget in list(self.widgets):
+            try:
+                if sample:
+                    widget.sample()
+
+                widget.ingest_samples()
+
+                if widget.isVisible() and widget.render():
+                    rendered = True
+            except RuntimeError:
+                # the underlying C++ widget got deleted without stopping it
+                self.remove_widget(widget)
+            except:
+                logging.exception('Error while updating plot')
+
+        # only frames that replotted something count, idle frames would
+        # hide the actual rendering cost
+        if rendered:
+            self.frame_count += 1
+            self.frame_times.append(time.time() - start)
+
+    def get_statistics(self):
+        if len(self.frame_times) > 0:
+            frame_time_average = sum(self.frame_times) / len(self.frame_times)
+            frame_time_max = max(self.frame_times)
+        else:
+            frame_time_average = 0.0
+            frame_time_max = 0.0
+
+        return {'widgets': len(self.widgets),
+                'frames': self.frame_count,
+                'frame_time_average': frame_time_average,
+                'frame_time_max': frame_time_max}
+
+plot_scheduler = None
+
+def get_plot_scheduler():
+    global plot_scheduler
+
+    # created on first use, this happens in the GUI thread
+    if plot_scheduler is None:
+        plot_scheduler = PlotScheduler()
+
+    return plot_scheduler
+
+def get_plot_statistics():
+    """
+    Returns the number of started PlotWidgets, the number of rendered frames
+    and the average and maximum time in seconds spent per rendered frame
+    over the last FRAME_STATISTICS_SIZE rendered frames.
+    """
+
+    return get_plot_scheduler().get_statistics()
@@ -23,15 +23,79 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.unknown import Unknown
-from brickv.plugin_system.plugins import device_classes
+from brickv.plugin_system.plugins import device_identifiers, plugin_metadata
+
+import importlib
+import logging
+import sys
+import time
 
 class PluginManager:
     def __init__(self):
-        self.plugins = device_classes
+        self.plugins = {} # device identifier -> plugin class, imported on demand
+
+        # for the import report
+        self.startup_modules = self.get_loaded_modules()
+        self.on_demand_imports = [] # (plugin package, import time, new modules)
+
+    def get_loaded_modules(self):
+        return set(name for name, module in sys.modules.items() if module is not None)
+
+    def load_plugin(self, device_identifier):
+        if device_identifier in self.plugins:
+            return self.plugins[device_identifier]
+
+        plugin = None
+
+        if device_identifier in device_identifiers:
+            package = device_identifiers[device_identifier]
+            modules_before = self.get_loaded_modules()
+            start = time.time()
+
+            try:
+                plugin = importlib.import_module('brickv.plugin_system.plugins.' + package).device_class
+            except:
+                logging.exception('Could not load plugin {0}'.format(package))
+            else:
+                import_time = time.time() - start
+                new_modules = sorted(self.get_loaded_modules() - modules_before)
+
+                self.on_demand_imports.append((package, import_time, new_modules))
+                logging.info('Loaded plugin {0} in {1:.1f} ms'.format(package, import_time * 1000))
+
+        self.plugins[device_identifier] = plugin
+
+        return plugin
 
     def get_plugin(self, device_identifier, ipcon, uid, version):
-        for plugin in self.plugins:
-            if plugin.has_device_identifier(device_identifier):
-                return plugin(ipcon, uid, version)
+        plugin = self.load_plugin(device_identifier)
+
+        if plugin is None:
+            return Unknown(ipcon, uid, version)
+
+        return plugin(ipcon, uid, version)
+
+    def get_plugin_metadata(self, device_identifier):
+        """
+        Returns the (name, url_part) tuple of the plugin for the device
+        identifier without importing or creating the plugin. Returns None if
+        the plugin has to be created to know them.
+        """
+
+        return plugin_metadata.get(device_identifier)
+
+    def get_import_report(self):
+        lines = ['Modules loaded at startup: {0}'.format(len(self.startup_modules))]
+
+        for name in sorted(self.startup_modules):
+            lines.append('  ' + name)
+
+        lines.append('Plugins loaded on demand: {0}'.format(len(self.on_demand_imports)))
+
+        for package, import_time, new_modules in self.on_demand_imports:
+            lines.append('  {0}: {1:.1f} ms, {2} modules'.format(package, import_time * 1000, len(new_modules)))
+
+            for name in new_modules:
+                lines.append('    ' + name)
 
-        return Unknown(ipcon, uid, version)
+        return '\n'.join(lines)
@@ -1,99 +1,134 @@
-from brickv.plugin_system.plugins.ambient_light import device_class as ambient_light
-from brickv.plugin_system.plugins.analog_in import device_class as analog_in
-from brickv.plugin_system.plugins.analog_out import device_class as analog_out
-from brickv.plugin_system.plugins.barometer import device_class as barometer
-from brickv.plugin_system.plugins.color import device_class as color
-from brickv.plugin_system.plugins.current12 import device_class as current12
-from brickv.plugin_system.plugins.current25 import device_class as current25
-from brickv.plugin_system.plugins.dc import device_class as dc
-from brickv.plugin_system.plugins.distance_ir import device_class as distance_ir
-from brickv.plugin_system.plugins.distance_us import device_class as distance_us
-from brickv.plugin_system.plugins.dual_button import device_class as dual_button
-from brickv.plugin_system.plugins.dual_relay import device_class as dual_relay
-from brickv.plugin_system.plugins.gps import device_class as gps
-from brickv.plugin_system.plugins.hall_effect import device_class as hall_effect
-from brickv.plugin_system.plugins.heart_rate import device_class as heart_rate
-from brickv.plugin_system.plugins.humidity import device_class as humidity
-from brickv.plugin_system.plugins.imu import device_class as imu
-from brickv.plugin_system.plugins.industrial_digital_in_4 import device_class as industrial_digital_in_4
-from brickv.plugin_system.plugins.industrial_digital_out_4 import device_class as industrial_digital_out_4
-from brickv.plugin_system.plugins.industrial_dual_0_20ma import device_class as industrial_dual_0_20ma
-from brickv.plugin_system.plugins.industrial_quad_relay import device_class as industrial_quad_relay
-from brickv.plugin_system.plugins.io16 import device_class as io16
-from brickv.plugin_system.plugins.io4 import device_class as io4
-from brickv.plugin_system.plugins.joystick import device_class as joystick
-from brickv.plugin_system.plugins.lcd_16x2 import device_class as lcd_16x2
-from brickv.plugin_system.plugins.lcd_20x4 import device_class as lcd_20x4
-from brickv.plugin_system.plugins.led_strip import device_class as led_strip
-from brickv.plugin_system.plugins.line import device_class as line
-from brickv.plugin_system.plugins.linear_poti import device_class as linear_poti
-from brickv.plugin_system.plugins.master import device_class as master
-from brickv.plugin_system.plugins.moisture import device_class as moisture
-from brickv.plugin_system.plugins.motion_detector import device_class as motion_detector
-from brickv.plugin_system.plugins.multi_touch import device_class as multi_touch
-from brickv.plugin_system.plugins.piezo_buzzer import device_class as piezo_buzzer
-from brickv.plugin_system.plugins.piezo_speaker import device_class as piezo_speaker
-from brickv.plugin_system.plugins.ptc import device_class as ptc
-from brickv.plugin_system.plugins.remote_switch import device_class as remote_switch
-from brickv.plugin_system.plugins.rotary_encoder import device_class as rotary_encoder
-from brickv.plugin_system.plugins.rotary_poti import device_class as rotary_poti
-from brickv.plugin_system.plugins.segment_display_4x7 import device_class as segment_display_4x7
-from brickv.plugin_system.plugins.servo import device_class as servo
-from brickv.plugin_system.plugins.sound_intensity import device_class as sound_intensity
-from brickv.plugin_system.plugins.stepper import device_class as stepper
-from brickv.plugin_system.plugins.temperature import device_class as temperature
-from brickv.plugin_system.plugins.temperature_ir import device_class as temperature_ir
-from brickv.plugin_system.plugins.tilt import device_class as tilt
-from brickv.plugin_system.plugins.voltage import device_class as voltage
-from brickv.plugin_system.plugins.voltage_current import device_class as voltage_current
+# generated by generate.py, maps device identifiers to plugin packages.
+# the plugin packages are imported on demand by the PluginManager
 
-device_classes = [
-    ambient_light,
-    analog_in,
-    analog_out,
-    barometer,
-    color,
-    current12,
-    current25,
-    dc,
-    distance_ir,
-    distance_us,
-    dual_button,
-    dual_relay,
-    gps,
-    hall_effect,
-    heart_rate,
-    humidity,
-    imu,
-    industrial_digital_in_4,
-    industrial_digital_out_4,
-    industrial_dual_0_20ma,
-    industrial_quad_relay,
-    io16,
-    io4,
-    joystick,
-    lcd_16x2,
-    lcd_20x4,
-    led_strip,
-    line,
-    linear_poti,
-    master,
-    moisture,
-    motion_detector,
-    multi_touch,
-    piezo_buzzer,
-    piezo_speaker,
-    ptc,
-    remote_switch,
-    rotary_encoder,
-    rotary_poti,
-    segment_display_4x7,
-    servo,
-    sound_intensity,
-    stepper,
-    temperature,
-    temperature_ir,
-    tilt,
-    voltage,
-    voltage_current,
-]
+device_identifiers = {
+    21: 'ambient_light', # BrickletAmbientLight
+    219: 'analog_in', # BrickletAnalogIn
+    220: 'analog_out', # BrickletAnalogOut
+    221: 'barometer', # BrickletBarometer
+    243: 'color', # BrickletColor
+    23: 'current12', # BrickletCurrent12
+    24: 'current25', # BrickletCurrent25
+    11: 'dc', # BrickDC
+    25: 'distance_ir', # BrickletDistanceIR
+    229: 'distance_us', # BrickletDistanceUS
+    230: 'dual_button', # BrickletDualButton
+    26: 'dual_relay', # BrickletDualRelay
+    222: 'gps', # BrickletGPS
+    240: 'hall_effect', # BrickletHallEffect
+    245: 'heart_rate', # BrickletHeartRate
+    27: 'humidity', # BrickletHumidity
+    16: 'imu', # BrickIMU
+    223: 'industrial_digital_in_4', # BrickletIndustrialDigitalIn4
+    224: 'industrial_digital_out_4', # BrickletIndustrialDigitalOut4
+    228: 'industrial_dual_0_20ma', # BrickletIndustrialDual020mA
+    225: 'industrial_quad_relay', # BrickletIndustrialQuadRelay
+    28: 'io16', # BrickletIO16
+    29: 'io4', # BrickletIO4
+    210: 'joystick', # BrickletJoystick
+    211: 'lcd_16x2', # BrickletLCD16x2
+    212: 'lcd_20x4', # BrickletLCD20x4
+    231: 'led_strip', # BrickletLEDStrip
+    241: 'line', # BrickletLine
+    213: 'linear_poti', # BrickletLinearPoti
+    13: 'master', # BrickMaster
+    232: 'moisture', # BrickletMoisture
+    233: 'motion_detector', # BrickletMotionDetector
+    234: 'multi_touch', # BrickletMultiTouch
+    214: 'piezo_buzzer', # BrickletPiezoBuzzer
+    242: 'piezo_speaker', # BrickletPiezoSpeaker
+    226: 'ptc', # BrickletPTC
+    235: 'remote_switch', # BrickletRemoteSwitch
+    236: 'rotary_encoder', # BrickletRotaryEncoder
+    215: 'rotary_poti', # BrickletRotaryPoti
+    237: 'segment_display_4x7', # BrickletSegmentDisplay4x7
+    14: 'servo', # BrickServo
+    238: 'sound_intensity', # BrickletSoundIntensity
+    15: 'stepper', # BrickStepper
+    216: 'temperature', # BrickletTemperature
+    217: 'temperature_ir', # BrickletTemperatureIR
+    239: 'tilt', # BrickletTilt
+    218: 'voltage', # BrickletVoltage
+    227: 'voltage_current', # BrickletVoltageCurrent
+}
+
+# name and URL part of the plugins that can be created on demand
+plugin_metadata = {
+    21: ('Ambient Light Bricklet', 'ambient_light'),
+    219: ('Analog In Bricklet', 'analog_in'),
+    220: ('Analog Out Bricklet', 'analog_out'),
+    221: ('Barometer Bricklet', 'barometer'),
+    243: ('Color Bricklet', 'color'),
+    23: ('Current12 Bricklet', 'current12'),
+    24: ('Current25 Bricklet', 'current25'),
+    11: ('DC Brick', 'dc'),
+    25: ('Distance IR Bricklet', 'distance_ir'),
+    229: ('Distance US Bricklet', 'distance_us'),
+    230: ('Dual Button Bricklet', 'dual_button'),
+    26: ('Dual Relay Bricklet', 'dual_relay'),
+    222: ('GPS Bricklet', 'gps'),
+    240: ('Hall Effect Bricklet', 'hall_effect'),
+    245: ('Heart Rate Bricklet', 'heart_rate'),
+    27: ('Humidity Bricklet', 'humidity'),
+    16: ('IMU Brick', 'imu'),
+    223: ('Industrial Digital In 4 Bricklet', 'industrial_digital_in_4'),
+    224: ('Industrial Digital Out 4 Bricklet', 'industrial_digital_out_4'),
+    228: ('Industrial Dual 0-20mA Bricklet', 'industrial_dual_0_20ma'),
+    225: ('Industrial Quad Relay Bricklet', 'industrial_quad_relay'),
+    28: ('IO-16 Bricklet', 'io16'),
+    29: ('IO-4 Bricklet', 'io4'),
+    210: ('Joystick Bricklet', 'joystick'),
+    211: ('LCD 16x2 Bricklet', 'lcd_16x2'),
+    231: ('LED Strip Bricklet', 'led_strip'),
+    241: ('Line Bricklet', 'line'),
+    213: ('Linear Poti Bricklet', 'linear_poti'),
+    232: ('Moisture Bricklet', 'moisture'),
+    233: ('Motion Detector Bricklet', 'motion_detector'),
+    234: ('Multi Touch Bricklet', 'multi_touch'),
+    214: ('Piezo Buzzer Bricklet', 'piezo_buzzer'),
+    242: ('Piezo Speaker Bricklet', 'piezo_speaker'),
+    226: ('PTC Bricklet', 'ptc'),
+    235: ('Remote Switch Bricklet', 'remote_switch'),
+    236: ('Rotary Encoder Bricklet', 'rotary_encoder'),
+    215: ('Rotary Poti Bricklet', 'rotary_poti'),
+    237: ('Segment Display 4x7 Bricklet', 'segment_display_4x7'),
+    14: ('Servo Brick', 'servo'),
+    238: ('Sound Intensity Bricklet', 'sound_intensity'),
+    15: ('Stepper Brick', 'stepper'),
+    216: ('Temperature Bricklet', 'temperature'),
+    217: ('Temperature IR Bricklet', 'temperature_ir'),
+    239: ('Tilt Bricklet', 'tilt'),
+    218: ('Voltage Bricklet', 'voltage'),
+    227: ('Voltage/Current Bricklet', 'voltage_current'),
+}
+
+# binding module, binding class and the configured callback periods of the
+# plugins as (callback name, set_*_callback_period parameter), for the data
+# logger that has to run without importing the plugins
+log_callbacks = {
+    21: ('bricklet_ambient_light', 'BrickletAmbientLight', [('illuminance', 100)]),
+    219: ('bricklet_analog_in', 'BrickletAnalogIn', [('voltage', 100)]),
+    221: ('bricklet_barometer', 'BrickletBarometer', [('air_pressure', 100), ('altitude', 100)]),
+    243: ('bricklet_color', 'BrickletColor', [('color', 50), ('illuminance', 100), ('color_temperature', 100)]),
+    23: ('bricklet_current12', 'BrickletCurrent12', [('current', 100)]),
+    24: ('bricklet_current25', 'BrickletCurrent25', [('current', 100)]),
+    25: ('bricklet_distance_ir', 'BrickletDistanceIR', [('distance', 100), ('analog_value', 100)]),
+    229: ('bricklet_distance_us', 'BrickletDistanceUS', [('distance', 100)]),
+    222: ('bricklet_gps', 'BrickletGPS', [('coordinates', 250), ('status', 250), ('altitude', 250), ('motion', 250), ('date_time', 250)]),
+    240: ('bricklet_hall_effect', 'BrickletHallEffect', [('edge_count', 50)]),
+    245: ('bricklet_heart_rate', 'BrickletHeartRate', [('heart_rate', 100)]),
+    27: ('bricklet_humidity', 'BrickletHumidity', [('humidity', 100)]),
+    228: ('bricklet_industrial_dual_0_20ma', 'BrickletIndustrialDual020mA', [('current', (0, 100)), ('current', (1, 100))]),
+    210: ('bricklet_joystick', 'BrickletJoystick', [('position', 20)]),
+    241: ('bricklet_line', 'BrickletLine', [('reflectivity', 100)]),
+    213: ('bricklet_linear_poti', 'BrickletLinearPoti', [('position', 20)]),
+    232: ('bricklet_moisture', 'BrickletMoisture', [('moisture', 100)]),
+    226: ('bricklet_ptc', 'BrickletPTC', [('temperature', 100)]),
+    236: ('bricklet_rotary_encoder', 'BrickletRotaryEncoder', [('count', 100)]),
+    215: ('bricklet_rotary_poti', 'BrickletRotaryPoti', [('position', 20)]),
+    238: ('bricklet_sound_intensity', 'BrickletSoundIntensity', [('intensity', 10)]),
+    216: ('bricklet_temperature', 'BrickletTemperature', [('temperature', 100)]),
+    217: ('bricklet_temperature_ir', 'BrickletTemperatureIR', [('ambient_temperature', 250), ('object_temperature', 250)]),
+    218: ('bricklet_voltage', 'BrickletVoltage', [('voltage', 100)]),
+    227: ('bricklet_voltage_current', 'BrickletVoltageCurrent', [('current', 100), ('voltage', 100), ('power', 100)]),
+}
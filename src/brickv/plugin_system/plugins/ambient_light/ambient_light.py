@@ -22,13 +22,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_ambient_light import BrickletAmbientLight
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QLabel, QPainter, QColor, QBrush, QFrame
-from PyQt4.QtCore import Qt, pyqtSignal
+from PyQt4.QtCore import Qt
 
 class AmbientLightFrame(QFrame):
     def __init__(self, parent = None):
@@ -58,24 +58,18 @@ class IlluminanceLabel(QLabel):
         super(IlluminanceLabel, self).setText(text)
     
 class AmbientLight(PluginBase):
-    qtcb_illuminance = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Ambient Light Bricklet', version)
         
         self.al = BrickletAmbientLight(uid, ipcon)
         
-        self.qtcb_illuminance.connect(self.cb_illuminance)
-        self.al.register_callback(self.al.CALLBACK_ILLUMINANCE,
-                                  self.qtcb_illuminance.emit) 
-        
         self.illuminance_label = IlluminanceLabel('Illuminance: ')
         self.alf = AmbientLightFrame()
         
-        self.current_value = None
-
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Illuminance [lx]', plot_list)
+        self.illuminance_curve = CurveValueWrapper(self.plot_widget, self.al, self.al.CALLBACK_ILLUMINANCE,
+                                                   self.al.get_illuminance, self.cb_illuminance, 10.0)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -88,7 +82,7 @@ class AmbientLight(PluginBase):
         layout.addWidget(self.plot_widget)
         
     def start(self):
-        async_call(self.al.get_illuminance, None, self.cb_illuminance, self.increase_error_count)
+        self.illuminance_curve.get_value_async(self.increase_error_count)
         async_call(self.al.set_illuminance_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -105,12 +99,8 @@ class AmbientLight(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletAmbientLight.DEVICE_IDENTIFIER
     
-    def get_current_value(self):
-        return self.current_value
-
     def cb_illuminance(self, illuminance):
-        self.current_value = illuminance/10.0
-        self.illuminance_label.setText(str(self.current_value))        
+        self.illuminance_label.setText(str(illuminance/10.0))        
         
         value = illuminance*255/9000
         self.alf.set_color(value, value, value)
@@ -22,13 +22,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_analog_in import BrickletAnalogIn
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QComboBox, QSpinBox
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
         
 class VoltageLabel(QLabel):
     def setText(self, text):
@@ -36,23 +36,17 @@ class VoltageLabel(QLabel):
         super(VoltageLabel, self).setText(text)
     
 class AnalogIn(PluginBase):
-    qtcb_voltage = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Analog In Bricklet', version)
         
         self.ai = BrickletAnalogIn(uid, ipcon)
         
-        self.qtcb_voltage.connect(self.cb_voltage)
-        self.ai.register_callback(self.ai.CALLBACK_VOLTAGE,
-                                  self.qtcb_voltage.emit) 
-        
         self.voltage_label = VoltageLabel('Voltage: ')
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Voltage [mV]', plot_list)
+        self.voltage_curve = CurveValueWrapper(self.plot_widget, self.ai, self.ai.CALLBACK_VOLTAGE,
+                                               self.ai.get_voltage, self.cb_voltage)
 
         layout_h2 = QHBoxLayout()
         layout_h2.addStretch()
@@ -105,7 +99,7 @@ class AnalogIn(PluginBase):
             async_call(self.ai.get_range, None, self.get_range_async, self.increase_error_count)
         if self.version >= (2, 0, 3):
             async_call(self.ai.get_averaging, None, self.get_averaging_async, self.increase_error_count)
-        async_call(self.ai.get_voltage, None, self.cb_voltage, self.increase_error_count)
+        self.voltage_curve.get_value_async(self.increase_error_count)
         async_call(self.ai.set_voltage_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -122,11 +116,7 @@ class AnalogIn(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletAnalogIn.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_voltage(self, voltage):
-        self.current_value = voltage
         self.voltage_label.setText(str(voltage/1000.0))
 
     def range_changed(self, index):
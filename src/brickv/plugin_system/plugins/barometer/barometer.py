@@ -23,13 +23,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_barometer import BrickletBarometer
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QPushButton, QLineEdit, QSpinBox, QFrame
-from PyQt4.QtCore import pyqtSignal, Qt, QTimer
+from PyQt4.QtCore import Qt, QTimer
 
 class AirPressureLabel(QLabel):
     def setText(self, text):
@@ -47,9 +47,6 @@ class ChipTemperatureLabel(QLabel):
         super(ChipTemperatureLabel, self).setText(text)
 
 class Barometer(PluginBase):
-    qtcb_air_pressure = pyqtSignal(int)
-    qtcb_altitude = pyqtSignal(int)
-
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Barometer Bricklet', version)
 
@@ -62,13 +59,6 @@ class Barometer(PluginBase):
         self.average_pressure = 10
         self.average_temperature = 10
 
-        self.qtcb_air_pressure.connect(self.cb_air_pressure)
-        self.barometer.register_callback(self.barometer.CALLBACK_AIR_PRESSURE,
-                                         self.qtcb_air_pressure.emit)
-        self.qtcb_altitude.connect(self.cb_altitude)
-        self.barometer.register_callback(self.barometer.CALLBACK_ALTITUDE,
-                                         self.qtcb_altitude.emit)
-
         self.air_pressure_label = AirPressureLabel()
 
         self.altitude_label = AltitudeLabel()
@@ -77,14 +67,17 @@ class Barometer(PluginBase):
         if has_calibrate:
             self.chip_temperature_label.setAlignment(Qt.AlignCenter)
 
-        self.current_air_pressure = None
-        self.current_altitude = None
-
-        plot_list = [['', Qt.red, self.get_current_air_pressure]]
+        plot_list = [['', Qt.red, None]]
         self.air_pressure_plot_widget = PlotWidget('Air Pressure [mbar]', plot_list)
+        self.air_pressure_curve = CurveValueWrapper(self.air_pressure_plot_widget, self.barometer,
+                                                    self.barometer.CALLBACK_AIR_PRESSURE, self.barometer.get_air_pressure,
+                                                    self.cb_air_pressure, 1000.0)
 
-        plot_list = [['', Qt.darkGreen, self.get_current_altitude]]
+        plot_list = [['', Qt.darkGreen, None]]
         self.altitude_plot_widget = PlotWidget('Altitude [m]', plot_list)
+        self.altitude_curve = CurveValueWrapper(self.altitude_plot_widget, self.barometer,
+                                                self.barometer.CALLBACK_ALTITUDE, self.barometer.get_altitude,
+                                                self.cb_altitude, 100.0)
 
         if has_calibrate:
             self.calibrate_button = QPushButton('Calibrate Altitude')
@@ -194,8 +187,8 @@ class Barometer(PluginBase):
         self.chip_temp_timer.setInterval(100)
 
     def start(self):
-        async_call(self.barometer.get_air_pressure, None, self.cb_air_pressure, self.increase_error_count)
-        async_call(self.barometer.get_altitude, None, self.cb_altitude, self.increase_error_count)
+        self.air_pressure_curve.get_value_async(self.increase_error_count)
+        self.altitude_curve.get_value_async(self.increase_error_count)
 
         async_call(self.barometer.set_air_pressure_callback_period, 100, None, self.increase_error_count)
         async_call(self.barometer.set_altitude_callback_period, 100, None, self.increase_error_count)
@@ -277,12 +270,6 @@ class Barometer(PluginBase):
             self.reference_edit.setText('Error while setting reference air pressure')
             return
 
-    def get_current_air_pressure(self):
-        return self.current_air_pressure
-
-    def get_current_altitude(self):
-        return self.current_altitude
-
     def update_chip_temp_async(self, temp):
         t = temp/100.0
         self.chip_temperature_label.setText('%.2f' % t)
@@ -291,10 +278,8 @@ class Barometer(PluginBase):
         async_call(self.barometer.get_chip_temperature, None, self.update_chip_temp_async, self.increase_error_count)
 
     def cb_air_pressure(self, air_pressure):
-        self.current_air_pressure = air_pressure/1000.0
-        self.air_pressure_label.setText('%.3f' % self.current_air_pressure)
+        self.air_pressure_label.setText('%.3f' % (air_pressure/1000.0))
 
     def cb_altitude(self, altitude):
-        self.current_altitude = altitude/100.0
-        self.altitude_label.setText('%.2f' % self.current_altitude,
-                                    '%.2f' % (self.current_altitude/0.3048))
+        self.altitude_label.setText('%.2f' % (altitude/100.0),
+                                    '%.2f' % (altitude/100.0/0.3048))
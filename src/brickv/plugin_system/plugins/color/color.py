@@ -25,9 +25,10 @@ from brickv.plugin_system.plugin_base import PluginBase
 from brickv.plot_widget import PlotWidget
 from brickv.bindings.bricklet_color import BrickletColor
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QComboBox, QPainter, QFrame, QBrush, QColor, QCheckBox, QVBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class ColorFrame(QFrame):
     def __init__(self, parent = None):
@@ -67,26 +68,19 @@ class ColorLabel(QLabel):
         super(ColorLabel, self).setText(text)
 
 class Color(PluginBase):
-    qtcb_color = pyqtSignal(int, int, int, int)
-    qtcb_illuminance = pyqtSignal(int)
-    qtcb_color_temperature = pyqtSignal(int)
-
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Color Bricklet', version)
 
         self.color = BrickletColor(uid, ipcon)
 
-        self.qtcb_color.connect(self.cb_color)
-        self.color.register_callback(self.color.CALLBACK_COLOR,
-                                     self.qtcb_color.emit)
+        register_coalesced_callback(self.color, self.color.CALLBACK_COLOR,
+                                    self.cb_color)
         
-        self.qtcb_illuminance.connect(self.cb_illuminance)
-        self.color.register_callback(self.color.CALLBACK_ILLUMINANCE,
-                                     self.qtcb_illuminance.emit)
+        register_coalesced_callback(self.color, self.color.CALLBACK_ILLUMINANCE,
+                                    self.cb_illuminance)
         
-        self.qtcb_color_temperature.connect(self.cb_color_temperature)
-        self.color.register_callback(self.color.CALLBACK_COLOR_TEMPERATURE,
-                                     self.qtcb_color_temperature.emit)
+        register_coalesced_callback(self.color, self.color.CALLBACK_COLOR_TEMPERATURE,
+                                    self.cb_color_temperature)
 
         self.color_label = ColorLabel()
         self.illuminance_label = IlluminanceLabel()
@@ -26,7 +26,7 @@ from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_current25 import BrickletCurrent25
 from brickv.async_call import async_call
 
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QPushButton, QHBoxLayout
 from PyQt4.QtCore import pyqtSignal, Qt
@@ -37,7 +37,6 @@ class CurrentLabel(QLabel):
         super(CurrentLabel, self).setText(text)
     
 class Current25(PluginBase):
-    qtcb_current = pyqtSignal(int)
     qtcb_over = pyqtSignal()
     
     def __init__(self, ipcon, uid, version):
@@ -45,10 +44,6 @@ class Current25(PluginBase):
         
         self.cur = BrickletCurrent25(uid, ipcon)
         
-        self.qtcb_current.connect(self.cb_current)
-        self.cur.register_callback(self.cur.CALLBACK_CURRENT,
-                                   self.qtcb_current.emit) 
-        
         self.qtcb_over.connect(self.cb_over)
         self.cur.register_callback(self.cur.CALLBACK_OVER_CURRENT,
                                    self.qtcb_over.emit) 
@@ -58,10 +53,10 @@ class Current25(PluginBase):
         self.calibrate_button = QPushButton('Calibrate')
         self.calibrate_button.pressed.connect(self.calibrate_pressed)
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Current [mA]', plot_list)
+        self.current_curve = CurveValueWrapper(self.plot_widget, self.cur, self.cur.CALLBACK_CURRENT,
+                                               self.cur.get_current, self.cb_current)
         
         layout_h1 = QHBoxLayout()
         layout_h1.addStretch()
@@ -80,7 +75,7 @@ class Current25(PluginBase):
         layout.addWidget(self.calibrate_button)
 
     def start(self):
-        async_call(self.cur.get_current, None, self.cb_current, self.increase_error_count)
+        self.current_curve.get_value_async(self.increase_error_count)
         async_call(self.cur.set_current_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -97,11 +92,7 @@ class Current25(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletCurrent25.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_current(self, current):
-        self.current_value = current
         self.current_label.setText(str(current/1000.0)) 
         
     def cb_over(self):
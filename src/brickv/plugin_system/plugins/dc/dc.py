@@ -25,6 +25,7 @@ from brickv.plugin_system.plugin_base import PluginBase
 from brickv.bindings import ip_connection
 from brickv.bindings.brick_dc import BrickDC
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QErrorMessage, QInputDialog
 from PyQt4.QtCore import QTimer, Qt, pyqtSignal
@@ -94,8 +95,8 @@ class DC(PluginBase, Ui_DC):
         self.qtcb_position_reached.connect(self.update_velocity)
         self.dc.register_callback(self.dc.CALLBACK_VELOCITY_REACHED,
                                   self.qtcb_position_reached.emit) 
-        self.dc.register_callback(self.dc.CALLBACK_CURRENT_VELOCITY,
-                                  self.qtcb_position_reached.emit)
+        register_coalesced_callback(self.dc, self.dc.CALLBACK_CURRENT_VELOCITY,
+                                    self.update_velocity)
         
 #        if self.version >= (2, 0, 1):
 #            self.enable_encoder_checkbox.stateChanged.connect(self.enable_encoder_state_changed)
@@ -22,13 +22,14 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_distance_ir import BrickletDistanceIR
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QFileDialog, QApplication, QPolygonF, QMessageBox
-from PyQt4.QtCore import pyqtSignal, Qt, QPointF
+from PyQt4.QtCore import Qt, QPointF
 from PyQt4.Qwt5 import QwtSpline
 
 import os
@@ -48,21 +49,14 @@ class DistanceIR(PluginBase):
     NUM_VALUES = 128
     DIVIDER = 2**12/NUM_VALUES
     
-    qtcb_distance = pyqtSignal(int)
-    qtcb_analog = pyqtSignal(int)
     
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Distance IR Bricklet', version)
 
         self.dist = BrickletDistanceIR(uid, ipcon)
         
-        self.qtcb_distance.connect(self.cb_distance)
-        self.dist.register_callback(self.dist.CALLBACK_DISTANCE,
-                                    self.qtcb_distance.emit) 
-        
-        self.qtcb_analog.connect(self.cb_analog)
-        self.dist.register_callback(self.dist.CALLBACK_ANALOG_VALUE,
-                                    self.qtcb_analog.emit) 
+        register_coalesced_callback(self.dist, self.dist.CALLBACK_ANALOG_VALUE,
+                                    self.cb_analog)
         
         self.analog_value = 0
         
@@ -82,10 +76,10 @@ class DistanceIR(PluginBase):
         self.sample_layout.addWidget(self.sample_file)
         self.sample_layout.addWidget(self.sample_save)
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Distance [cm]', plot_list)
+        self.distance_curve = CurveValueWrapper(self.plot_widget, self.dist, self.dist.CALLBACK_DISTANCE,
+                                                self.dist.get_distance, self.cb_distance, 10.0)
         
         layout_h1 = QHBoxLayout()
         layout_h1.addStretch()
@@ -104,7 +98,7 @@ class DistanceIR(PluginBase):
         layout.addLayout(self.sample_layout)
 
     def start(self):
-        async_call(self.dist.get_distance, None, self.cb_distance, self.increase_error_count)
+        self.distance_curve.get_value_async(self.increase_error_count)
         async_call(self.dist.set_distance_callback_period, 100, None, self.increase_error_count)
         async_call(self.dist.set_analog_value_callback_period, 100, None, self.increase_error_count)
             
@@ -213,11 +207,7 @@ class DistanceIR(PluginBase):
 
         self.sample_interpolate(x, y)
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_distance(self, distance):
-        self.current_value = distance/10.0
         self.distance_label.setText(str(distance/10.0)) 
 
     def cb_analog(self, value):
@@ -22,11 +22,11 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_distance_us import BrickletDistanceUS
 from brickv.async_call import async_call
 
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 from PyQt4.QtGui import QLabel, QVBoxLayout, QHBoxLayout
         
 class DistanceLabel(QLabel):
@@ -35,22 +35,17 @@ class DistanceLabel(QLabel):
         super(DistanceLabel, self).setText(text)
     
 class DistanceUS(PluginBase):
-    qtcb_distance = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Distance US Bricklet', version)
 
         self.dist = BrickletDistanceUS(uid, ipcon)
         
-        self.qtcb_distance.connect(self.cb_distance)
-        self.dist.register_callback(self.dist.CALLBACK_DISTANCE,
-                                    self.qtcb_distance.emit) 
-        
         self.distance_label = DistanceLabel('Distance Value: ')
-        self.current_value = None
         
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Distance', plot_list)
+        self.distance_curve = CurveValueWrapper(self.plot_widget, self.dist, self.dist.CALLBACK_DISTANCE,
+                                                self.dist.get_distance_value, self.cb_distance)
         
         layout_h1 = QHBoxLayout()
         layout_h1.addStretch()
@@ -63,7 +58,7 @@ class DistanceUS(PluginBase):
         layout.addStretch()
 
     def start(self):
-        async_call(self.dist.get_distance_value, None, self.cb_distance, self.increase_error_count)
+        self.distance_curve.get_value_async(self.increase_error_count)
         async_call(self.dist.set_distance_callback_period, 100, None, self.increase_error_count)
             
         self.plot_widget.stop = False
@@ -80,9 +75,5 @@ class DistanceUS(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletDistanceUS.DEVICE_IDENTIFIER
     
-    def get_current_value(self):
-        return self.current_value
-
     def cb_distance(self, distance):
-        self.current_value = distance
         self.distance_label.setText(str(distance)) 
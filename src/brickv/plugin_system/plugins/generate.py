@@ -1,18 +1,90 @@
 import os
+import re
+import glob
 
-imports = []
-device_classes = []
+# map binding class names to device identifiers
+bindings_path = os.path.join('..', '..', 'bindings')
+binding_device_identifiers = {}
+binding_modules = {}
+
+for binding in glob.glob(os.path.join(bindings_path, 'brick*.py')):
+    source = open(binding, 'rb').read()
+    m = re.search(r'^class (\w+)\(Device\):.*?^    DEVICE_IDENTIFIER = (\d+)', source, re.M | re.S)
+
+    if m is not None:
+        binding_device_identifiers[m.group(1)] = int(m.group(2))
+        binding_modules[m.group(1)] = os.path.splitext(os.path.basename(binding))[0]
+
+# find the binding class each plugin is made for in its has_device_identifier
+# function. the plugins are not imported here, this would pull in PyQt4
+device_identifiers = []
+plugin_metadata = []
+log_callbacks = []
 
 for plugin in sorted(os.listdir('.')):
     if not os.path.isdir(os.path.join('.', plugin)):
         continue
 
-    imports.append('from brickv.plugin_system.plugins.{0} import device_class as {0}\n'.format(plugin))
-    device_classes.append('    {0},\n'.format(plugin))
+    binding_class = None
+    callback_periods = []
+
+    for filename in sorted(glob.glob(os.path.join('.', plugin, '*.py'))):
+        # the callback periods the plugin configures when it is started,
+        # the data logger configures the same periods
+        for line in open(filename, 'rb').read().splitlines():
+            m = re.match(r'\s*async_call\(self\.\w+\.set_(\w+)_callback_period, (\d+|\([\d, ]+\)), None', line)
+
+            if m is not None:
+                parameter = eval(m.group(2))
+
+                # a period of 0 disables the callback when the plugin stops
+                if parameter != 0 and not (isinstance(parameter, tuple) and parameter[-1] == 0):
+                    callback_periods.append((m.group(1), parameter))
+
+    for filename in sorted(glob.glob(os.path.join('.', plugin, '*.py'))):
+        source = open(filename, 'rb').read()
+        m = re.search(r'return device_identifier == (?:\w+\.)?(\w+)\.DEVICE_IDENTIFIER', source)
+
+        if m is not None:
+            binding_class = m.group(1)
+            break
+
+    if binding_class is None:
+        raise Exception('Could not find device identifier of plugin {0}'.format(plugin))
+
+    device_identifier = binding_device_identifiers[binding_class]
+
+    device_identifiers.append('    {0}: {1}, # {2}\n'.format(device_identifier, repr(plugin), binding_class))
+
+    # the name and URL part of a plugin are only known without creating the
+    # plugin if they are constant and do not depend on the hardware version
+    name = re.search(r"PluginBase\.__init__\(self, ipcon, uid, '([^']+)', version\)", source)
+    url_part = re.search(r"def get_url_part\(self\):\s*return '(\w+)'\s", source)
+
+    if name is not None and url_part is not None and not 'def is_hardware_version_relevant' in source:
+        plugin_metadata.append('    {0}: ({1}, {2}),\n'.format(device_identifier, repr(name.group(1)),
+                                                                repr(url_part.group(1))))
+
+    if len(callback_periods) > 0:
+        log_callbacks.append('    {0}: ({1}, {2}, {3}),\n'.format(device_identifier, repr(binding_modules[binding_class]),
+                                                                 repr(binding_class), repr(callback_periods)))
 
 f = open('__init__.py', 'wb')
-f.writelines(imports)
+f.write('# generated by generate.py, maps device identifiers to plugin packages.\n')
+f.write('# the plugin packages are imported on demand by the PluginManager\n')
+f.write('\n')
+f.write('device_identifiers = {\n')
+f.writelines(device_identifiers)
+f.write('}\n')
+f.write('\n')
+f.write('# name and URL part of the plugins that can be created on demand\n')
+f.write('plugin_metadata = {\n')
+f.writelines(plugin_metadata)
+f.write('}\n')
 f.write('\n')
-f.write('device_classes = [\n')
-f.writelines(device_classes)
-f.write(']\n')
+f.write('# binding module, binding class and the configured callback periods of the\n')
+f.write('# plugins as (callback name, set_*_callback_period parameter), for the data\n')
+f.write('# logger that has to run without importing the plugins\n')
+f.write('log_callbacks = {\n')
+f.writelines(log_callbacks)
+f.write('}\n')
@@ -25,21 +25,16 @@ from brickv.plugin_system.plugin_base import PluginBase
 from brickv.bindings.bricklet_gps import BrickletGPS
 
 from PyQt4.QtGui import QDesktopServices
-from PyQt4.QtCore import pyqtSignal, QUrl, QTimer
+from PyQt4.QtCore import QUrl, QTimer
 
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from brickv.plugin_system.plugins.gps.ui_gps import Ui_GPS
 
 import datetime
 
 class GPS(PluginBase, Ui_GPS):
-    qtcb_coordinates = pyqtSignal(int, 'char', int, 'char', int, int, int, int)
-    qtcb_status = pyqtSignal(int, int, int)
-    qtcb_altitude = pyqtSignal(int, int)
-    qtcb_motion = pyqtSignal(int, int)
-    qtcb_date_time = pyqtSignal(int, int)
-
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'GPS Bricklet', version)
 
@@ -47,25 +42,20 @@ class GPS(PluginBase, Ui_GPS):
 
         self.gps = BrickletGPS(uid, ipcon)
 
-        self.qtcb_coordinates.connect(self.cb_coordinates)
-        self.gps.register_callback(self.gps.CALLBACK_COORDINATES,
-                                   self.qtcb_coordinates.emit)
+        register_coalesced_callback(self.gps, self.gps.CALLBACK_COORDINATES,
+                                    self.cb_coordinates)
 
-        self.qtcb_status.connect(self.cb_status)
-        self.gps.register_callback(self.gps.CALLBACK_STATUS,
-                                   self.qtcb_status.emit)
+        register_coalesced_callback(self.gps, self.gps.CALLBACK_STATUS,
+                                    self.cb_status)
 
-        self.qtcb_altitude.connect(self.cb_altitude)
-        self.gps.register_callback(self.gps.CALLBACK_ALTITUDE,
-                                   self.qtcb_altitude.emit)
+        register_coalesced_callback(self.gps, self.gps.CALLBACK_ALTITUDE,
+                                    self.cb_altitude)
 
-        self.qtcb_motion.connect(self.cb_motion)
-        self.gps.register_callback(self.gps.CALLBACK_MOTION,
-                                   self.qtcb_motion.emit)
+        register_coalesced_callback(self.gps, self.gps.CALLBACK_MOTION,
+                                    self.cb_motion)
 
-        self.qtcb_date_time.connect(self.cb_date_time)
-        self.gps.register_callback(self.gps.CALLBACK_DATE_TIME,
-                                   self.qtcb_date_time.emit)
+        register_coalesced_callback(self.gps, self.gps.CALLBACK_DATE_TIME,
+                                    self.cb_date_time)
 
         self.format_combobox.currentIndexChanged.connect(self.format_changed)
         self.show_pos.pressed.connect(self.show_pos_pressed)
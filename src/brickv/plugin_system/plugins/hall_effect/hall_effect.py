@@ -24,16 +24,15 @@ Boston, MA 02111-1307, USA.
 from brickv.plugin_system.plugin_base import PluginBase
 from brickv.bindings.bricklet_hall_effect import BrickletHallEffect
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 from brickv.plot_widget import PlotWidget
 from brickv.plugin_system.plugins.hall_effect.ui_hall_effect import Ui_HallEffect
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 import PyQt4.Qwt5 as Qwt
     
 class HallEffect(PluginBase, Ui_HallEffect):
-    qtcb_edge_count = pyqtSignal(int, bool)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Hall Effect Bricklet', version)
         
@@ -41,9 +40,8 @@ class HallEffect(PluginBase, Ui_HallEffect):
 
         self.hf = BrickletHallEffect(uid, ipcon)
         
-        self.qtcb_edge_count.connect(self.cb_edge_count)
-        self.hf.register_callback(self.hf.CALLBACK_EDGE_COUNT,
-                                  self.qtcb_edge_count.emit) 
+        register_coalesced_callback(self.hf, self.hf.CALLBACK_EDGE_COUNT,
+                                    self.cb_edge_count)
         
         self.current_value = None
 
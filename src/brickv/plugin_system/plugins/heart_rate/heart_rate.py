@@ -22,7 +22,7 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_heart_rate import BrickletHeartRate
 from brickv.async_call import async_call
 from brickv.bmp_to_pixmap import bmp_to_pixmap
@@ -36,7 +36,6 @@ class HeartRateLabel(QLabel):
         super(HeartRateLabel, self).setText(text)
     
 class HeartRate(PluginBase):
-    qtcb_heart_rate = pyqtSignal(int)
     qtcb_beat_state_changed = pyqtSignal(int)
     
     def __init__(self, ipcon, uid, version):
@@ -44,9 +43,6 @@ class HeartRate(PluginBase):
         
         self.hr = BrickletHeartRate(uid, ipcon)
         
-        self.qtcb_heart_rate.connect(self.cb_heart_rate)
-        self.hr.register_callback(self.hr.CALLBACK_HEART_RATE,
-                                  self.qtcb_heart_rate.emit) 
         self.qtcb_beat_state_changed.connect(self.cb_beat_state_changed)
         self.hr.register_callback(self.hr.CALLBACK_BEAT_STATE_CHANGED,
                                   self.qtcb_beat_state_changed.emit) 
@@ -57,10 +53,10 @@ class HeartRate(PluginBase):
         self.heart_icon = QLabel()
         self.heart_icon.setPixmap(self.heart_white_bitmap)
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Heart Rate [BPM]', plot_list)
+        self.heart_rate_curve = CurveValueWrapper(self.plot_widget, self.hr, self.hr.CALLBACK_HEART_RATE,
+                                                  self.hr.get_heart_rate, self.cb_heart_rate)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -73,7 +69,7 @@ class HeartRate(PluginBase):
         layout.addWidget(self.plot_widget)
 
     def start(self):
-        async_call(self.hr.get_heart_rate, None, self.cb_heart_rate, self.increase_error_count)
+        self.heart_rate_curve.get_value_async(self.increase_error_count)
         async_call(self.hr.set_heart_rate_callback_period, 100, None, self.increase_error_count)
         async_call(self.hr.enable_beat_state_changed_callback, None, None, self.increase_error_count)
         
@@ -92,11 +88,7 @@ class HeartRate(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletHeartRate.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_heart_rate(self, heart_rate):
-        self.current_value = heart_rate
         self.heart_rate_label.setText(str(heart_rate))
         
     def cb_beat_state_changed(self, state):
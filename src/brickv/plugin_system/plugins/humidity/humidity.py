@@ -22,13 +22,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_humidity import BrickletHumidity
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class HumidityLabel(QLabel):
     def setText(self, text):
@@ -36,23 +36,17 @@ class HumidityLabel(QLabel):
         super(HumidityLabel, self).setText(text)
     
 class Humidity(PluginBase):
-    qtcb_humidity = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Humidity Bricklet', version)
         
         self.hum = BrickletHumidity(uid, ipcon)
         
-        self.qtcb_humidity.connect(self.cb_humidity)
-        self.hum.register_callback(self.hum.CALLBACK_HUMIDITY,
-                                   self.qtcb_humidity.emit) 
-        
         self.humidity_label = HumidityLabel('Humidity: ')
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Relative Humidity [%RH]', plot_list)
+        self.humidity_curve = CurveValueWrapper(self.plot_widget, self.hum, self.hum.CALLBACK_HUMIDITY,
+                                                self.hum.get_humidity, self.cb_humidity, 10.0)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -64,7 +58,7 @@ class Humidity(PluginBase):
         layout.addWidget(self.plot_widget)
 
     def start(self):
-        async_call(self.hum.get_humidity, None, self.cb_humidity, self.increase_error_count)
+        self.humidity_curve.get_value_async(self.increase_error_count)
         async_call(self.hum.set_humidity_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -81,9 +75,5 @@ class Humidity(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletHumidity.DEVICE_IDENTIFIER
     
-    def get_current_value(self):
-        return self.current_value
-
     def cb_humidity(self, humidity):
-        self.current_value = humidity/10.0
         self.humidity_label.setText(str(humidity/10.0))
@@ -25,9 +25,10 @@ from brickv.plugin_system.plugin_base import PluginBase
 from brickv.plot_widget import PlotWidget
 from brickv.bindings.bricklet_industrial_dual_0_20ma import BrickletIndustrialDual020mA
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QComboBox
-from PyQt4.QtCore import pyqtSignal, Qt, QTimer
+from PyQt4.QtCore import Qt, QTimer
 
 class CurrentLabel(QLabel):
     def setText(self, text):
@@ -35,8 +36,6 @@ class CurrentLabel(QLabel):
         super(CurrentLabel, self).setText(text)
 
 class IndustrialDual020mA(PluginBase):
-    qtcb_current = pyqtSignal(int, int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Industrial Dual 0-20mA Bricklet', version)
         
@@ -45,9 +44,9 @@ class IndustrialDual020mA(PluginBase):
         
         self.dual020 = BrickletIndustrialDual020mA(uid, ipcon)
         
-        self.qtcb_current.connect(self.cb_current)
-        self.dual020.register_callback(self.dual020.CALLBACK_CURRENT,
-                                       self.qtcb_current.emit) 
+        # keep the latest value per sensor
+        register_coalesced_callback(self.dual020, self.dual020.CALLBACK_CURRENT,
+                                    self.cb_current, key=lambda sensor, current: sensor)
 
         self.current_label = [CurrentLabel(), CurrentLabel()]
         
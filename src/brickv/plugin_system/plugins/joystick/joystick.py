@@ -26,6 +26,7 @@ from brickv.plot_widget import PlotWidget
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_joystick import BrickletJoystick
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPainter, QPushButton, QBrush
 from PyQt4.QtCore import pyqtSignal, Qt
@@ -65,7 +66,6 @@ class JoystickFrame(QFrame):
         qp.end()
         
 class Joystick(PluginBase):
-    qtcb_position = pyqtSignal(int, int)
     qtcb_pressed = pyqtSignal()
     qtcb_released = pyqtSignal()
     
@@ -74,9 +74,8 @@ class Joystick(PluginBase):
         
         self.js = BrickletJoystick(uid, ipcon)
         
-        self.qtcb_position.connect(self.cb_position)
-        self.js.register_callback(self.js.CALLBACK_POSITION,
-                                  self.qtcb_position.emit)
+        register_coalesced_callback(self.js, self.js.CALLBACK_POSITION,
+                                    self.cb_position)
         
         self.qtcb_pressed.connect(self.cb_pressed)
         self.js.register_callback(self.js.CALLBACK_PRESSED,
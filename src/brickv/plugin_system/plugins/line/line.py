@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_line import BrickletLine
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QLabel, QVBoxLayout, QHBoxLayout, QFrame, QColor, QPainter, QBrush, QLinearGradient
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
     
 class ReflectivityLabel(QLabel):
     def setText(self, text):
@@ -64,24 +64,19 @@ class ReflectivityFrame(QFrame):
         qp.end()
     
 class Line(PluginBase):
-    qtcb_reflectivity = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Line Bricklet', version)
 
         self.line = BrickletLine(uid, ipcon)
         
-        self.qtcb_reflectivity.connect(self.cb_reflectivity)
-        self.line.register_callback(self.line.CALLBACK_REFLECTIVITY,
-                                    self.qtcb_reflectivity.emit) 
-        
         self.reflectivity_label = ReflectivityLabel()
         self.rf = ReflectivityFrame()
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Reflectivity', plot_list)
+        self.reflectivity_curve = CurveValueWrapper(self.plot_widget, self.line,
+                                                    self.line.CALLBACK_REFLECTIVITY, self.line.get_reflectivity,
+                                                    self.cb_reflectivity)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -99,15 +94,11 @@ class Line(PluginBase):
         layout.addWidget(self.plot_widget)
         
     def cb_reflectivity(self, reflectivity):
-        self.current_value = reflectivity
         self.rf.set_reflectivity(reflectivity)
         self.reflectivity_label.setText(str(reflectivity))
         
-    def get_current_value(self):
-        return self.current_value
-
     def start(self):
-        async_call(self.line.get_reflectivity, None, self.cb_reflectivity, self.increase_error_count)
+        self.reflectivity_curve.get_value_async(self.increase_error_count)
         async_call(self.line.set_reflectivity_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -22,13 +22,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_linear_poti import BrickletLinearPoti
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QLabel, QSlider
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class PositionLabel(QLabel):
     def setText(self, text):
@@ -36,26 +36,20 @@ class PositionLabel(QLabel):
         super(PositionLabel, self).setText(text)
 
 class LinearPoti(PluginBase):
-    qtcb_position = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Linear Poti Bricklet', version)
         
         self.lp = BrickletLinearPoti(uid, ipcon)
         
-        self.qtcb_position.connect(self.cb_position)
-        self.lp.register_callback(self.lp.CALLBACK_POSITION,
-                                  self.qtcb_position.emit) 
-        
         self.slider = QSlider(Qt.Horizontal)
         self.slider.setRange(0, 100)
         
         self.position_label = PositionLabel('Position: ')
         
-        self.current_value = None
-
-        plot_list = [['', Qt.red, self.get_current_value]]
-        self.plot_widget = PlotWidget('Position', plot_list)
+        plot_list = [['', Qt.red, None]]
+        self.plot_widget = PlotWidget('Position', plot_list, level_of_detail=True)
+        self.position_curve = CurveValueWrapper(self.plot_widget, self.lp, self.lp.CALLBACK_POSITION,
+                                                self.lp.get_position, self.cb_position)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -68,7 +62,7 @@ class LinearPoti(PluginBase):
         layout.addWidget(self.plot_widget)
         
     def start(self):
-        async_call(self.lp.get_position, None, self.cb_position, self.increase_error_count)
+        self.position_curve.get_value_async(self.increase_error_count)
         
         async_call(self.lp.set_position_callback_period, 20, None, self.increase_error_count)
         
@@ -86,10 +80,6 @@ class LinearPoti(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletLinearPoti.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_position(self, position):
-        self.current_value = position
         self.slider.setValue(position)
         self.position_label.setText(str(position))
@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_moisture import BrickletMoisture
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class MoistureLabel(QLabel):
     def setText(self, text):
@@ -35,22 +35,18 @@ class MoistureLabel(QLabel):
         super(MoistureLabel, self).setText(text)
     
 class Moisture(PluginBase):
-    qtcb_moisture = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Moisture Bricklet', version)
 
         self.moisture = BrickletMoisture(uid, ipcon)
         
-        self.qtcb_moisture.connect(self.cb_moisture)
-        self.moisture.register_callback(self.moisture.CALLBACK_MOISTURE,
-                                        self.qtcb_moisture.emit) 
-        
         self.moisture_label = MoistureLabel()
-        self.current_value = None
         
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Moisture', plot_list)
+        self.moisture_curve = CurveValueWrapper(self.plot_widget, self.moisture,
+                                                self.moisture.CALLBACK_MOISTURE, self.moisture.get_moisture_value,
+                                                self.cb_moisture)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -62,15 +58,11 @@ class Moisture(PluginBase):
         layout.addWidget(self.plot_widget)
         
         
-    def get_current_value(self):
-        return self.current_value
-
     def cb_moisture(self, moisture):
-        self.current_value = moisture
         self.moisture_label.setText(str(moisture))
 
     def start(self):
-        async_call(self.moisture.get_moisture_value, None, self.cb_moisture, self.increase_error_count)
+        self.moisture_curve.get_value_async(self.increase_error_count)
         async_call(self.moisture.set_moisture_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_ptc import BrickletPTC
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QComboBox
-from PyQt4.QtCore import pyqtSignal, Qt, QTimer
+from PyQt4.QtCore import Qt, QTimer
 
 class TemperatureLabel(QLabel):
     def setText(self, text):
@@ -40,7 +40,6 @@ class TemperatureLabel(QLabel):
 #        super(ResistanceLabel, self).setText(text)
     
 class PTC(PluginBase):
-    qtcb_temperature = pyqtSignal(int)
 #    qtcb_resistance = pyqtSignal(int)
     
     def __init__(self, ipcon, uid, version):
@@ -51,10 +50,6 @@ class PTC(PluginBase):
         
         self.ptc = BrickletPTC(uid, ipcon)
         
-        self.qtcb_temperature.connect(self.cb_temperature)
-        self.ptc.register_callback(self.ptc.CALLBACK_TEMPERATURE,
-                                   self.qtcb_temperature.emit) 
-        
 #        self.qtcb_resistance.connect(self.cb_resistance)
 #        self.ptc.register_callback(self.ptc.CALLBACK_RESISTANCE,
 #                                   self.qtcb_resistance.emit) 
@@ -75,13 +70,13 @@ class PTC(PluginBase):
         
         self.connected_label = QLabel(self.str_connected)
         
-        self.current_value = None
-        
         self.wire_combo.currentIndexChanged.connect(self.wire_combo_index_changed)
         self.noise_combo.currentIndexChanged.connect(self.noise_combo_index_changed)
         
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Temperature [%cC]' % 0xB0, plot_list)
+        self.temperature_curve = CurveValueWrapper(self.plot_widget, self.ptc, self.ptc.CALLBACK_TEMPERATURE,
+                                                   self.ptc.get_temperature, self.cb_temperature, 100.0)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -107,7 +102,7 @@ class PTC(PluginBase):
         self.connected_timer.setInterval(1000)
 
     def start(self):
-        async_call(self.ptc.get_temperature, None, self.cb_temperature, self.increase_error_count)
+        self.temperature_curve.get_value_async(self.increase_error_count)
 #        async_call(self.ptc.get_resistance, None, self.cb_resistance, self.increase_error_count)
         async_call(self.ptc.set_temperature_callback_period, 100, None, self.increase_error_count)
 #        async_call(self.ptc.set_resistance_callback_period, 100, None, self.increase_error_count)
@@ -133,9 +128,6 @@ class PTC(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletPTC.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-    
     def update_connected(self):
         async_call(self.ptc.is_sensor_connected, None, self.is_sensor_connected_async, self.increase_error_count)
     
@@ -158,7 +150,6 @@ class PTC(PluginBase):
         self.wire_combo.setCurrentIndex(mode-2)
 
     def cb_temperature(self, temperature):
-        self.current_value = temperature/100.0
         self.temperature_label.setText('%8.02f' % (temperature/100.0))
         
     def cb_resistance(self, resistance):
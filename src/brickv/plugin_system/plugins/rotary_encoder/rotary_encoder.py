@@ -24,6 +24,7 @@ Boston, MA 02111-1307, USA.
 from brickv.plugin_system.plugin_base import PluginBase
 from brickv.bindings.bricklet_rotary_encoder import BrickletRotaryEncoder
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QFrame, QPainter, QBrush
 from PyQt4.QtCore import pyqtSignal, Qt
@@ -66,7 +67,6 @@ class EncoderFrame(QFrame):
         qp.end()
     
 class RotaryEncoder(PluginBase):
-    qtcb_count = pyqtSignal(int)
     qtcb_pressed = pyqtSignal()
     qtcb_released = pyqtSignal()
     
@@ -75,9 +75,8 @@ class RotaryEncoder(PluginBase):
 
         self.re = BrickletRotaryEncoder(uid, ipcon)
         
-        self.qtcb_count.connect(self.cb_count)
-        self.re.register_callback(self.re.CALLBACK_COUNT,
-                                  self.qtcb_count.emit)
+        register_coalesced_callback(self.re, self.re.CALLBACK_COUNT,
+                                    self.cb_count)
 
         self.qtcb_pressed.connect(self.cb_pressed)
         self.re.register_callback(self.re.CALLBACK_PRESSED,
@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_rotary_poti import BrickletRotaryPoti
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 import PyQt4.Qwt5 as Qwt
 
 class PositionLabel(QLabel):
@@ -36,17 +36,11 @@ class PositionLabel(QLabel):
         super(PositionLabel, self).setText(text)
         
 class RotaryPoti(PluginBase):
-    qtcb_position = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Rotary Poti Bricklet', version)
         
         self.rp = BrickletRotaryPoti(uid, ipcon)
         
-        self.qtcb_position.connect(self.cb_position)
-        self.rp.register_callback(self.rp.CALLBACK_POSITION,
-                                  self.qtcb_position.emit) 
-        
         self.position_knob = Qwt.QwtKnob(self)
         self.position_knob.setTotalAngle(300)
         self.position_knob.setScale(-150, 150, 30)
@@ -57,10 +51,10 @@ class RotaryPoti(PluginBase):
         
         self.position_label = PositionLabel('Position: ')
         
-        self.current_value = None
-
-        plot_list = [['', Qt.red, self.get_current_value]]
-        self.plot_widget = PlotWidget('Position', plot_list)
+        plot_list = [['', Qt.red, None]]
+        self.plot_widget = PlotWidget('Position', plot_list, level_of_detail=True)
+        self.position_curve = CurveValueWrapper(self.plot_widget, self.rp, self.rp.CALLBACK_POSITION,
+                                                self.rp.get_position, self.cb_position)
         
         layout_h1 = QHBoxLayout()
         layout_h1.addStretch()
@@ -78,7 +72,7 @@ class RotaryPoti(PluginBase):
         layout.addWidget(self.plot_widget)
 
     def start(self):
-        async_call(self.rp.get_position, None, self.cb_position, self.increase_error_count)
+        self.position_curve.get_value_async(self.increase_error_count)
         async_call(self.rp.set_position_callback_period, 20, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -95,10 +89,6 @@ class RotaryPoti(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletRotaryPoti.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_position(self, position):
-        self.current_value = position
         self.position_knob.setValue(position)
         self.position_label.setText(str(position))
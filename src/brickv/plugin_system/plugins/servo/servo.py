@@ -417,22 +417,34 @@ class Servo(PluginBase, Ui_Servo):
             try:
                 servo = self.selected_servo()
                 if servo == 255:
-                    self.up_cur = self.servo.get_overall_current()
+                    get_current = self.servo.get_overall_current
                 else:
-                    self.up_cur = self.servo.get_servo_current(servo)
-                    
-                self.up_siv = self.servo.get_stack_input_voltage()
-                self.up_eiv = self.servo.get_external_input_voltage()
-                self.up_opv = self.servo.get_output_voltage()
-                self.up_mv = self.servo.get_minimum_voltage()
-                
-                for i in range(7):
-                    self.up_ena[i] = self.servo.is_enabled(i)
-                    if self.up_ena[i]:
-                        self.activate_servo(i)
-                        self.up_pos[i] = self.servo.get_current_position(i)
-                        self.up_vel[i] = self.servo.get_current_velocity(i)
-                        self.up_acc[i] = self.servo.get_acceleration(i)
+                    get_current = (self.servo.get_servo_current, (servo,))
+
+                # pipeline the getters, one round trip per 15 getters instead of one per getter
+                values = self.ipcon.call_many([get_current,
+                                               self.servo.get_stack_input_voltage,
+                                               self.servo.get_external_input_voltage,
+                                               self.servo.get_output_voltage,
+                                               self.servo.get_minimum_voltage] +
+                                              [(self.servo.is_enabled, (i,)) for i in range(7)])
+
+                self.up_cur, self.up_siv, self.up_eiv, self.up_opv, self.up_mv = values[:5]
+                self.up_ena = values[5:]
+
+                enabled = [i for i in range(7) if self.up_ena[i]]
+                calls = []
+
+                for i in enabled:
+                    self.activate_servo(i)
+                    calls.append((self.servo.get_current_position, (i,)))
+                    calls.append((self.servo.get_current_velocity, (i,)))
+                    calls.append((self.servo.get_acceleration, (i,)))
+
+                values = self.ipcon.call_many(calls)
+
+                for k, i in enumerate(enabled):
+                    self.up_pos[i], self.up_vel[i], self.up_acc[i] = values[k * 3:k * 3 + 3]
     
                 #self.update_apply()
                 
@@ -22,11 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_sound_intensity import BrickletSoundIntensity
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout, QWidget, QLinearGradient, QBrush
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 import PyQt4.Qwt5 as Qwt
 
@@ -59,24 +60,19 @@ class IntensityLabel(QLabel):
         super(IntensityLabel, self).setText(text)
     
 class SoundIntensity(PluginBase):
-    qtcb_intensity = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Sound Intensity Bricklet', version)
 
         self.si = BrickletSoundIntensity(uid, ipcon)
         
-        self.qtcb_intensity.connect(self.cb_intensity)
-        self.si.register_callback(self.si.CALLBACK_INTENSITY,
-                                  self.qtcb_intensity.emit) 
-        
         self.intensity_label = IntensityLabel()
-        self.current_value = None
         self.thermo = TuningThermo()
         
-#        plot_list = [['', Qt.red, self.get_current_value]]
-#        self.plot_widget = PlotWidget('Intensity', plot_list)
-        
+        plot_list = [['', Qt.red, None]]
+        # 100 values per second, the long histories are drawn with min/max
+        self.plot_widget = PlotWidget('Intensity', plot_list, level_of_detail=True)
+        self.intensity_curve = CurveValueWrapper(self.plot_widget, self.si, self.si.CALLBACK_INTENSITY,
+                                                 self.si.get_intensity, self.cb_intensity)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -91,27 +87,22 @@ class SoundIntensity(PluginBase):
         layout = QVBoxLayout(self)
         layout.addLayout(layout_h)
         layout.addLayout(layout_h2)
-        layout.addStretch()
-#        layout.addWidget(self.plot_widget)
+        layout.addWidget(self.plot_widget)
         
-#    def get_current_value(self):
-#        return self.current_value
-
     def cb_intensity(self, intensity):
         self.thermo.setValue(intensity)
-#        self.current_value = intensity
         self.intensity_label.setText(str(intensity))
 
     def start(self):
-        async_call(self.si.get_intensity, None, self.cb_intensity, self.increase_error_count)
+        self.intensity_curve.get_value_async(self.increase_error_count)
         async_call(self.si.set_intensity_callback_period, 10, None, self.increase_error_count)
         
-#        self.plot_widget.stop = False
+        self.plot_widget.stop = False
         
     def stop(self):
         async_call(self.si.set_intensity_callback_period, 0, None, self.increase_error_count)
         
-#        self.plot_widget.stop = True
+        self.plot_widget.stop = True
 
     def get_url_part(self):
         return 'sound_intensity'
@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_temperature import BrickletTemperature
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class TemperatureLabel(QLabel):
     def setText(self, text):
@@ -35,23 +35,17 @@ class TemperatureLabel(QLabel):
         super(TemperatureLabel, self).setText(text)
     
 class Temperature(PluginBase):
-    qtcb_temperature = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Temperature Bricklet', version)
         
         self.tem = BrickletTemperature(uid, ipcon)
         
-        self.qtcb_temperature.connect(self.cb_temperature)
-        self.tem.register_callback(self.tem.CALLBACK_TEMPERATURE,
-                                   self.qtcb_temperature.emit) 
-        
         self.temperature_label = TemperatureLabel()
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Temperature [%cC]' % 0xB0, plot_list)
+        self.temperature_curve = CurveValueWrapper(self.plot_widget, self.tem, self.tem.CALLBACK_TEMPERATURE,
+                                                   self.tem.get_temperature, self.cb_temperature, 100.0)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -63,7 +57,7 @@ class Temperature(PluginBase):
         layout.addWidget(self.plot_widget)
 
     def start(self):
-        async_call(self.tem.get_temperature, None, self.cb_temperature, self.increase_error_count)
+        self.temperature_curve.get_value_async(self.increase_error_count)
         async_call(self.tem.set_temperature_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -80,9 +74,5 @@ class Temperature(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletTemperature.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_temperature(self, temperature):
-        self.current_value = temperature/100.0
         self.temperature_label.setText(str(temperature/100.0))
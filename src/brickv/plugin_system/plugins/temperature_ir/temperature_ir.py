@@ -22,13 +22,13 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings import ip_connection
 from brickv.bindings.bricklet_temperature_ir import BrickletTemperatureIR
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class ObjectLabel(QLabel):
     def setText(self, text):
@@ -41,21 +41,11 @@ class AmbientLabel(QLabel):
         super(AmbientLabel, self).setText(text)
     
 class TemperatureIR(PluginBase):
-    qtcb_ambient_temperature = pyqtSignal(int)
-    qtcb_object_temperature = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Temperature IR Bricklet', version)
         
         self.tem = BrickletTemperatureIR(uid, ipcon)
         
-        self.qtcb_ambient_temperature.connect(self.cb_ambient_temperature)
-        self.tem.register_callback(self.tem.CALLBACK_AMBIENT_TEMPERATURE,
-                                   self.qtcb_ambient_temperature.emit)
-        self.qtcb_object_temperature.connect(self.cb_object_temperature)
-        self.tem.register_callback(self.tem.CALLBACK_OBJECT_TEMPERATURE,
-                                   self.qtcb_object_temperature.emit) 
-        
         self.ambient_label = AmbientLabel()
         self.object_label = ObjectLabel()
         
@@ -69,13 +59,16 @@ class TemperatureIR(PluginBase):
         
         self.emissivity_button.pressed.connect(self.emissivity_pressed)
         
-        self.current_ambient = None
-        self.current_object = None
-        
-        plot_list = [['amb', Qt.blue, self.get_current_ambient],
-                     ['obj', Qt.red, self.get_current_object]]
+        plot_list = [['amb', Qt.blue, None],
+                     ['obj', Qt.red, None]]
         
         self.plot_widget = PlotWidget('Temperature [%cC]' % 0xB0, plot_list)
+        self.ambient_temperature_curve = CurveValueWrapper(self.plot_widget, self.tem,
+                                                           self.tem.CALLBACK_AMBIENT_TEMPERATURE, self.tem.get_ambient_temperature,
+                                                           self.cb_ambient_temperature, 10.0)
+        self.object_temperature_curve = CurveValueWrapper(self.plot_widget, self.tem,
+                                                          self.tem.CALLBACK_OBJECT_TEMPERATURE, self.tem.get_object_temperature,
+                                                          self.cb_object_temperature, 10.0, curve=1)
         
         layout_h1 = QHBoxLayout()
         layout_h1.addStretch()
@@ -94,8 +87,8 @@ class TemperatureIR(PluginBase):
         layout.addLayout(self.emissivity_layout)
         
     def start(self):
-        async_call(self.tem.get_ambient_temperature, None, self.cb_ambient_temperature, self.increase_error_count)
-        async_call(self.tem.get_object_temperature, None, self.cb_object_temperature, self.increase_error_count)
+        self.ambient_temperature_curve.get_value_async(self.increase_error_count)
+        self.object_temperature_curve.get_value_async(self.increase_error_count)
         async_call(self.tem.get_emissivity, None, self.cb_emissivity, self.increase_error_count)
         
         async_call(self.tem.set_ambient_temperature_callback_period, 250, None, self.increase_error_count)
@@ -116,19 +109,11 @@ class TemperatureIR(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletTemperatureIR.DEVICE_IDENTIFIER
     
-    def get_current_ambient(self):
-        return self.current_ambient
-    
-    def get_current_object(self):
-        return self.current_object
-
     def cb_object_temperature(self, temperature):
-        self.current_object = temperature/10.0
-        self.object_label.setText(str(self.current_object))
+        self.object_label.setText(str(temperature/10.0))
         
     def cb_ambient_temperature(self, temperature):
-        self.current_ambient = temperature/10.0
-        self.ambient_label.setText(str(self.current_ambient))
+        self.ambient_label.setText(str(temperature/10.0))
         
     def cb_emissivity(self, emissivity):
         self.emissivity_edit.setText(str(emissivity))
@@ -22,12 +22,12 @@ Boston, MA 02111-1307, USA.
 """
 
 from brickv.plugin_system.plugin_base import PluginBase
-from brickv.plot_widget import PlotWidget
+from brickv.plot_widget import PlotWidget, CurveValueWrapper
 from brickv.bindings.bricklet_voltage import BrickletVoltage
 from brickv.async_call import async_call
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
 
 class CurrentLabel(QLabel):
     def setText(self, text):
@@ -35,23 +35,17 @@ class CurrentLabel(QLabel):
         super(CurrentLabel, self).setText(text)
     
 class Voltage(PluginBase):
-    qtcb_voltage = pyqtSignal(int)
-    
     def __init__(self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Voltage Bricklet', version)
         
         self.vol = BrickletVoltage(uid, ipcon)
         
-        self.qtcb_voltage.connect(self.cb_voltage)
-        self.vol.register_callback(self.vol.CALLBACK_VOLTAGE,
-                                   self.qtcb_voltage.emit) 
-        
         self.voltage_label = CurrentLabel('Voltage: ')
         
-        self.current_value = None
-        
-        plot_list = [['', Qt.red, self.get_current_value]]
+        plot_list = [['', Qt.red, None]]
         self.plot_widget = PlotWidget('Voltage [mV]', plot_list)
+        self.voltage_curve = CurveValueWrapper(self.plot_widget, self.vol, self.vol.CALLBACK_VOLTAGE,
+                                               self.vol.get_voltage, self.cb_voltage)
         
         layout_h = QHBoxLayout()
         layout_h.addStretch()
@@ -63,7 +57,7 @@ class Voltage(PluginBase):
         layout.addWidget(self.plot_widget)
         
     def start(self):
-        async_call(self.vol.get_voltage, None, self.cb_voltage, self.increase_error_count)
+        self.voltage_curve.get_value_async(self.increase_error_count)
         async_call(self.vol.set_voltage_callback_period, 100, None, self.increase_error_count)
         
         self.plot_widget.stop = False
@@ -80,9 +74,5 @@ class Voltage(PluginBase):
     def has_device_identifier(device_identifier):
         return device_identifier == BrickletVoltage.DEVICE_IDENTIFIER
 
-    def get_current_value(self):
-        return self.current_value
-
     def cb_voltage(self, voltage):
-        self.current_value = voltage
         self.voltage_label.setText(str(voltage/1000.0))
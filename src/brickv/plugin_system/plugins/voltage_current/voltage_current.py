@@ -24,9 +24,10 @@ Boston, MA 02111-1307, USA.
 from brickv.plugin_system.plugin_base import PluginBase
 from brickv.plot_widget import PlotWidget
 from brickv.async_call import async_call
+from brickv.callback_coalescer import register_coalesced_callback
 
 from PyQt4.QtGui import QVBoxLayout, QLabel, QHBoxLayout
-from PyQt4.QtCore import pyqtSignal, Qt
+from PyQt4.QtCore import Qt
         
 from brickv.bindings import bricklet_voltage_current
 
@@ -48,10 +49,6 @@ class PowerLabel(QLabel):
         super(PowerLabel, self).setText(text)
     
 class VoltageCurrent(PluginBase, Ui_VoltageCurrent):
-    qtcb_current = pyqtSignal(int)
-    qtcb_voltage = pyqtSignal(int)
-    qtcb_power = pyqtSignal(int)
-    
     def __init__ (self, ipcon, uid, version):
         PluginBase.__init__(self, ipcon, uid, 'Voltage/Current Bricklet', version)
         
@@ -59,15 +56,12 @@ class VoltageCurrent(PluginBase, Ui_VoltageCurrent):
         
         self.vc = bricklet_voltage_current.VoltageCurrent(uid, ipcon)
         
-        self.qtcb_current.connect(self.cb_current)
-        self.vc.register_callback(self.vc.CALLBACK_CURRENT,
-                                   self.qtcb_current.emit)
-        self.qtcb_voltage.connect(self.cb_voltage)
-        self.vc.register_callback(self.vc.CALLBACK_VOLTAGE,
-                                   self.qtcb_voltage.emit)
-        self.qtcb_power.connect(self.cb_power)
-        self.vc.register_callback(self.vc.CALLBACK_POWER,
-                                   self.qtcb_power.emit)
+        register_coalesced_callback(self.vc, self.vc.CALLBACK_CURRENT,
+                                    self.cb_current)
+        register_coalesced_callback(self.vc, self.vc.CALLBACK_VOLTAGE,
+                                    self.cb_voltage)
+        register_coalesced_callback(self.vc, self.vc.CALLBACK_POWER,
+                                    self.cb_power)
         
         self.current_label = CurrentLabel('Current: ')
         self.voltage_label = VoltageLabel('Voltage: ')
@@ -80,9 +74,9 @@ class VoltageCurrent(PluginBase, Ui_VoltageCurrent):
         plot_list_current = [['', Qt.red, self.get_current_value]]
         plot_list_voltage = [['', Qt.blue, self.get_voltage_value]]
         plot_list_power = [['', Qt.darkGreen, self.get_power_value]]
-        self.plot_widget_current = PlotWidget('Current [mA]', plot_list_current)
-        self.plot_widget_voltage = PlotWidget('Voltage [mV]', plot_list_voltage)
-        self.plot_widget_power = PlotWidget('Power [mW]', plot_list_power)
+        self.plot_widget_current = PlotWidget('Current [mA]', plot_list_current, level_of_detail=True)
+        self.plot_widget_voltage = PlotWidget('Voltage [mV]', plot_list_voltage, level_of_detail=True)
+        self.plot_widget_power = PlotWidget('Power [mW]', plot_list_power, level_of_detail=True)
         
         self.save_cal_button.pressed.connect(self.save_cal_pressed)
         self.save_conf_button.pressed.connect(self.save_conf_pressed)
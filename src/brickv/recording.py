@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+recording.py: Columnar recording files for callback value streams
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# A recording stores the values of one or more streams, a stream being the
+# values of one callback of one device. The values of a stream are buffered
+# and written in chunks, every chunk holds the timestamps and one column per
+# field of the callback format of the stream:
+#
+#   file header   '<8sHH'  magic, version, flags
+#   record        '<BI'    record kind, payload length, followed by the payload
+#
+#   stream record '<HB'    stream id, callback id, followed by the UID, the
+#                          callback name and the callback format as strings
+#   chunk record  '<HBIqq' stream id, encoding, value count, first and last
+#                          timestamp, followed by the columns
+#   index record  '<HI'    stream count, chunk count, followed by the stream
+#                          records and '<HQIqq' per chunk: stream id, offset of
+#                          the chunk record, value count, first and last
+#                          timestamp
+#   trailer       '<Q8s'   offset of the index record, magic
+#
+# Timestamps are int64 microseconds. Columns of raw chunks are stored as they
+# are and read directly from the memory-mapped file. Compressed chunks store
+# integer columns as differences to the previous value and are compressed
+# with zlib. The index is written on close, files that were not closed are
+# scanned record by record instead.
+
+import mmap
+import os
+import struct
+import zlib
+
+import numpy
+
+RECORDING_MAGIC = b'BRKVREC\0'
+RECORDING_INDEX_MAGIC = b'BRKVIDX\0'
+RECORDING_VERSION = 1
+
+RECORD_STREAM = 1
+RECORD_CHUNK = 2
+RECORD_INDEX = 3
+
+ENCODING_RAW = 0
+ENCODING_ZLIB_DELTA = 1
+
+FILE_HEADER = struct.Struct('<8sHH')
+RECORD_HEADER = struct.Struct('<BI')
+STREAM_HEADER = struct.Struct('<HB')
+CHUNK_HEADER = struct.Struct('<HBIqq')
+INDEX_HEADER = struct.Struct('<HI')
+INDEX_ENTRY = struct.Struct('<HQIqq')
+TRAILER = struct.Struct('<Q8s')
+STRING_LENGTH = struct.Struct('<H')
+
+# values per chunk, a chunk is also written once it spans RECORDING_CHUNK_AGE
+RECORDING_CHUNK_SIZE = 4096
+RECORDING_CHUNK_AGE = 60.0 # s
+
+FIELD_DTYPES = {'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4',
+                'q': '<i8', 'Q': '<u8', '?': '?', 'c': 'S1'}
+
+class RecordingError(Exception):
+    pass
+
+def get_column_dtypes(form):
+    """
+    Returns the NumPy dtype of every field of a callback format. Arrays are
+    one column with a subarray dtype, strings are one bytes column.
+    """
+
+    dtypes = []
+
+    if len(form) == 0:
+        return dtypes
+
+    for f in form.split(' '):
+        kind = f[-1]
+        count = int(f[:-1]) if len(f) > 1 else 1
+
+        if kind == 's':
+            dtypes.append(numpy.dtype('S{0}'.format(count)))
+        elif count > 1:
+            dtypes.append(numpy.dtype((FIELD_DTYPES[kind], (count,))))
+        else:
+            dtypes.append(numpy.dtype(FIELD_DTYPES[kind]))
+
+    return dtypes
+
+def is_delta_dtype(dtype):
+    # only integer columns are stored as differences
+    return dtype.base.kind in 'iu'
+
+def pack_string(value):
+    data = value.encode('utf-8')
+
+    return STRING_LENGTH.pack(len(data)) + data
+
+def unpack_string(data, offset):
+    length = STRING_LENGTH.unpack_from(data, offset)[0]
+    offset += STRING_LENGTH.size
+
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+class StreamInfo:
+    def __init__(self, stream_id, uid, callback_id, name, form):
+        self.stream_id = stream_id
+        self.uid = uid
+        self.callback_id = callback_id
+        self.name = name
+        self.form = form
+        self.dtypes = get_column_dtypes(form)
+        self.chunks = [] # (offset of the chunk record, count, first, last timestamp)
+
+    def pack(self):
+        return STREAM_HEADER.pack(self.stream_id, self.callback_id) + \
+               pack_string(self.uid) + pack_string(self.name) + pack_string(self.form)
+
+    @staticmethod
+    def unpack(data, offset):
+        stream_id, callback_id = STREAM_HEADER.unpack_from(data, offset)
+        offset += STREAM_HEADER.size
+        uid, offset = unpack_string(data, offset)
+        name, offset = unpack_string(data, offset)
+        form, offset = unpack_string(data, offset)
+
+        return StreamInfo(stream_id, uid, callback_id, name, form), offset
+
+    def get_count(self):
+        return sum(count for _, count, _, _ in self.chunks)
+
+class RecordingStream:
+    """
+    Buffers the values of a stream until a chunk is full. Returned by
+    RecordingWriter.add_stream().
+    """
+
+    def __init__(self, writer, info):
+        self.writer = writer
+        self.info = info
+        self.written = False # stream record written
+        self.timestamps = []
+        self.values = []
+
+    def append(self, timestamp, values):
+        # values are the callback arguments as passed to the callback function
+        self.timestamps.append(timestamp)
+        self.values.append(values)
+
+        if len(self.timestamps) >= self.writer.chunk_size or \
+           timestamp - self.timestamps[0] >= self.writer.chunk_age:
+            self.writer.write_chunk(self)
+
+class RecordingWriter:
+    """
+    Writes streams of callback values to a recording file. An existing
+    recording is continued. Not thread-safe, all calls have to come from the
+    same thread.
+    """
+
+    def __init__(self, filename, compress=True, chunk_size=RECORDING_CHUNK_SIZE,
+                 chunk_age=RECORDING_CHUNK_AGE):
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.chunk_age = chunk_age
+        self.streams = {} # (uid, callback id) -> RecordingStream
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            reader = RecordingReader(filename)
+            end = reader.data_end
+            infos = reader.streams
+            reader.close()
+
+            # drop the index, it is written again on close
+            self.file = open(filename, 'r+b')
+            self.file.truncate(end)
+            self.file.seek(end)
+
+            for info in infos:
+                stream = RecordingStream(self, info)
+                stream.written = True
+                self.streams[(info.uid, info.callback_id)] = stream
+        else:
+            self.file = open(filename, 'wb')
+            self.file.write(FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, 0))
+
+    def add_stream(self, uid, callback_id, name, form):
+        """
+        Returns the RecordingStream for callback_id of the device with the
+        given UID, form is the callback format of the binding.
+        """
+
+        key = (uid, callback_id)
+
+        if key in self.streams:
+            stream = self.streams[key]
+
+            if stream.info.form != form:
+                raise RecordingError('Stream {0} {1} was recorded with format {2}'.format(uid, name, stream.info.form))
+
+            return stream
+
+        stream = RecordingStream(self, StreamInfo(len(self.streams), uid, callback_id, name, form))
+        self.streams[key] = stream
+
+        return stream
+
+    def write_record(self, kind, payload):
+        offset = self.file.tell()
+
+        self.file.write(RECORD_HEADER.pack(kind, len(payload)))
+        self.file.write(payload)
+
+        return offset
+
+    def write_chunk(self, stream):
+        count = len(stream.timestamps)
+
+        if count == 0:
+            return
+
+        info = stream.info
+
+        if not stream.written:
+            self.write_record(RECORD_STREAM, info.pack())
+            stream.written = True
+
+        timestamps = numpy.round(numpy.array(stream.timestamps) * 1000000.0).astype('<i8')
+        columns = [timestamps]
+
+        for i, dtype in enumerate(info.dtypes):
+            column = [values[i] for values in stream.values]
+
+            if dtype.kind == 'S':
+                column = [v.encode('utf-8') if not isinstance(v, bytes) else v for v in column]
+            elif dtype.base.kind == 'S':
+                column = [[v.encode('utf-8') if not isinstance(v, bytes) else v for v in vs] for vs in column]
+
+            columns.append(numpy.array(column, dtype=dtype.base).reshape((count,) + dtype.shape))
+
+        if self.compress:
+            encoding = ENCODING_ZLIB_DELTA
+            parts = []
+
+            for column in columns:
+                if is_delta_dtype(column.dtype):
+                    delta = column.copy()
+                    delta[1:] -= column[:-1] # wraps around like the cumsum when reading
+                    column = delta
+
+                parts.append(column.tobytes())
+
+            data = zlib.compress(b''.join(parts), 6)
+        else:
+            encoding = ENCODING_RAW
+            data = b''.join(column.tobytes() for column in columns)
+
+        first = int(timestamps[0])
+        last = int(timestamps[-1])
+        offset = self.write_record(RECORD_CHUNK, CHUNK_HEADER.pack(info.stream_id, encoding, count,
+                                                                   first, last) + data)
+
+        info.chunks.append((offset, count, first, last))
+        stream.timestamps = []
+        stream.values = []
+
+    def flush(self):
+        # writes all buffered values, also the ones of incomplete chunks
+        for stream in self.streams.values():
+            self.write_chunk(stream)
+
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+
+        infos = [stream.info for stream in self.streams.values() if stream.written]
+        entries = []
+
+        for info in infos:
+            for offset, count, first, last in info.chunks:
+                entries.append(INDEX_ENTRY.pack(info.stream_id, offset, count, first, last))
+
+        index = INDEX_HEADER.pack(len(infos), len(entries)) + \
+                b''.join(info.pack() for info in infos) + b''.join(entries)
+        offset = self.write_record(RECORD_INDEX, index)
+
+        self.file.write(TRAILER.pack(offset, RECORDING_INDEX_MAGIC))
+        self.file.close()
+
+class RecordingReader:
+    """
+    Reads a recording file through a memory map. Only the chunks that
+    overlap the requested time range are decoded.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+
+        # an empty file cannot be mapped
+        if os.fstat(self.file.fileno()).st_size < FILE_HEADER.size:
+            self.file.close()
+            raise RecordingError('{0} is not a recording'.format(filename))
+
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags = FILE_HEADER.unpack_from(self.map, 0)
+
+        if magic != RECORDING_MAGIC:
+            raise RecordingError('{0} is not a recording'.format(filename))
+
+        if version != RECORDING_VERSION:
+            raise RecordingError('{0} has unsupported version {1}'.format(filename, version))
+
+        self.streams = []
+        self.data_end = FILE_HEADER.size # end of the last complete stream or chunk record
+
+        if not self.read_index():
+            self.scan_records()
+
+        self.streams_by_key = {}
+
+        for info in self.streams:
+            self.streams_by_key[(info.uid, info.callback_id)] = info
+            self.streams_by_key[(info.uid, info.name)] = info
+
+    def read_index(self):
+        if len(self.map) < FILE_HEADER.size + TRAILER.size:
+            return False
+
+        offset, magic = TRAILER.unpack_from(self.map, len(self.map) - TRAILER.size)
+
+        if magic != RECORDING_INDEX_MAGIC:
+            return False
+
+        kind, length = RECORD_HEADER.unpack_from(self.map, offset)
+
+        if kind != RECORD_INDEX:
+            return False
+
+        position = offset + RECORD_HEADER.size
+        stream_count, chunk_count = INDEX_HEADER.unpack_from(self.map, position)
+        position += INDEX_HEADER.size
+        infos = {}
+
+        for i in range(stream_count):
+            info, position = StreamInfo.unpack(self.map, position)
+            infos[info.stream_id] = info
+
+        for i in range(chunk_count):
+            stream_id, chunk_offset, count, first, last = INDEX_ENTRY.unpack_from(self.map, position)
+            position += INDEX_ENTRY.size
+            infos[stream_id].chunks.append((chunk_offset, count, first, last))
+
+        self.streams = [infos[key] for key in sorted(infos)]
+        self.data_end = offset
+
+        return True
+
+    def scan_records(self):
+        # recovers the streams and chunks of a recording that was not
+        # closed, a truncated last record is ignored
+        infos = {}
+        position = FILE_HEADER.size
+        size = len(self.map)
+
+        while position + RECORD_HEADER.size <= size:
+            kind, length = RECORD_HEADER.unpack_from(self.map, position)
+            payload = position + RECORD_HEADER.size
+
+            if payload + length > size:
+                break
+
+            if kind == RECORD_STREAM:
+                info, _ = StreamInfo.unpack(self.map, payload)
+                infos[info.stream_id] = info
+            elif kind == RECORD_CHUNK:
+                stream_id, encoding, count, first, last = CHUNK_HEADER.unpack_from(self.map, payload)
+                infos[stream_id].chunks.append((position, count, first, last))
+            else:
+                break
+
+            position = payload + length
+            self.data_end = position
+
+        self.streams = [infos[key] for key in sorted(infos)]
+
+    def get_stream(self, uid, callback):
+        """
+        Returns the StreamInfo of the stream of the given UID and callback,
+        given by callback id or callback name.
+        """
+
+        try:
+            return self.streams_by_key[(uid, callback)]
+        except KeyError:
+            raise RecordingError('No stream for {0} {1}'.format(uid, callback))
+
+    def decode_chunk(self, info, offset):
+        kind, length = RECORD_HEADER.unpack_from(self.map, offset)
+        payload = offset + RECORD_HEADER.size
+        stream_id, encoding, count, first, last = CHUNK_HEADER.unpack_from(self.map, payload)
+        data_offset = payload + CHUNK_HEADER.size
+        dtypes = [numpy.dtype('<i8')] + info.dtypes
+
+        if encoding == ENCODING_RAW:
+            data = self.map
+        else:
+            data = zlib.decompress(self.map[data_offset:payload + length])
+            data_offset = 0
+
+        columns = []
+
+        for dtype in dtypes:
+            elements = dtype.itemsize // dtype.base.itemsize
+            column = numpy.frombuffer(data, dtype=dtype.base, count=count * elements,
+                                      offset=data_offset).reshape((count,) + dtype.shape)
+            data_offset += count * dtype.itemsize
+
+            if encoding == ENCODING_RAW:
+                # a view would keep the memory map in use after close
+                column = column.copy()
+            elif encoding == ENCODING_ZLIB_DELTA and is_delta_dtype(dtype):
+                column = numpy.cumsum(column, axis=0, dtype=dtype.base)
+
+            columns.append(column)
+
+        return columns
+
+    def read(self, uid, callback, start=None, end=None):
+        """
+        Returns the timestamps in seconds and a list with one array per
+        callback argument of the values of the given stream received between
+        start and end, inclusive. Without start and end all values are
+        returned.
+        """
+
+        info = self.get_stream(uid, callback)
+        start_us = None if start is None else int(round(start * 1000000.0))
+        end_us = None if end is None else int(round(end * 1000000.0))
+        parts = []
+
+        for offset, count, first, last in info.chunks:
+            if (start_us is not None and last < start_us) or (end_us is not None and first > end_us):
+                continue
+
+            columns = self.decode_chunk(info, offset)
+
+            if (start_us is not None and first < start_us) or (end_us is not None and last > end_us):
+                low = 0 if start_us is None else numpy.searchsorted(columns[0], start_us, 'left')
+                high = count if end_us is None else numpy.searchsorted(columns[0], end_us, 'right')
+                columns = [column[low:high] for column in columns]
+
+            parts.append(columns)
+
+        if len(parts) == 0:
+            return numpy.empty(0), [numpy.empty((0,) + dtype.shape, dtype=dtype.base) for dtype in info.dtypes]
+
+        if len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = [numpy.concatenate([part[i] for part in parts]) for i in range(len(parts[0]))]
+
+        return columns[0] / 1000000.0, columns[1:]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -24,6 +24,7 @@ Boston, MA 02111-1307, USA.
 import sys
 import glob
 import struct
+import zlib
 from serial import Serial, SerialException
 
 if sys.platform.startswith('linux'):
@@ -107,6 +108,7 @@ EEFC_FSR_FLOCKE = 0b0100
 EEFC_FCR_FKEY = 0x5A
 
 EEFC_FCR_FCMD_WP   = 0x01 # Write Page
+EEFC_FCR_FCMD_EWP  = 0x03 # Erase Page and Write Page
 EEFC_FCR_FCMD_EA   = 0x05 # Erase All
 EEFC_FCR_FCMD_SLB  = 0x08 # Set Lock Bit
 EEFC_FCR_FCMD_CLB  = 0x09 # Clear Lock Bit
@@ -130,6 +132,65 @@ RSTC_MR_URSTIEN = 0b1000
 RSTC_CR_FEY = 0xA5
 RSTC_MR_FEY = 0xA5
 
+# The G command of the SAM-BA monitor doesn't jump to the given address, it
+# loads the stack pointer and the entry point from the first two words there,
+# like from a vector table, and calls the entry point. The entry point has bit
+# 0 set for Thumb mode. So each applet starts with such a vector, its stack
+# is below the end of the first 32 KB SRAM as with BOSSA, that is available
+# on all SAM3S. The applets return to the monitor by popping the return
+# address.
+#
+# The CRC applet is not validated on every Brick yet, SAMBA uses it only if
+# it is created with crc_applet set to True. Otherwise the flash is read back
+# for verification. Flash pages are always written word by word, the S
+# command can't write to flash: the flash write buffer only accepts 32-bit
+# writes, but the S command stores byte by byte.
+APPLET_STACK_ADDRESS = 0x20008000
+
+def make_applet(address, code):
+    return struct.pack('<II', APPLET_STACK_ADDRESS, (address + 8) | 1) + code
+
+# The CRC applet computes the CRC32 of blocks of words, as zlib.crc32 does,
+# to compare the flash content without reading it back. Its parameters are:
+#
+#   +0  address of the first block
+#   +4  number of words per block
+#   +8  number of blocks
+#   +12 CRC32 of each block, written by the applet
+CRC_APPLET_ADDRESS = 0x20001200
+CRC_PARAMETERS_ADDRESS = 0x20001280
+CRC_APPLET = make_applet(CRC_APPLET_ADDRESS, struct.pack('<26H',
+    0xB5B0, #     push  {r4, r5, r7, lr}
+    0x480C, #     ldr   r0, =CRC_PARAMETERS_ADDRESS
+    0x6801, #     ldr   r1, [r0]
+    0x6882, #     ldr   r2, [r0, #8]
+    0x300C, #     adds  r0, #12
+    0x4F0B, #     ldr   r7, =0xEDB88320
+    0x4C09, # 1:  ldr   r4, =CRC_PARAMETERS_ADDRESS
+    0x6864, #     ldr   r4, [r4, #4]
+    0x2300, #     movs  r3, #0
+    0x43DB, #     mvns  r3, r3
+    0x680D, # 2:  ldr   r5, [r1]
+    0x3104, #     adds  r1, #4
+    0x406B, #     eors  r3, r5
+    0x2520, #     movs  r5, #32
+    0x085B, # 3:  lsrs  r3, r3, #1
+    0xD300, #     bcc   4f
+    0x407B, #     eors  r3, r7
+    0x3D01, # 4:  subs  r5, #1
+    0xD1FA, #     bne   3b
+    0x3C01, #     subs  r4, #1
+    0xD1F4, #     bne   2b
+    0x43DB, #     mvns  r3, r3
+    0xC008, #     stmia r0!, {r3}
+    0x3A01, #     subs  r2, #1
+    0xD1EC, #     bne   1b
+    0xBDB0  #     pop   {r4, r5, r7, pc}
+) + struct.pack('<II', CRC_PARAMETERS_ADDRESS, 0xEDB88320))
+
+# the CRC applet computes at most this many checksums per run
+CRC_BLOCK_COUNT = 256
+
 # http://www.varsanofiev.com/inside/at91_sam_ba.htm
 # http://sourceforge.net/apps/mediawiki/lejos/index.php?title=Documentation:SAM-BA
 
@@ -140,9 +201,11 @@ class SAMBARebootError(SAMBAException):
     pass
 
 class SAMBA:
-    def __init__(self, port_name, progress = None):
+    def __init__(self, port_name, progress = None, crc_applet = False):
         self.current_mode = None
         self.progress = progress
+        self.crc_applet = crc_applet # True to compare pages with the CRC applet
+        self.loaded_applets = {} # address -> True if the applet arrived intact
 
         try:
             self.port = Serial(port_name, 115200, timeout=5)
@@ -224,7 +287,14 @@ class SAMBA:
 
         return uid2 << 32 | uid1
 
-    def flash(self, firmware, imu_calibration, lock_imu_calibration_pages):
+    def flash(self, firmware, imu_calibration, lock_imu_calibration_pages, differential=False):
+        # without differential the flash is erased completely. otherwise only
+        # the pages that differ from the current flash content are erased and
+        # written, the flash after the firmware and the IMU calibration stays
+        # as it is. finding those pages needs the CRC applet, without it the
+        # flash is erased completely as well, reading back all pages would
+        # take longer than writing them
+
         # Split firmware into pages
         firmware_pages = []
         offset = 0
@@ -249,12 +319,18 @@ class SAMBA:
 
         self.wait_for_flash_ready('after unlocking flash pages')
 
+        changed_firmware_pages = None
+
+        if differential:
+            changed_firmware_pages = self.get_changed_pages(firmware_pages, 0)
+
         # Erase All
-        self.write_flash_command(EEFC_FCR_FCMD_EA, 0)
-        self.wait_for_flash_ready('while erasing flash pages')
+        if changed_firmware_pages is None:
+            self.write_flash_command(EEFC_FCR_FCMD_EA, 0)
+            self.wait_for_flash_ready('while erasing flash pages')
 
         # Write firmware
-        self.write_pages(firmware_pages, 0, 'Writing firmware')
+        self.write_pages(firmware_pages, 0, 'Writing firmware', changed_firmware_pages)
 
         # Write IMU calibration
         if imu_calibration is not None:
@@ -289,7 +365,15 @@ class SAMBA:
             # Write IMU calibration
             page_num_offset = (ic_relative_address - ic_prefix_length) / self.flash_page_size
 
-            self.write_pages(imu_calibration_pages, page_num_offset, 'Writing IMU calibration')
+            changed_imu_calibration_pages = None
+
+            if changed_firmware_pages is not None:
+                changed_imu_calibration_pages = self.get_changed_pages(imu_calibration_pages, page_num_offset)
+
+                if changed_imu_calibration_pages is None:
+                    changed_imu_calibration_pages = [True] * len(imu_calibration_pages)
+
+            self.write_pages(imu_calibration_pages, page_num_offset, 'Writing IMU calibration', changed_imu_calibration_pages)
 
         # Lock firmware
         self.lock_pages(0, len(firmware_pages))
@@ -326,43 +410,126 @@ class SAMBA:
         if self.progress is not None:
             self.progress.update(value)
 
-    def write_pages(self, pages, page_num_offset, title):
+    def write_pages(self, pages, page_num_offset, title, changed=None):
+        # without changed the flash is erased and the empty pages are
+        # skipped. otherwise only the pages marked as changed are erased and
+        # written
         self.reset_progress(title, len(pages))
 
-        page_num = 0
+        empty_page = '\xff' * self.flash_page_size
+        writes = [] # (index, page_num, page)
 
-        for page in pages:
+        if changed is None:
+            command = EEFC_FCR_FCMD_WP
+
+            for i, page in enumerate(pages):
+                if page != empty_page:
+                    writes.append((i, page_num_offset + i, page))
+        else:
+            command = EEFC_FCR_FCMD_EWP
+
+            for i, page in enumerate(pages):
+                if changed[i]:
+                    writes.append((i, page_num_offset + i, page))
+
+        for index, page_num, page in writes:
             offset = 0
 
             while offset < len(page):
-                address = self.flash_base + (page_num_offset + page_num) * self.flash_page_size + offset
+                address = self.flash_base + page_num * self.flash_page_size + offset
                 self.write_word(address, page[offset:offset + 4])
                 offset += 4
 
             self.wait_for_flash_ready('while writing flash pages')
-            self.write_flash_command(EEFC_FCR_FCMD_WP, page_num_offset + page_num)
+            self.write_flash_command(command, page_num)
             self.wait_for_flash_ready('while writing flash pages')
 
-            page_num += 1
-            self.update_progress(page_num)
+            self.update_progress(index + 1)
+
+        self.update_progress(len(pages))
+
+    def get_changed_pages(self, pages, page_num_offset):
+        # compares the CRC32 of the pages with the CRC32 of the flash pages
+        # computed by the CRC applet. returns None if the applet isn't
+        # available
+        checksums = self.read_checksums(self.flash_base + page_num_offset * self.flash_page_size,
+                                        self.flash_page_size, len(pages))
+
+        if checksums is None:
+            return None
+
+        return [(zlib.crc32(page) & 0xFFFFFFFF) != checksum for page, checksum in zip(pages, checksums)]
+
+    def read_checksums(self, address, block_size, block_count):
+        """
+        Returns the CRC32 of block_count blocks of block_size bytes starting
+        at address, computed by the CRC applet. Returns None if the applet
+        isn't available.
+        """
+
+        if not self.crc_applet or not self.load_applet(CRC_APPLET_ADDRESS, CRC_APPLET):
+            return None
+
+        checksums = []
+
+        while len(checksums) < block_count:
+            count = min(block_count - len(checksums), CRC_BLOCK_COUNT)
+
+            self.write_bytes(CRC_PARAMETERS_ADDRESS, struct.pack('<III', address, block_size / 4, count))
+            self.go(CRC_APPLET_ADDRESS)
+
+            # the R command is executed after the applet has returned
+            response = self.read_bytes(CRC_PARAMETERS_ADDRESS + 12, count * 4)
+            checksums += struct.unpack('<%dI' % count, response)
+            address += count * block_size
+
+        return checksums
+
+    def load_applet(self, address, applet):
+        if not address in self.loaded_applets:
+            self.write_bytes(address, applet)
+
+            # if the applet doesn't arrive intact then the caller has to fall
+            # back to the slower way instead of running garbage
+            self.loaded_applets[address] = self.read_bytes(address, len(applet)) == applet
+
+        return self.loaded_applets[address]
 
     def verify_pages(self, pages, page_num_offset, title, title_in_error):
+        # compares one CRC32 per lock region computed by the CRC applet. only
+        # regions with a mismatch are read back, if the applet isn't available
+        # then all regions are read back
         self.reset_progress('Verifying written ' + title, len(pages))
 
-        offset = page_num_offset * self.flash_page_size
+        pages_per_block = self.flash_pages_per_lockregion
+        block_size = pages_per_block * self.flash_page_size
+        address = self.flash_base + page_num_offset * self.flash_page_size
+        blocks = [pages[i:i + pages_per_block] for i in range(0, len(pages), pages_per_block)]
+        checksums = []
+
+        if len(blocks) > 0:
+            # the last block can be shorter
+            checksums = self.read_checksums(address, block_size, len(blocks) - 1)
+
+            if checksums is not None:
+                checksums += self.read_checksums(address + (len(blocks) - 1) * block_size,
+                                                 len(blocks[-1]) * self.flash_page_size, 1)
+            else:
+                checksums = []
+
         page_num = 0
 
-        for page in pages:
-            read_page = self.read_bytes(self.flash_base + offset, len(page))
-            offset += len(page)
+        for i, block in enumerate(blocks):
+            if i >= len(checksums) or checksums[i] != zlib.crc32(''.join(block)) & 0xFFFFFFFF:
+                read_block = self.read_bytes(address + i * block_size, len(block) * self.flash_page_size)
 
-            if read_page != page:
-                if title_in_error:
-                    raise SAMBAException('Verification error ({0})'.format(title))
-                else:
-                    raise SAMBAException('Verification error')
+                if read_block != ''.join(block):
+                    if title_in_error:
+                        raise SAMBAException('Verification error ({0})'.format(title))
+                    else:
+                        raise SAMBAException('Verification error')
 
-            page_num += 1
+            page_num += len(block)
             self.update_progress(page_num)
 
     def lock_pages(self, page_num, page_count):
@@ -437,10 +604,11 @@ class SAMBA:
         return response[2:-1]
 
     def write_bytes(self, address, bytes):
+        # the S command writes byte by byte, only use it for SRAM. flash pages
+        # are written word by word, see write_pages
         self.change_mode('T')
 
         try:
-            # FIXME: writes '33337777BBBBFFFF' instead of '0123456789ABCDEF'
             self.port.write('S%X,%X#' % (address, len(bytes)))
             self.port.write(bytes)
         except:
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+brickv (Brick Viewer)
+
+samba_simulator.py: SAM-BA bootloader stand-in for flash testing
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# The simulator speaks the SAM-BA monitor protocol on a pseudo terminal, so
+# samba.SAMBA can open it like the serial port of a Brick in bootloader mode.
+# It simulates the flash controller of a SAM3S including the 32-bit write
+# buffer and the lock bits. The link is simulated with the byte time of its
+# baudrate and a turnaround latency per response, flash commands take the
+# time given below. Code started with the G command can't be executed. The G
+# command takes the stack pointer and the Thumb entry point from the given
+# address as the monitor does, the applets of samba.py at the entry point are
+# emulated, anything else hangs the monitor like a crash would.
+
+import argparse
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import tty
+import zlib
+
+# Allow samba_simulator to be directly started by calling "samba_simulator.py"
+# without "brickv" being in the path already
+if not 'brickv' in sys.modules:
+    head, tail = os.path.split(os.path.dirname(os.path.realpath(__file__)))
+    if not head in sys.path:
+        sys.path.insert(0, head)
+
+from brickv.samba import CHIPID_CIDR, ATSAM3SxB, ATSAM3SxC, EEFC_FMR, EEFC_FCR, EEFC_FSR, EEFC_FRR, \
+                         EEFC_FSR_FRDY, EEFC_FSR_FCMDE, EEFC_FSR_FLOCKE, EEFC_FCR_FKEY, \
+                         EEFC_FCR_FCMD_WP, EEFC_FCR_FCMD_EWP, EEFC_FCR_FCMD_EA, EEFC_FCR_FCMD_SLB, EEFC_FCR_FCMD_CLB, \
+                         EEFC_FCR_FCMD_GLB, EEFC_FCR_FCMD_SGPB, EEFC_FCR_FCMD_CGPB, EEFC_FCR_FCMD_GGPB, \
+                         EEFC_FCR_FCMD_STUI, EEFC_FCR_FCMD_SPUI, RSTC_CR, RSTC_CR_FEY, \
+                         CRC_APPLET, CRC_PARAMETERS_ADDRESS
+
+FLASH_BASE = 0x400000
+FLASH_PAGE_SIZE = 256
+SRAM_BASE = 0x20000000
+SRAM_SIZE = 0xC000
+
+# SAM3S data sheet, flash characteristics
+FLASH_WRITE_PAGE_TIME = 0.0015 # s
+FLASH_ERASE_WRITE_PAGE_TIME = 0.003 # s
+FLASH_ERASE_ALL_TIME = 0.01 # s
+FLASH_LOCK_TIME = 0.0015 # s
+
+# the CRC applet runs a loop of 32 iterations per word
+CPU_CLOCK = 64000000 # Hz
+CRC_CYCLES_PER_WORD = 165
+
+SIMULATOR_BAUDRATE = 115200
+SIMULATOR_LATENCY = 0.001 # s, per response
+
+class SimulatedSAM3S:
+    """
+    Memory and flash controller of a SAM3S. The time of the flash commands
+    is passed in by the caller, so the chip itself doesn't sleep.
+    """
+
+    def __init__(self, arch=ATSAM3SxC, firmware=None):
+        if arch == ATSAM3SxB:
+            self.flash_size = 0x20000
+            self.lockbit_count = 8
+        else:
+            self.flash_size = 0x40000
+            self.lockbit_count = 16
+
+        self.arch = arch
+        self.page_count = self.flash_size // FLASH_PAGE_SIZE
+        self.flash = bytearray(b'\xff' * self.flash_size)
+        self.write_buffer = bytearray(b'\xff' * FLASH_PAGE_SIZE)
+        self.sram = bytearray(SRAM_SIZE)
+        self.lock_bits = [False] * self.lockbit_count
+        self.gpnvm_bits = [False] * 3
+        self.unique_id = bytearray(os.urandom(16))
+        self.unique_id_mode = False
+        self.fmr = 0
+        self.frr = 0
+        self.errors = 0
+        self.busy_until = 0.0
+        self.reset_count = 0
+        self.write_page_count = 0
+
+        if firmware is not None:
+            self.flash[:len(firmware)] = bytearray(firmware)
+
+        # the code of the applets without their vector
+        self.applets = {bytes(CRC_APPLET[8:]): self.run_crc_applet}
+
+    def get_region(self, page_num):
+        return page_num * self.lockbit_count // self.page_count
+
+    def read(self, address, length, now):
+        if FLASH_BASE + len(self.unique_id) <= address and address + length <= FLASH_BASE + self.flash_size:
+            return bytes(self.flash[address - FLASH_BASE:address - FLASH_BASE + length])
+
+        data = bytearray()
+
+        while len(data) < length:
+            offset = address + len(data)
+
+            if FLASH_BASE <= offset < FLASH_BASE + self.flash_size:
+                if self.unique_id_mode and offset < FLASH_BASE + len(self.unique_id):
+                    data.append(self.unique_id[offset - FLASH_BASE])
+                else:
+                    data.append(self.flash[offset - FLASH_BASE])
+            elif SRAM_BASE <= offset < SRAM_BASE + SRAM_SIZE:
+                data.append(self.sram[offset - SRAM_BASE])
+            else:
+                register = offset & ~3
+                data.extend(struct.pack('<I', self.read_register(register, now))[offset - register:])
+
+        return bytes(data[:length])
+
+    def read_register(self, address, now):
+        if address == CHIPID_CIDR:
+            return 0x28000960 | (self.arch << 20)
+        elif address == EEFC_FMR:
+            return self.fmr
+        elif address == EEFC_FSR:
+            # the error bits are cleared by reading the status
+            fsr = self.errors | (EEFC_FSR_FRDY if now >= self.busy_until else 0)
+            self.errors = 0
+            return fsr
+        elif address == EEFC_FRR:
+            return self.frr
+
+        return 0
+
+    def write(self, address, data, now, word_access):
+        # the S command stores byte by byte. the flash write buffer only
+        # latches whole words, a byte store is replicated to all four byte
+        # lanes of its word, so the last byte of each word wins
+        for i in range(0, len(data), 4):
+            offset = address + i
+            word = bytearray(data[i:i + 4])
+
+            if FLASH_BASE <= offset < FLASH_BASE + self.flash_size:
+                start = (offset - FLASH_BASE) % FLASH_PAGE_SIZE
+
+                if word_access:
+                    self.write_buffer[start:start + 4] = word
+                else:
+                    for byte in word:
+                        self.write_buffer[start:start + 4] = bytearray([byte]) * 4
+            elif SRAM_BASE <= offset < SRAM_BASE + SRAM_SIZE:
+                self.sram[offset - SRAM_BASE:offset - SRAM_BASE + len(word)] = word
+            elif len(word) == 4:
+                self.write_register(offset, struct.unpack('<I', bytes(word))[0], now)
+
+    def write_register(self, address, value, now):
+        if address == EEFC_FMR:
+            self.fmr = value
+        elif address == EEFC_FCR:
+            self.execute_flash_command(value >> 24, value & 0xFF, (value >> 8) & 0xFFFF, now)
+        elif address == RSTC_CR and (value >> 24) == RSTC_CR_FEY:
+            self.reset_count += 1
+            self.unique_id_mode = False
+            self.busy_until = 0.0
+
+    def execute_flash_command(self, key, command, argument, now):
+        if key != EEFC_FCR_FKEY or (now < self.busy_until and command != EEFC_FCR_FCMD_SPUI):
+            self.errors |= EEFC_FSR_FCMDE
+            return
+
+        duration = 0.0
+
+        if command in [EEFC_FCR_FCMD_WP, EEFC_FCR_FCMD_EWP]:
+            if argument >= self.page_count:
+                self.errors |= EEFC_FSR_FCMDE
+            elif self.lock_bits[self.get_region(argument)]:
+                self.errors |= EEFC_FSR_FLOCKE
+            else:
+                start = argument * FLASH_PAGE_SIZE
+
+                if command == EEFC_FCR_FCMD_EWP:
+                    self.flash[start:start + FLASH_PAGE_SIZE] = b'\xff' * FLASH_PAGE_SIZE
+                    duration = FLASH_ERASE_WRITE_PAGE_TIME
+                else:
+                    duration = FLASH_WRITE_PAGE_TIME
+
+                # programming can only clear bits
+                for i in range(FLASH_PAGE_SIZE):
+                    self.flash[start + i] &= self.write_buffer[i]
+
+                self.write_page_count += 1
+
+            self.write_buffer[:] = b'\xff' * FLASH_PAGE_SIZE
+        elif command == EEFC_FCR_FCMD_EA:
+            if True in self.lock_bits:
+                self.errors |= EEFC_FSR_FLOCKE
+            else:
+                self.flash[:] = b'\xff' * self.flash_size
+                duration = FLASH_ERASE_ALL_TIME
+        elif command in [EEFC_FCR_FCMD_SLB, EEFC_FCR_FCMD_CLB]:
+            self.lock_bits[self.get_region(argument)] = command == EEFC_FCR_FCMD_SLB
+            duration = FLASH_LOCK_TIME
+        elif command == EEFC_FCR_FCMD_GLB:
+            self.frr = sum(1 << i for i, locked in enumerate(self.lock_bits) if locked)
+        elif command in [EEFC_FCR_FCMD_SGPB, EEFC_FCR_FCMD_CGPB]:
+            self.gpnvm_bits[argument] = command == EEFC_FCR_FCMD_SGPB
+        elif command == EEFC_FCR_FCMD_GGPB:
+            self.frr = sum(1 << i for i, bit in enumerate(self.gpnvm_bits) if bit)
+        elif command == EEFC_FCR_FCMD_STUI:
+            # the flash controller stays busy until the unique identifier
+            # read mode is stopped
+            self.unique_id_mode = True
+            duration = float('inf')
+        elif command == EEFC_FCR_FCMD_SPUI:
+            self.unique_id_mode = False
+            self.busy_until = now
+        else:
+            self.errors |= EEFC_FSR_FCMDE
+
+        if duration > 0:
+            self.busy_until = now + duration
+
+    def execute(self, address, now):
+        """
+        Emulates the applet with its vector at address, returns how long it
+        ran. Raises KeyError for unknown code.
+        """
+
+        stack, entry = struct.unpack('<II', self.read(address, 8, now))
+
+        # a Cortex-M3 faults without the Thumb bit or outside of the SRAM
+        if (entry & 1) == 0 or not SRAM_BASE <= entry < SRAM_BASE + SRAM_SIZE or \
+           not SRAM_BASE < stack <= SRAM_BASE + SRAM_SIZE:
+            raise KeyError('Invalid vector at 0x%08X' % address)
+
+        offset = (entry & ~1) - SRAM_BASE
+
+        for code, applet in self.applets.items():
+            if bytes(self.sram[offset:offset + len(code)]) == code:
+                return applet(now)
+
+        raise KeyError('Unknown code at 0x%08X' % (entry & ~1))
+
+    def run_crc_applet(self, now):
+        offset = CRC_PARAMETERS_ADDRESS - SRAM_BASE
+        address, word_count, block_count = struct.unpack_from('<III', bytes(self.sram[offset:offset + 12]))
+        checksums = []
+
+        for i in range(block_count):
+            block = self.read(address + i * word_count * 4, word_count * 4, now)
+            checksums.append(zlib.crc32(block) & 0xFFFFFFFF)
+
+        self.sram[offset + 12:offset + 12 + block_count * 4] = struct.pack('<%dI' % block_count, *checksums)
+
+        return float(word_count * block_count * CRC_CYCLES_PER_WORD) / CPU_CLOCK
+
+class SAMBASimulator:
+    """
+    Serves the SAM-BA monitor protocol for a SimulatedSAM3S on a pseudo
+    terminal, its name is port_name.
+    """
+
+    def __init__(self, chip=None, baudrate=SIMULATOR_BAUDRATE, latency=SIMULATOR_LATENCY):
+        self.chip = chip if chip is not None else SimulatedSAM3S()
+        self.byte_time = 10.0 / baudrate # 8N1
+        self.latency = latency
+        self.master_fd, self.slave_fd = os.openpty()
+        self.port_name = os.ttyname(self.slave_fd)
+        self.terminal_mode = True
+        self.clock = 0.0 # time at which the simulated link is idle again
+        self.buffer = b''
+        self.crashed = False
+        self.stopped = False
+        self.command_count = 0
+        self.byte_count = 0 # received
+        self.response_byte_count = 0
+
+        tty.setraw(self.slave_fd)
+
+        self.thread = threading.Thread(target=self.serve_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.stopped = True
+        self.thread.join()
+
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def advance(self, duration):
+        # the link is busy for duration from now or from the end of the
+        # previous transfer, whichever is later
+        self.clock = max(self.clock, time.time()) + duration
+        delay = self.clock - time.time()
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def receive(self, length):
+        while len(self.buffer) < length:
+            if self.stopped:
+                return None
+
+            readable = select.select([self.master_fd], [], [], 0.1)[0]
+
+            if len(readable) > 0:
+                self.buffer += os.read(self.master_fd, 4096)
+
+        data = self.buffer[:length]
+        self.buffer = self.buffer[length:]
+        self.byte_count += length
+
+        return data
+
+    def receive_command(self):
+        command = b''
+
+        while not command.endswith(b'#'):
+            data = self.receive(1)
+
+            if data is None:
+                return None
+
+            command += data
+
+        self.advance(len(command) * self.byte_time)
+
+        return command[:-1].decode('ascii')
+
+    def send(self, data):
+        self.response_byte_count += len(data)
+        self.advance(self.latency + len(data) * self.byte_time)
+
+        while len(data) > 0:
+            data = data[os.write(self.master_fd, data):]
+
+    def serve_loop(self):
+        while not self.stopped:
+            command = self.receive_command()
+
+            if command is None:
+                break
+
+            if self.crashed:
+                continue
+
+            self.command_count += 1
+            self.handle_command(command)
+
+    def handle_command(self, command):
+        name = command[:1]
+        arguments = [int(argument, 16) for argument in command[1:].split(',') if len(argument) > 0]
+        response = b''
+
+        if name == 'N':
+            self.terminal_mode = False
+            self.send(b'\n\r')
+            return
+        elif name == 'T':
+            self.terminal_mode = True
+        elif name == 'W':
+            self.chip.write(arguments[0], struct.pack('<I', arguments[1]), self.clock, True)
+        elif name == 'w':
+            response = self.chip.read(arguments[0], arguments[1], self.clock)
+        elif name == 'R':
+            response = self.chip.read(arguments[0], arguments[1], self.clock)
+        elif name == 'S':
+            data = self.receive(arguments[1])
+
+            if data is None:
+                return
+
+            self.advance(len(data) * self.byte_time)
+            self.chip.write(arguments[0], data, self.clock, False)
+        elif name == 'G':
+            try:
+                self.advance(self.chip.execute(arguments[0], self.clock))
+            except KeyError:
+                self.crashed = True
+                return
+
+        if self.terminal_mode:
+            response = b'\n\r' + response + b'>'
+
+        if len(response) > 0:
+            self.send(response)
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulates a Brick in SAM-BA bootloader mode on a pseudo terminal')
+    parser.add_argument('--firmware', help='initial flash content')
+    parser.add_argument('--small', action='store_true', help='simulate a SAM3S with 128 KB flash instead of 256 KB')
+    parser.add_argument('--baudrate', default=SIMULATOR_BAUDRATE, type=int, help='simulated baudrate of the link')
+    parser.add_argument('--latency', default=SIMULATOR_LATENCY, type=float, help='response latency in seconds')
+
+    args = parser.parse_args()
+    firmware = None
+
+    if args.firmware is not None:
+        with open(args.firmware, 'rb') as f:
+            firmware = f.read()
+
+    chip = SimulatedSAM3S(ATSAM3SxB if args.small else ATSAM3SxC, firmware)
+    simulator = SAMBASimulator(chip, args.baudrate, args.latency)
+
+    print('Simulating a Brick in bootloader mode on {0}'.format(simulator.port_name))
+
+    try:
+        while True:
+            time.sleep(5)
+
+            print('{0} commands, {1} bytes received, {2} resets'
+                  .format(simulator.command_count, simulator.byte_count, chip.reset_count))
+    except KeyboardInterrupt:
+        simulator.close()
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,7 @@ from distutils.core import setup
 import glob
 import shutil
 import brickv.config
+from brickv.plugin_system.plugins import device_identifiers
 
 DESCRIPTION = 'Brick Viewer'
 NAME = 'Brickv'
@@ -258,7 +259,10 @@ def build_windows_pkg():
                                   "winerror",
                                   "pywintypes",
                                   "win32file",
-                                  "win32api"],
+                                  "win32api"] +
+                                 # plugins are imported on demand, py2exe cannot find them
+                                 ["brickv.plugin_system.plugins." + package
+                                  for package in device_identifiers.values()],
                     "excludes" : ["config_linux",
                                   "config_macosx",
                                   "_gtkagg",